@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+# ---- Post-hoc probability calibration ----
+# Maps a model's raw P(class 1) to a calibrated one. Calibrations are fit by
+# train_model.py on out-of-fold predictions and kept as plain JSON in the
+# model's registry metadata, so the server applies them with NumPy alone:
+#
+#   isotonic  {'method': 'isotonic', 'x': [...], 'y': [...]}   piecewise-linear, monotone
+#   sigmoid   {'method': 'sigmoid', 'a': a, 'b': b}            Platt: sigmoid(a * logit(p) + b)
+#
+# Calibrated probabilities stay within [EPS, 1 - EPS]: an isotonic step fit on
+# a pure bin would otherwise map scores to exactly 0 or 1, and one mistake
+# there costs an unbounded log loss.
+
+METHODS = ('isotonic', 'sigmoid')
+EPS = 1e-6
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def fit(proba, y, method: str = 'sigmoid') -> dict:
+    """Calibration mapping raw P(class 1) `proba` to the observed frequency of y == 1."""
+    proba, y = np.asarray(proba, dtype=np.float64), np.asarray(y)
+    if method == 'isotonic':
+        iso = IsotonicRegression(y_min=EPS, y_max=1 - EPS, out_of_bounds='clip').fit(proba, y)
+        return {'method': 'isotonic', 'x': iso.X_thresholds_.tolist(), 'y': iso.y_thresholds_.tolist()}
+    if method == 'sigmoid':
+        lr = LogisticRegression(C=1e6).fit(_logit(proba).reshape(-1, 1), y)
+        return {'method': 'sigmoid', 'a': float(lr.coef_[0, 0]), 'b': float(lr.intercept_[0])}
+    raise ValueError(f"Unknown calibration method {method!r} (expected one of {METHODS})")
+
+
+def apply(calibration: dict, proba) -> np.ndarray:
+    """Calibrated P(class 1) for an array of raw probabilities (unchanged if calibration is None)."""
+    proba = np.asarray(proba, dtype=np.float64)
+    if not calibration:
+        return proba
+    if calibration['method'] == 'isotonic':
+        # Clipped too, for calibrations registered before fit() bounded them
+        return np.clip(np.interp(proba, calibration['x'], calibration['y']), EPS, 1 - EPS)
+    if calibration['method'] == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-(calibration['a'] * _logit(proba) + calibration['b'])))
+    raise ValueError(f"Unknown calibration method {calibration['method']!r}")
+
+
+def cross_fitted(fold_proba: list, fold_y: list, method: str = 'sigmoid') -> np.ndarray:
+    """Calibrated out-of-fold probabilities, each fold calibrated on the other folds only (for honest metrics)."""
+    calibrated = []
+    for i, proba in enumerate(fold_proba):
+        others = [j for j in range(len(fold_proba)) if j != i]
+        calibrated.append(apply(fit(np.concatenate([fold_proba[j] for j in others]),
+                                    np.concatenate([fold_y[j] for j in others]), method), proba))
+    return np.concatenate(calibrated)
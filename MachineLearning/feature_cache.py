@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# ---- Content-hashed feature cache ----
+# Maps sha1(mouse_movements.json bytes) + feature extractor version to the
+# computed features, so a session is only parsed again when its file or the
+# feature code changes. Backed by SQLite (WAL mode) so several pipeline
+# worker processes can read and write it at once. Entries carry a last-used
+# time and the least recently used ones are evicted past `max_entries`.
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FeatureStore', 'feature_cache.sqlite')
+
+
+def _to_builtin(value):
+    return value.item()  # NumPy scalars
+
+
+def content_key(data: bytes, extractor_version: str) -> str:
+    digest = hashlib.sha1(data).hexdigest()
+    return f"{extractor_version}:{digest}"
+
+
+class FeatureCache:
+    """Persistent LRU cache of per-session feature dicts."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " key TEXT PRIMARY KEY,"
+            " features TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used)")
+        self.conn.commit()
+
+    def get_many(self, keys) -> dict:
+        """Returns {key: features} for the keys that are cached and marks them used."""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, features in self.conn.execute(
+                f"SELECT key, features FROM features WHERE key IN ({placeholders})", batch
+            ):
+                found[key] = json.loads(features)
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany("UPDATE features SET last_used = ? WHERE key = ?",
+                                      [(now, key) for key in found])
+        return found
+
+    def put_many(self, items):
+        """Stores (key, features dict) pairs."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO features (key, features, last_used) VALUES (?, ?, ?)",
+                [(key, json.dumps(features, default=_to_builtin), now) for key, features in items],
+            )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def evict(self, max_entries: int) -> int:
+        """Drops least recently used entries beyond `max_entries`; returns how many."""
+        excess = len(self) - max_entries
+        if excess <= 0:
+            return 0
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM features WHERE key IN"
+                " (SELECT key FROM features ORDER BY last_used LIMIT ?)", (excess,)
+            )
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return excess
+
+    def close(self):
+        self.conn.close()
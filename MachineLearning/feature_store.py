@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session_features import MODEL_FEATURES, TRAJECTORY_FEATURES
+
+# ---- Columnar feature store ----
+# One Parquet file per split with typed feature columns and the label joined
+# in at write time. Each (feature set, parser) version gets its own folder so
+# features from different extractor versions are never mixed:
+#
+#   FeatureStore/fs2-stream1/train.parquet
+#   FeatureStore/fs2-stream1/test.parquet
+#
+# Readers memory-map the file and only decode the columns they ask for.
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FeatureStore')
+
+# Bump when a feature is added, removed or computed differently
+FEATURE_SET_VERSION = 2
+
+# Parser name -> version of its output; bump when parsing output changes
+PARSER_VERSIONS = {'stream': 1, 'regex': 2}
+
+# The online feature vector's columns, so the store schema and the server can't drift apart
+FEATURE_COLUMNS = list(MODEL_FEATURES)
+# The base columns plus the session_features trajectory statistics
+EXTENDED_FEATURE_COLUMNS = FEATURE_COLUMNS + TRAJECTORY_FEATURES
+# Column sets train_model.py can train on (--features); the server scores 'base' only
+FEATURE_SETS = {'base': FEATURE_COLUMNS, 'extended': EXTENDED_FEATURE_COLUMNS}
+
+# Storage type of each MODEL_FEATURES column (a feature added there without a type here fails at import)
+FEATURE_TYPES = {
+    'total_events': pa.int32(),
+    'mouse_distance': pa.float64(),
+    'session_duration_ms': pa.int64(),
+    'avg_velocity': pa.float64(),
+    'click_count': pa.int32(),
+}
+
+SCHEMA = pa.schema([
+    ('session_id', pa.string()),
+    *[(name, FEATURE_TYPES[name]) for name in FEATURE_COLUMNS],
+    *[(name, pa.float64()) for name in TRAJECTORY_FEATURES],
+    ('label', pa.dictionary(pa.int8(), pa.string())),
+])
+
+
+def version_tag(parser: str = 'stream') -> str:
+    """Identifies the feature extractor output, e.g. 'fs2-stream1'."""
+    return f"fs{FEATURE_SET_VERSION}-{parser}{PARSER_VERSIONS[parser]}"
+
+
+def version_dir(parser: str = 'stream', store_dir: str = DEFAULT_STORE_DIR) -> str:
+    return os.path.join(store_dir, version_tag(parser))
+
+
+def split_path(split: str, parser: str = 'stream', store_dir: str = DEFAULT_STORE_DIR) -> str:
+    return os.path.join(version_dir(parser, store_dir), f"{split}.parquet")
+
+
+def write_split(features_df: pd.DataFrame, labels_df: pd.DataFrame, split: str,
+                parser: str = 'stream', store_dir: str = DEFAULT_STORE_DIR) -> str:
+    """Joins labels onto the features and writes one typed Parquet file."""
+    df = pd.merge(features_df, labels_df[['session_id', 'label']], on='session_id')
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    table = table.replace_schema_metadata({
+        'feature_set_version': str(FEATURE_SET_VERSION),
+        'parser': parser,
+        'parser_version': str(PARSER_VERSIONS[parser]),
+        'created': datetime.now().isoformat(),
+    })
+
+    path = split_path(split, parser, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_split(split: str, columns=None, parser: str = 'stream', store_dir: str = DEFAULT_STORE_DIR) -> pd.DataFrame:
+    """Memory-maps a split and returns only the requested columns."""
+    path = split_path(split, parser, store_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {split} features at {path}; run pipeline.py first")
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def describe(split: str, parser: str = 'stream', store_dir: str = DEFAULT_STORE_DIR) -> dict:
+    """Row count, schema and version metadata, read from the Parquet footer only."""
+    metadata = pq.read_metadata(split_path(split, parser, store_dir))
+    info = {k.decode(): v.decode() for k, v in (metadata.metadata or {}).items() if not k.startswith(b'ARROW')}
+    info.update(rows=metadata.num_rows, columns=metadata.schema.names)
+    return info
+
+
+if __name__ == '__main__':
+    for parser in PARSER_VERSIONS:
+        for split in ('train', 'test'):
+            if os.path.exists(split_path(split, parser)):
+                print(f"{split_path(split, parser)}: {json.dumps(describe(split, parser))}")
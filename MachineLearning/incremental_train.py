@@ -0,0 +1,408 @@
+"""
+Incremental, out-of-core XGBoost training on labeled sessions from the server's session store.
+
+train_model.py loads the whole train split into memory. This script never holds
+more than one chunk of --chunk-rows feature rows. Logged sessions are read from
+the store's segments in append order. Each one is turned into a MODEL_FEATURES
+row: recomputed from the logged payload, or taken from the aggregate of a
+streamed session. The row is joined with its label. Chunks reach XGBoost
+through a DataIter that builds an external-memory matrix, whose pages are
+cached on disk under --cache-dir.
+
+Each run continues from a model in the registry, the champion by default
+(--model). An alias is followed down its update lineage: if earlier runs
+already registered updates built from the champion (staged as shadows, not
+promoted yet), the run continues from the newest of them instead of
+retraining the champion on the same sessions. It updates the model without
+retraining it from scratch:
+
+    --mode add       boost --rounds new trees on the fresh sessions (default)
+    --mode refresh   keep the trees and re-fit their leaf values to the fresh
+                     sessions; the model size stays constant
+
+Labels come from --labels files in the phase1 annotation format: one
+"session_id label" per line, where 'human' is 1 and any other label is 0.
+Sessions without a label are skipped. Every version records the store position
+it has read up to and the labeled sessions its lineage has trained on. The next
+update reads from that position, and also re-reads the --rescan segments before
+it, so a session whose label arrived after the last run is still trained on
+once; sessions the lineage has already trained on are skipped. One labeled
+session in HOLDOUT_EVERY (by a hash of its session_id) is held out instead of
+trained on. The update is only saved if holdout log loss doesn't get more than
+MAX_LOSS_INCREASE worse. A run with no new labeled sessions registers nothing.
+
+--source store streams the feature store's train split instead, in pyarrow
+record batches. Use it, for example, to bootstrap a model from phase1 before
+any sessions are logged.
+
+A saved update is recalibrated on the holdout (Platt scaling, see
+calibration.py) when it has enough sessions of both classes, since the old
+calibration no longer fits the updated trees. It is written to a temporary
+file, registered from there as a new version in the model registry and staged
+(--stage, default shadow), so the server scores it next to the champion
+before it is promoted. No model file is ever overwritten.
+
+Usage:
+    python incremental_train.py --labels reviewed_labels.txt
+    python incremental_train.py --source store --rounds 100
+Then POST /admin/reload-model to pick up the new shadow (or champion).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pyarrow.parquet as pq
+import xgboost as xgb
+from sklearn.metrics import log_loss, roc_auc_score
+
+import calibration
+import feature_store
+import model_registry
+from session_features import MODEL_FEATURES, create_feature_vector, from_json_payload, from_wire
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+from log_store import end_position, read_entries
+
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'click_logs')
+# The base model while the registry has no champion (read only, like the server's MODEL_PATH)
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'savedModels', 'xgboost_classifier.joblib')
+
+CHUNK_ROWS = 100_000
+HOLDOUT_EVERY = 10            # one labeled session in this many is held out for the update check
+HOLDOUT_MAX_ROWS = 200_000
+MAX_LOSS_INCREASE = 0.02      # an update that makes holdout log loss 2% worse is not saved
+HUMAN_LABEL = 'human'
+CALIBRATION_METHOD = 'sigmoid'  # two parameters, so it can be fit on the holdout alone
+CALIBRATION_MIN_ROWS = 100      # holdout sessions needed to recalibrate
+RESCAN_SEGMENTS = 7  # segments re-read for late labels; the server starts one a day, so about a week
+
+# Parameters for a model trained from scratch (when there is no base model yet)
+SCRATCH_PARAMS = {'objective': 'binary:logistic', 'eval_metric': 'logloss', 'tree_method': 'hist', 'seed': 42}
+
+
+def load_labels(paths) -> dict:
+    """session_id -> 1 (human) or 0 (bot) from 'session_id label' files."""
+    labels = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2:
+                    labels[parts[0]] = int(parts[1] == HUMAN_LABEL)
+    return labels
+
+
+def is_holdout(session_id: str) -> bool:
+    return zlib.crc32(str(session_id).encode()) % HOLDOUT_EVERY == 0
+
+
+def feature_row(entry: dict):
+    """MODEL_FEATURES of a logged session, or None if its details can't be featurized."""
+    details = entry.get('details') or {}
+    try:
+        if details.get('streamed'):
+            features = details['features']  # live sessions log their aggregate, not the events
+        elif details.get('format') == 'ccs1':
+            features = create_feature_vector(from_wire(details))  # logged as the decoded arrays
+        else:
+            features = create_feature_vector(from_json_payload(details))
+        return [float(features[name]) for name in MODEL_FEATURES]
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+# ---- Chunk sources ----
+# Each returns a generator of (X float32 (n, features), y int8 (n,)) chunks and
+# can be called again to restart from the same rows (XGBoost reads the data
+# more than once).
+def _batched(rows, chunk_rows: int):
+    X, y = [], []
+    for features, label in rows:
+        X.append(features)
+        y.append(label)
+        if len(y) == chunk_rows:
+            yield np.array(X, dtype=np.float32), np.array(y, dtype=np.int8)
+            X, y = [], []
+    if y:
+        yield np.array(X, dtype=np.float32), np.array(y, dtype=np.int8)
+
+
+def log_chunks(log_dir: str, labels: dict, since, until, holdout: bool, chunk_rows: int = CHUNK_ROWS,
+               skip=(), consumed: dict = None):
+    """Labeled sessions logged between two positions, except those in `skip`.
+
+    Every session yielded is recorded in `consumed` (session_id -> segment).
+    """
+    def rows():
+        for seq, _, _, entry in read_entries(log_dir, since, until):
+            session_id = entry.get('session_id')
+            label = labels.get(session_id)
+            if label is None or session_id in skip or is_holdout(session_id) != holdout:
+                continue
+            features = feature_row(entry)
+            if features is not None:
+                if consumed is not None:
+                    consumed[session_id] = seq
+                yield features, label
+    return _batched(rows(), chunk_rows)
+
+
+def store_chunks(store_path: str, holdout: bool, chunk_rows: int = CHUNK_ROWS):
+    def rows():
+        columns = ['session_id'] + MODEL_FEATURES + ['label']
+        for batch in pq.ParquetFile(store_path).iter_batches(batch_size=chunk_rows, columns=columns):
+            df = batch.to_pandas()
+            keep = df['session_id'].map(is_holdout) == holdout
+            X = df.loc[keep, MODEL_FEATURES].to_numpy(dtype=np.float32)
+            y = (df.loc[keep, 'label'].astype(str) == HUMAN_LABEL).to_numpy(dtype=np.int8)
+            yield from zip(X.tolist(), y.tolist())
+    return _batched(rows(), chunk_rows)
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds chunks to XGBoost one at a time; `make_chunks()` restarts the source."""
+
+    def __init__(self, make_chunks, cache_prefix: str):
+        self._make_chunks = make_chunks
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = self._make_chunks()
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        X, y = chunk
+        input_data(data=X, label=y, feature_names=MODEL_FEATURES)
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+# ---- Model ----
+def lineage_head(model_id: str, registry_dir: str = model_registry.DEFAULT_REGISTRY_DIR) -> str:
+    """The newest version updated from model_id, directly or through other updates; model_id if there is none."""
+    name = model_id.split('/')[0]
+    lineage, head = {model_id}, model_id
+    # An update is always registered after its base, so one pass in version order finds every descendant
+    for version in model_registry.versions(name, registry_dir):
+        candidate = f"{name}/{version}"
+        if candidate not in lineage and model_registry.metadata(candidate, registry_dir).get('base') in lineage:
+            lineage.add(candidate)
+            head = candidate
+    return head
+
+
+def load_booster(ref: str, registry_dir: str = model_registry.DEFAULT_REGISTRY_DIR):
+    """(booster, training parameters, metadata) of the model to continue from, or (None, SCRATCH_PARAMS, None).
+
+    `ref` is a registry alias, id or name, or a .joblib path. An alias continues
+    from the head of its version's update lineage (lineage_head). The champion
+    falls back to DEFAULT_MODEL_PATH while the registry has none.
+    """
+    model_id = model_registry.resolve(ref, registry_dir)
+    if model_id is not None and ref in model_registry.aliases(registry_dir):
+        model_id = lineage_head(model_id, registry_dir)
+    if model_id is not None:
+        clf, meta = model_registry.load(model_id, registry_dir)
+    elif os.path.isfile(ref) or (ref == model_registry.CHAMPION and os.path.exists(DEFAULT_MODEL_PATH)):
+        path = ref if os.path.isfile(ref) else DEFAULT_MODEL_PATH
+        clf, meta = joblib.load(path), {'id': path}
+    else:
+        return None, dict(SCRATCH_PARAMS), None
+    if not isinstance(clf, xgb.XGBClassifier):
+        raise ValueError(f"{meta['id']} is a {type(clf).__name__}, not an XGBoost model")
+    if meta.get('features', MODEL_FEATURES) != MODEL_FEATURES:
+        raise ValueError(f"{meta['id']} was trained on {len(meta['features'])} features, not MODEL_FEATURES")
+    params = {k: v for k, v in clf.get_xgb_params().items() if v is not None and k != 'use_label_encoder'}
+    params.update(eval_metric='logloss', tree_method='hist')
+    return clf.get_booster(), params, meta
+
+
+def save_classifier(booster, model_path: str):
+    """Saves a booster as the XGBClassifier the server loads."""
+    clf = xgb.XGBClassifier()
+    clf.load_model(booster.save_raw('json'))
+    tmp_path = model_path + '.tmp'
+    joblib.dump(clf, tmp_path)
+    os.replace(tmp_path, model_path)
+
+
+def holdout_metrics(booster, X: np.ndarray, y: np.ndarray) -> dict:
+    if booster is None or not len(y):
+        return None
+    proba = booster.predict(xgb.DMatrix(X, feature_names=MODEL_FEATURES))
+    metrics = {'log_loss': float(log_loss(y, np.clip(proba, 1e-7, 1 - 1e-7), labels=[0, 1]))}
+    if len(np.unique(y)) == 2:
+        metrics['roc_auc'] = float(roc_auc_score(y, proba))
+    return metrics
+
+
+def update(booster, params: dict, make_chunks, mode: str, rounds: int, cache_dir: str):
+    """(new booster, rows trained on) after one update on the chunks."""
+    it = ChunkIter(make_chunks, os.path.join(cache_dir, 'pages'))
+    if mode == 'refresh':
+        # The refresh updater walks the existing trees, which needs the raw values (not quantiles)
+        dtrain = xgb.DMatrix(it)
+        refresh = {**params, 'process_type': 'update', 'updater': 'refresh', 'refresh_leaf': True}
+        refresh.pop('tree_method', None)
+        new_booster = xgb.train(refresh, dtrain, num_boost_round=booster.num_boosted_rounds(), xgb_model=booster)
+    else:
+        dtrain = xgb.ExtMemQuantileDMatrix(it)
+        new_booster = xgb.train(params, dtrain, num_boost_round=rounds, xgb_model=booster)
+    return new_booster, dtrain.num_row()
+
+
+def run(source: str, model_ref: str, label_paths, log_dir: str, mode: str, rounds: int,
+        chunk_rows: int, cache_dir: str = None, parser: str = 'stream', store_dir: str = feature_store.DEFAULT_STORE_DIR,
+        force: bool = False, stage: str = model_registry.SHADOW,
+        registry_dir: str = model_registry.DEFAULT_REGISTRY_DIR, rescan: int = RESCAN_SEGMENTS) -> int:
+    start = time.time()
+    try:
+        booster, params, base = load_booster(model_ref, registry_dir)
+    except ValueError as e:
+        print(f"Can't continue from {model_ref}: {e}")
+        return 1
+    if booster is None and mode == 'refresh':
+        print(f"No model {model_ref} to refresh; train one with --mode add first")
+        return 1
+    print(f"Continuing from {base['id']}" if base else "No base model; training from scratch")
+
+    # === Rows to read ===
+    if source == 'logs':
+        labels = load_labels(label_paths)
+        log_dir = os.path.abspath(log_dir)
+        same_log = base is not None and base.get('log_dir') == log_dir
+        position = tuple(base['position']) if same_log else (0, 0)
+        trained = dict(base.get('trained_sessions') or {}) if same_log else {}
+        # Re-read the segments before the position too: sessions there may have been labeled since
+        since = position if not rescan else (position[0] - rescan, 0) if position[0] > rescan else (0, 0)
+        # Fix the end now, so every pass XGBoost makes sees the same rows while the server keeps appending
+        until = end_position(log_dir)
+        print(f"{len(labels)} labels, {len(trained)} already trained on; reading {log_dir} from {since} to {until}")
+        consumed = {}
+        make_chunks = lambda: log_chunks(log_dir, labels, since, until, False, chunk_rows, trained, consumed)
+        holdout_chunks = log_chunks(log_dir, labels, since, until, True, chunk_rows)
+    else:
+        store_path = feature_store.split_path('train', parser, store_dir)
+        print(f"Reading {store_path}")
+        make_chunks = lambda: store_chunks(store_path, False, chunk_rows)
+        holdout_chunks = store_chunks(store_path, True, chunk_rows)
+
+    X_holdout, y_holdout, held = [], [], 0
+    for X, y in holdout_chunks:
+        take = min(len(y), HOLDOUT_MAX_ROWS - held)
+        X_holdout.append(X[:take])
+        y_holdout.append(y[:take])
+        held += take
+        if held >= HOLDOUT_MAX_ROWS:
+            break
+    X_holdout = np.concatenate(X_holdout) if X_holdout else np.empty((0, len(MODEL_FEATURES)), dtype=np.float32)
+    y_holdout = np.concatenate(y_holdout) if y_holdout else np.empty(0, dtype=np.int8)
+
+    if next(make_chunks(), None) is None:
+        print("No new labeled sessions to train on")
+        return 0
+
+    # === Update ===
+    before = holdout_metrics(booster, X_holdout, y_holdout)
+    owns_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='xgb_pages_')
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        new_booster, rows = update(booster, params, make_chunks, mode, rounds, cache_dir)
+    finally:
+        if owns_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    after = holdout_metrics(new_booster, X_holdout, y_holdout)
+    print(f"Trained on {rows} sessions ({mode}), {new_booster.num_boosted_rounds()} trees; "
+          f"holdout ({len(y_holdout)} sessions) before {before}, after {after}")
+
+    if before and after and after['log_loss'] > before['log_loss'] * (1 + MAX_LOSS_INCREASE) and not force:
+        print(f"Not saved: holdout log loss got worse by more than {MAX_LOSS_INCREASE:.0%} (--force to save anyway)")
+        return 1
+
+    fitted = None
+    if len(y_holdout) >= CALIBRATION_MIN_ROWS and len(np.unique(y_holdout)) == 2:
+        proba = new_booster.predict(xgb.DMatrix(X_holdout, feature_names=MODEL_FEATURES))
+        fitted = calibration.fit(proba, y_holdout, CALIBRATION_METHOD)
+    info = {'rows': rows, 'trees': new_booster.num_boosted_rounds(),
+            'base': base['id'] if base else None,
+            'base_trees': booster.num_boosted_rounds() if booster is not None else 0, 'calibration': fitted,
+            'holdout_rows': int(len(y_holdout)), 'holdout_before': before, 'trained_at': datetime.now().isoformat()}
+    if source == 'logs':
+        # Where the next update continuing from this version starts reading, and the sessions it will
+        # re-read that this lineage has already trained on
+        trained.update(consumed)
+        info.update(log_dir=log_dir, position=list(until),
+                    trained_sessions={s: seq for s, seq in trained.items() if seq >= until[0] - rescan})
+    elif base and 'log_dir' in base:
+        info.update(log_dir=base['log_dir'], position=base['position'],
+                    trained_sessions=base.get('trained_sessions') or {})
+
+    staging_dir = tempfile.mkdtemp(prefix='incremental_')
+    try:
+        artifact = os.path.join(staging_dir, 'xgboost_classifier.joblib')
+        save_classifier(new_booster, artifact)
+        model_id = model_registry.register(
+            artifact, 'xgboost', metrics={f'holdout_{k}': v for k, v in (after or {}).items()},
+            params={'mode': mode, 'rounds': rounds if mode == 'add' else 0}, source='incremental_train.py',
+            info=info, registry_dir=registry_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    staged = model_registry.stage(model_id, stage, registry_dir)
+    print(f"Registered as {model_id}" + (f" ({staged})" if staged else "") +
+          f" ({time.time() - start:.1f}s); POST /admin/reload-model to pick it up")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update the XGBoost model from labeled sessions, out of core.")
+    parser.add_argument('--source', choices=['logs', 'store'], default='logs',
+                        help="the server's session store (default) or the feature store's train split")
+    parser.add_argument('--labels', nargs='*', default=[], help="'session_id label' files for --source logs")
+    parser.add_argument('--log-dir', default=DEFAULT_LOG_DIR)
+    parser.add_argument('--model', default=model_registry.CHAMPION,
+                        help="registry alias (followed to its newest update), id or name (or a .joblib path) "
+                             "to continue from; trained from scratch if there is none")
+    parser.add_argument('--rescan', type=int, default=RESCAN_SEGMENTS,
+                        help="segments before the last update's position re-read for sessions labeled since "
+                             "(keep it constant: sessions trained on before a wider window are trained on again)")
+    parser.add_argument('--mode', choices=['add', 'refresh'], default='add')
+    parser.add_argument('--rounds', type=int, default=20, help="trees added per update (--mode add)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--cache-dir', default=None, help="external-memory page cache (default: a temp dir)")
+    parser.add_argument('--parser', choices=sorted(feature_store.PARSER_VERSIONS), default='stream')
+    parser.add_argument('--store-dir', default=feature_store.DEFAULT_STORE_DIR)
+    parser.add_argument('--force', action='store_true', help="save even if the holdout check fails")
+    parser.add_argument('--stage', choices=model_registry.STAGES, default=model_registry.SHADOW,
+                        help="alias for the new version (a shadow becomes champion if there is none)")
+    parser.add_argument('--registry-dir', default=model_registry.DEFAULT_REGISTRY_DIR)
+    args = parser.parse_args()
+
+    sys.exit(run(
+        source=args.source,
+        model_ref=args.model,
+        label_paths=args.labels,
+        log_dir=args.log_dir,
+        mode=args.mode,
+        rounds=args.rounds,
+        chunk_rows=args.chunk_rows,
+        cache_dir=args.cache_dir,
+        parser=args.parser,
+        store_dir=args.store_dir,
+        force=args.force,
+        stage=args.stage,
+        registry_dir=args.registry_dir,
+        rescan=args.rescan,
+    ))
@@ -0,0 +1,280 @@
+"""
+Local registry of versioned model artifacts.
+
+Every registered model gets an immutable version folder next to its metadata:
+
+    ModelRegistry/registry.json              aliases: {"champion": "xgboost/3", "shadow": "xgboost/4"}
+    ModelRegistry/xgboost/3/model.joblib
+    ModelRegistry/xgboost/3/metadata.json    features, label mapping, metrics, params, sha256, ...
+
+The server scores with the 'champion' model and, off the request path, with
+the 'shadow' model if one is set, logging every comparison to
+server/shadow_log.jsonl. train_model.py and incremental_train.py register what
+they train and stage it as the shadow (or as the champion while there is none).
+Nothing is overwritten: promoting a version only moves an alias.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py register savedModels/xgboost_classifier.joblib --name xgboost --stage champion
+    python model_registry.py report                 # shadow disagreement per champion/shadow pair
+    python model_registry.py promote xgboost/4      # make it the champion
+    python model_registry.py shadow xgboost/5       # or --clear
+Then POST /admin/reload-model to switch the server to the new aliases.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import joblib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session_features import LABEL_MAPPING, MODEL_FEATURES
+
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ModelRegistry')
+DEFAULT_SHADOW_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'shadow_log.jsonl')
+
+CHAMPION = 'champion'
+SHADOW = 'shadow'
+STAGES = ('none', SHADOW, CHAMPION)
+ARTIFACT = 'model.joblib'
+METADATA = 'metadata.json'
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def feature_names(model) -> list:
+    """The feature names a fitted model was trained with, or None if it didn't record them."""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is None and hasattr(model, 'get_booster'):
+        names = model.get_booster().feature_names
+    return list(names) if names is not None else None
+
+
+def default_label_mapping(model) -> dict:
+    """LABEL_MAPPING for encoded labels; {'human': 'Human', other: 'Bot'} for a model trained on label strings."""
+    classes = getattr(model, 'classes_', None)
+    if classes is not None and any(isinstance(c, str) for c in classes):
+        return {str(c): 'Human' if c == 'human' else 'Bot' for c in classes}
+    return LABEL_MAPPING
+
+
+# ---- Versions ----
+def versions(name: str, registry_dir: str = DEFAULT_REGISTRY_DIR) -> list:
+    folder = os.path.join(registry_dir, name)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(int(entry) for entry in os.listdir(folder) if entry.isdigit())
+
+
+def models(registry_dir: str = DEFAULT_REGISTRY_DIR) -> list:
+    """Every registered model id ('name/version'), oldest version first within each name."""
+    if not os.path.isdir(registry_dir):
+        return []
+    names = sorted(entry for entry in os.listdir(registry_dir) if os.path.isdir(os.path.join(registry_dir, entry)))
+    return [f"{name}/{version}" for name in names for version in versions(name, registry_dir)]
+
+
+def register(artifact_path: str, name: str, metrics: dict = None, params: dict = None, source: str = None,
+             label_mapping: dict = None, info: dict = None, registry_dir: str = DEFAULT_REGISTRY_DIR) -> str:
+    """Copies a saved model into a new version of `name` and returns its id ('name/version').
+
+    The feature schema is read from the model itself (MODEL_FEATURES if it didn't
+    record one); `label_mapping` maps its predict() outputs to server verdicts
+    (default_label_mapping if not given).
+    """
+    model = joblib.load(artifact_path)
+    label_mapping = default_label_mapping(model) if label_mapping is None else label_mapping
+
+    # Claim the next version number; makedirs fails if another registration got there first
+    while True:
+        version = (versions(name, registry_dir) or [0])[-1] + 1
+        folder = os.path.join(registry_dir, name, str(version))
+        try:
+            os.makedirs(folder)
+            break
+        except FileExistsError:
+            continue
+
+    shutil.copyfile(artifact_path, os.path.join(folder, ARTIFACT))
+    metadata = {
+        'id': f"{name}/{version}",
+        'name': name,
+        'version': version,
+        'created': datetime.now().isoformat(),
+        'source': source,
+        'model_type': type(model).__name__,
+        'sha256': _sha256(os.path.join(folder, ARTIFACT)),
+        'features': feature_names(model) or MODEL_FEATURES,
+        # A list of pairs, so class codes stay ints (or strings) through JSON
+        'label_mapping': [[code, label] for code, label in label_mapping.items()],
+        'metrics': metrics or {},
+        'params': params or {},
+        **(info or {}),
+    }
+    _write_json(os.path.join(folder, METADATA), metadata)
+    return metadata['id']
+
+
+def metadata(model_id: str, registry_dir: str = DEFAULT_REGISTRY_DIR) -> dict:
+    """A version's metadata, with label_mapping as a dict."""
+    with open(os.path.join(registry_dir, model_id, METADATA)) as f:
+        data = json.load(f)
+    data['label_mapping'] = {code: label for code, label in data['label_mapping']}
+    return data
+
+
+def load(model_id: str, registry_dir: str = DEFAULT_REGISTRY_DIR):
+    """(model, metadata) of a version; refuses an artifact that changed since it was registered."""
+    data = metadata(model_id, registry_dir)
+    path = os.path.join(registry_dir, model_id, ARTIFACT)
+    if _sha256(path) != data['sha256']:
+        raise ValueError(f"{path} doesn't match the checksum it was registered with")
+    return joblib.load(path), data
+
+
+# ---- Aliases ----
+def aliases(registry_dir: str = DEFAULT_REGISTRY_DIR) -> dict:
+    path = os.path.join(registry_dir, 'registry.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('aliases', {})
+
+
+def set_alias(alias: str, model_id: str = None, registry_dir: str = DEFAULT_REGISTRY_DIR):
+    """Points an alias at a version (or removes it if model_id is None)."""
+    if model_id is not None and not os.path.exists(os.path.join(registry_dir, model_id, METADATA)):
+        raise KeyError(f"No model {model_id} in {registry_dir}")
+    current = aliases(registry_dir)
+    if model_id is None:
+        current.pop(alias, None)
+    else:
+        current[alias] = model_id
+    os.makedirs(registry_dir, exist_ok=True)
+    _write_json(os.path.join(registry_dir, 'registry.json'), {'aliases': current, 'updated': datetime.now().isoformat()})
+
+
+def resolve(ref: str, registry_dir: str = DEFAULT_REGISTRY_DIR):
+    """Model id for an alias, a 'name/version' id or a name (its latest version); None if there is none."""
+    if ref in aliases(registry_dir):
+        return aliases(registry_dir)[ref]
+    if '/' in ref:
+        return ref if os.path.exists(os.path.join(registry_dir, ref, METADATA)) else None
+    found = versions(ref, registry_dir)
+    return f"{ref}/{found[-1]}" if found else None
+
+
+def promote(model_id: str, registry_dir: str = DEFAULT_REGISTRY_DIR):
+    """Makes a version the champion; it stops being the shadow if it was one."""
+    set_alias(CHAMPION, model_id, registry_dir)
+    if aliases(registry_dir).get(SHADOW) == model_id:
+        set_alias(SHADOW, None, registry_dir)
+
+
+def stage(model_id: str, stage_name: str, registry_dir: str = DEFAULT_REGISTRY_DIR) -> str:
+    """Stages a freshly registered version; returns the alias it got (None for 'none').
+
+    A shadow is promoted straight to champion while the registry has no champion.
+    """
+    if stage_name == 'none':
+        return None
+    if stage_name == CHAMPION or CHAMPION not in aliases(registry_dir):
+        promote(model_id, registry_dir)
+        return CHAMPION
+    set_alias(SHADOW, model_id, registry_dir)
+    return SHADOW
+
+
+# ---- Shadow report ----
+def shadow_report(log_path: str = DEFAULT_SHADOW_LOG) -> list:
+    """Per (champion, shadow) pair in the server's shadow log: comparisons, disagreement rate and verdict counts."""
+    pairs = {}
+    with open(log_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line the server was still writing
+            pair = pairs.setdefault((record['champion'], record['shadow']), {
+                'champion': record['champion'], 'shadow': record['shadow'], 'sessions': 0, 'disagreements': 0,
+                'decision_disagreements': 0, 'verdicts': {}, 'first': record['timestamp'], 'last': record['timestamp'],
+            })
+            pair['sessions'] += 1
+            pair['disagreements'] += record['champion_prediction'] != record['shadow_prediction']
+            pair['decision_disagreements'] += record.get('champion_decision') != record.get('shadow_decision')
+            key = f"{record['champion_prediction']}->{record['shadow_prediction']}"
+            pair['verdicts'][key] = pair['verdicts'].get(key, 0) + 1
+            pair['last'] = record['timestamp']
+    for pair in pairs.values():
+        pair['disagreement_rate'] = pair['disagreements'] / pair['sessions']
+    return list(pairs.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument('--registry-dir', default=DEFAULT_REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="registered versions, their metrics and aliases")
+    register_cmd = commands.add_parser('register', help="add a saved .joblib model as a new version")
+    register_cmd.add_argument('path')
+    register_cmd.add_argument('--name', required=True)
+    register_cmd.add_argument('--stage', choices=STAGES, default='none')
+    promote_cmd = commands.add_parser('promote', help="make a version the champion")
+    promote_cmd.add_argument('model_id')
+    shadow_cmd = commands.add_parser('shadow', help="score a version in shadow next to the champion")
+    shadow_cmd.add_argument('model_id', nargs='?')
+    shadow_cmd.add_argument('--clear', action='store_true')
+    report_cmd = commands.add_parser('report', help="shadow disagreement rates from the server's shadow log")
+    report_cmd.add_argument('--shadow-log', default=DEFAULT_SHADOW_LOG)
+    args = parser.parse_args()
+    registry_dir = args.registry_dir
+
+    if args.command == 'list':
+        current = aliases(registry_dir)
+        by_model = {model_id: alias for alias, model_id in current.items()}
+        for model_id in models(registry_dir):
+            data = metadata(model_id, registry_dir)
+            metrics = ', '.join(f"{k} {v:.4f}" for k, v in data['metrics'].items() if isinstance(v, float))
+            print(f"{model_id:<24} {by_model.get(model_id, ''):<9} {data['created'][:19]}  "
+                  f"{data['model_type']:<28} {data['source'] or '-':<21} {metrics}")
+        if not current:
+            print("No champion set: the server scores with savedModels/xgboost_classifier.joblib")
+    elif args.command == 'register':
+        model_id = register(args.path, args.name, source='model_registry.py', registry_dir=registry_dir)
+        print(f"Registered {args.path} as {model_id}" +
+              (f" ({stage(model_id, args.stage, registry_dir)})" if args.stage != 'none' else ""))
+    elif args.command == 'promote':
+        promote(args.model_id, registry_dir)
+        print(f"{args.model_id} is the champion; POST /admin/reload-model to serve it")
+    elif args.command == 'shadow':
+        if not args.clear and not args.model_id:
+            parser.error("shadow needs a model id or --clear")
+        set_alias(SHADOW, None if args.clear else args.model_id, registry_dir)
+        print(f"Shadow {'cleared' if args.clear else f'set to {args.model_id}'}; POST /admin/reload-model to apply it")
+    elif args.command == 'report':
+        if not os.path.exists(args.shadow_log):
+            print(f"No shadow log at {args.shadow_log}")
+            sys.exit(1)
+        for pair in shadow_report(args.shadow_log):
+            print(f"{pair['champion']} vs {pair['shadow']}: {pair['disagreements']}/{pair['sessions']} sessions "
+                  f"disagree ({pair['disagreement_rate']:.2%}), {pair['decision_disagreements']} on the decision, "
+                  f"{pair['first'][:19]} to {pair['last'][:19]}")
+            for verdicts, count in sorted(pair['verdicts'].items()):
+                print(f"    {verdicts:<14} {count}")
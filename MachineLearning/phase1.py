@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import re
+
+import pandas as pd
+
+# Feature extraction lives in the session_features package at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import session_features
+from session_features import from_parsed, trajectory_features
+
+# Shared helpers for the phase1 dataset, used by scripts.py,
+# savedModels/parse_test_data.py and pipeline.py.
+
+DEFAULT_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phase1')
+DEFAULT_SUBSET = 'humans_and_advanced_bots'
+
+
+def load_labels(base_path: str, split: str, data_subset_folder: str = DEFAULT_SUBSET) -> pd.DataFrame:
+    """Reads the 'session_id label' annotation file for a split ('train' or 'test')."""
+    annotations_path = os.path.join(base_path, 'annotations', data_subset_folder)
+    return pd.read_csv(os.path.join(annotations_path, split), sep=' ', names=['session_id', 'label'])
+
+
+def parse_mouse_data_from_file(session_id: str, data_subset_folder: str, base_path: str):
+    """
+    Reads and parses the mouse movement JSON file.
+    Safely extracts coordinates, timestamps, and user actions.
+    """
+    file_path = os.path.join(base_path, 'data', 'mouse_movements', data_subset_folder, session_id, 'mouse_movements.json')
+
+    try:
+        with open(file_path, 'r') as f:
+            text_data = f.read()
+            # Handle some broken formatting
+            text_data = text_data.replace('}"', '},"')
+
+        data = json.loads(text_data)
+
+        # === Coordinates ===
+        coords_str = data.get('mousemove_total_behaviour', '').strip()
+        try:
+            # Match coordinate pairs like [123, 456]
+            coord_pairs = re.findall(r'\[\s*(\d+)\s*,\s*(\d+)\s*\]', coords_str)
+            coords = [(int(x), int(y)) for x, y in coord_pairs]
+        except Exception as e:
+            print(f"Coordinate parse error for session {session_id}: {e}")
+            coords = []
+
+        # === Timestamps ===
+        times_str = data.get('mousemove_times', '')
+        try:
+            # Every run of digits; the '}"' repair above can leave junk around the last one
+            times = [int(t) for t in re.findall(r'\d+', times_str)]
+        except Exception as e:
+            print(f"Timestamp parse error for session {session_id}: {e}")
+            times = []
+
+        # === Actions (clicks, moves, etc.) ===
+        actions_str = data.get('total_behaviour', '')
+        try:
+            actions = re.findall(r'c\(\w\)|m\(\d+,\d+\)', actions_str)
+        except Exception as e:
+            print(f"Action parse error for session {session_id}: {e}")
+            actions = []
+
+        return {
+            'session_id': session_id,
+            'coordinates': coords,
+            'timestamps': times,
+            'actions': actions
+        }
+
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not parse file for session {session_id}. Error: {e}")
+        return None
+
+
+def create_feature_vector(session_id: str, parsed_data: dict):
+    """
+    MODEL_FEATURES and trajectory features of one session, from either parser's
+    output (this module's or session_features.mouse_parser's). All zeros if the
+    file couldn't be parsed.
+    """
+    session = from_parsed(session_id, parsed_data)
+    return {**session_features.create_feature_vector(session), **trajectory_features(session)}
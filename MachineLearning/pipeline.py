@@ -0,0 +1,208 @@
+"""
+Parallel, resumable feature extraction for the phase1 dataset.
+
+Replaces running scripts.py and savedModels/parse_test_data.py one after the
+other: the train and test splits are cut into chunks of session IDs, the
+chunks are parsed on a process pool, and every finished chunk is written to
+a checkpoint directory. Re-running after an interruption only processes the
+chunks that are missing.
+
+Usage:
+    python pipeline.py --base-path phase1 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import feature_cache
+import feature_store
+import phase1
+from phase1 import DEFAULT_BASE_PATH, DEFAULT_SUBSET, load_labels
+from session_features import mouse_parser
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ProcessedPhase1')
+
+
+PARSERS = {
+    # name -> (file parser, feature function)
+    'stream': (mouse_parser.parse_mouse_data_from_file, phase1.create_feature_vector),
+    'regex': (phase1.parse_mouse_data_from_file, phase1.create_feature_vector),
+}
+
+
+def _session_file(session_id: str, data_subset_folder: str, base_path: str) -> str:
+    return os.path.join(base_path, 'data', 'mouse_movements', data_subset_folder, session_id, 'mouse_movements.json')
+
+
+def extract_chunk(session_ids, data_subset_folder: str, base_path: str, parser: str = 'stream',
+                  cache_path: str = None):
+    """Worker: parse and featurize one chunk of sessions; returns (rows, cache hits)."""
+    parse, featurize = PARSERS[parser]
+    if cache_path is None:
+        rows = [featurize(session_id, parse(session_id, data_subset_folder, base_path)) for session_id in session_ids]
+        return rows, 0
+
+    # Key every session by its file contents and only extract the ones not cached yet
+    version = feature_store.version_tag(parser)
+    keys = {}
+    for session_id in session_ids:
+        try:
+            with open(_session_file(session_id, data_subset_folder, base_path), 'rb') as f:
+                keys[session_id] = feature_cache.content_key(f.read(), version)
+        except OSError:
+            keys[session_id] = None  # missing file: extracted (as zeros) every time
+
+    cache = feature_cache.FeatureCache(cache_path)
+    try:
+        cached = cache.get_many(key for key in keys.values() if key)
+        rows, new_entries = [], []
+        for session_id in session_ids:
+            key = keys[session_id]
+            if key in cached:
+                rows.append({'session_id': session_id, **cached[key]})
+                continue
+            features = featurize(session_id, parse(session_id, data_subset_folder, base_path))
+            rows.append(features)
+            if key:
+                new_entries.append((key, {k: v for k, v in features.items() if k != 'session_id'}))
+        cache.put_many(new_entries)
+    finally:
+        cache.close()
+    return rows, len(session_ids) - len(new_entries) - sum(1 for key in keys.values() if key is None)
+
+
+def _chunk_path(checkpoint_dir: str, split: str, index: int) -> str:
+    return os.path.join(checkpoint_dir, f"{split}-{index:05d}.csv")
+
+
+def _write_atomic(df: pd.DataFrame, path: str):
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _check_manifest(checkpoint_dir: str, manifest: dict):
+    """Start over if the checkpoints were produced with different chunking or another feature/parser version."""
+    path = os.path.join(checkpoint_dir, 'manifest.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            if json.load(f) == manifest:
+                return
+        print(f"Checkpoint settings changed, discarding {checkpoint_dir}")
+        shutil.rmtree(checkpoint_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(base_path: str, data_subset_folder: str, output_dir: str, checkpoint_dir: str,
+        splits, workers: int, chunk_size: int, parser: str = 'stream',
+        store_dir: str = feature_store.DEFAULT_STORE_DIR, write_csv: bool = False,
+        cache_path: str = feature_cache.DEFAULT_CACHE_PATH, cache_max_entries: int = 2_000_000):
+    labels = {split: load_labels(base_path, split, data_subset_folder) for split in splits}
+    _check_manifest(checkpoint_dir, {
+        'base_path': os.path.abspath(base_path),
+        'data_subset_folder': data_subset_folder,
+        'chunk_size': chunk_size,
+        'parser': parser,
+        'features': feature_store.version_tag(parser),  # a FEATURE_SET_VERSION/PARSER_VERSIONS bump invalidates them
+        'sessions': {split: len(df) for split, df in labels.items()},
+    })
+
+    # === Work units: (split, chunk index, session IDs) ===
+    chunks = {}
+    pending = []
+    for split, df in labels.items():
+        session_ids = df['session_id'].tolist()
+        chunks[split] = (len(session_ids) + chunk_size - 1) // chunk_size
+        for index in range(chunks[split]):
+            if not os.path.exists(_chunk_path(checkpoint_dir, split, index)):
+                pending.append((split, index, session_ids[index * chunk_size:(index + 1) * chunk_size]))
+
+    total_chunks = sum(chunks.values())
+    done = total_chunks - len(pending)
+    if done:
+        print(f"Resuming: {done}/{total_chunks} chunks already checkpointed")
+
+    # === Fan out over the process pool ===
+    if cache_path:
+        feature_cache.FeatureCache(cache_path).close()  # create the table before workers race to
+    start = time.time()
+    processed_sessions = 0
+    cache_hits = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(extract_chunk, session_ids, data_subset_folder, base_path, parser, cache_path):
+                (split, index, len(session_ids))
+            for split, index, session_ids in pending
+        }
+        for future in as_completed(futures):
+            split, index, size = futures[future]
+            rows, hits = future.result()
+            _write_atomic(pd.DataFrame(rows), _chunk_path(checkpoint_dir, split, index))
+            done += 1
+            processed_sessions += size
+            cache_hits += hits
+            elapsed = time.time() - start
+            rate = processed_sessions / elapsed if elapsed > 0 else 0
+            print(f"[{done}/{total_chunks} chunks] {processed_sessions} sessions this run "
+                  f"({cache_hits} from cache), {rate:.1f} sessions/s")
+
+    if cache_path:
+        cache = feature_cache.FeatureCache(cache_path)
+        evicted = cache.evict(cache_max_entries)
+        if evicted:
+            print(f"Feature cache: evicted {evicted} least recently used entries")
+        cache.close()
+
+    # === Merge checkpoints into the feature store train_model.py / test_model.py read ===
+    for split, df in labels.items():
+        features_df = pd.concat(
+            [pd.read_csv(_chunk_path(checkpoint_dir, split, index)) for index in range(chunks[split])],
+            ignore_index=True,
+        )
+        path = feature_store.write_split(features_df, df, split, parser, store_dir)
+        print(f"{split}: {len(features_df)} sessions saved to {path}")
+        if write_csv:
+            os.makedirs(output_dir, exist_ok=True)
+            features_df.to_csv(os.path.join(output_dir, f'{split}_features.csv'), index=False)
+            df.to_csv(os.path.join(output_dir, f'{split}_labels.csv'), index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract phase1 features for the train and test splits in parallel.")
+    parser.add_argument('--base-path', default=DEFAULT_BASE_PATH, help="path to the phase1 dataset folder")
+    parser.add_argument('--subset', default=DEFAULT_SUBSET, help="annotation/data subset folder")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="checkpoints and optional CSV output")
+    parser.add_argument('--checkpoint-dir', default=None, help="defaults to <output-dir>/checkpoints")
+    parser.add_argument('--store-dir', default=feature_store.DEFAULT_STORE_DIR, help="Parquet feature store")
+    parser.add_argument('--csv', action='store_true', help="also write the legacy ProcessedPhase1 CSVs")
+    parser.add_argument('--cache', default=feature_cache.DEFAULT_CACHE_PATH, help="content-hashed feature cache")
+    parser.add_argument('--no-cache', action='store_true', help="always re-extract every session")
+    parser.add_argument('--cache-max-entries', type=int, default=2_000_000)
+    parser.add_argument('--splits', nargs='+', default=['train', 'test'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=200, help="sessions per work unit")
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='stream',
+                        help="'stream' (session_features.mouse_parser, default) or the original 'regex' parser")
+    args = parser.parse_args()
+
+    run(
+        base_path=args.base_path,
+        data_subset_folder=args.subset,
+        output_dir=args.output_dir,
+        checkpoint_dir=args.checkpoint_dir or os.path.join(args.output_dir, 'checkpoints'),
+        splits=args.splits,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        parser=args.parser,
+        store_dir=args.store_dir,
+        write_csv=args.csv,
+        cache_path=None if args.no_cache else args.cache,
+        cache_max_entries=args.cache_max_entries,
+    )
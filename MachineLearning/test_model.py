@@ -1,26 +1,51 @@
-import pandas as pd
-import joblib
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import seaborn as sns
-import matplotlib.pyplot as plt
-
-# === Load test data ===
-features_df = pd.read_csv('ProcessedPhase1/test_features.csv')
-labels_df = pd.read_csv('ProcessedPhase1/test_labels.csv')
+"""
+Scores a registered model on the test split of the feature store.
 
-# === Merge by session_id (if applicable) ===
-df = pd.merge(features_df, labels_df, on='session_id')
+Evaluates the model the server would serve (the registry champion) unless
+--version names another alias, 'name/version' id or name (its latest version):
 
-X_test = df.drop(columns=["session_id", "label"])
-y_test = df["label"]
+    python test_model.py
+    python test_model.py --version shadow
+    python test_model.py --version random_forest
+"""
+import argparse
 
-# === Load trained model ===
-model = joblib.load("savedModels/random_forest_classifier.joblib")
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+import seaborn as sns
+import matplotlib.pyplot as plt
+import feature_store
+import model_registry
+
+parser = argparse.ArgumentParser(description="Evaluate a registered model on the test split.")
+parser.add_argument('--version', default=model_registry.CHAMPION,
+                    help="registry alias, 'name/version' id or model name (default: the champion)")
+parser.add_argument('--registry-dir', default=model_registry.DEFAULT_REGISTRY_DIR)
+parser.add_argument('--parser', choices=sorted(feature_store.PARSER_VERSIONS), default='stream',
+                    help="which feature store version to evaluate on")
+parser.add_argument('--store-dir', default=feature_store.DEFAULT_STORE_DIR)
+parser.add_argument('--no-plot', action='store_true', help="don't show the confusion matrix")
+args = parser.parse_args()
+
+# === Load the registered model ===
+model_id = model_registry.resolve(args.version, args.registry_dir)
+if model_id is None:
+    parser.error(f"No model {args.version!r} in {args.registry_dir}; train one with train_model.py")
+model, metadata = model_registry.load(model_id, args.registry_dir)
+label_mapping = metadata['label_mapping']
+
+# === Load test data (labels are joined in the feature store at write time) ===
+df = feature_store.read_split('test', columns=metadata['features'] + ['label'], parser=args.parser,
+                              store_dir=args.store_dir)
+X_test = df[metadata['features']]
+# Server verdicts, the same mapping train_model.py registers: 'human' -> Human, every bot class -> Bot
+y_test = np.where(df["label"].astype(str) == 'human', 'Human', 'Bot')
 
 # === Predict ===
-y_pred = model.predict(X_test)
+y_pred = np.array([label_mapping[code] for code in model.predict(X_test).tolist()])
 
 # === Evaluation ===
+print(f"=== {model_id} ({metadata['model_type']}, {metadata.get('feature_set') or '-'}) on {len(df)} test sessions ===")
 print("\n=== Accuracy ===")
 print(f"{accuracy_score(y_test, y_pred):.4f}")
 
@@ -28,40 +53,15 @@ print("\n=== Classification Report ===")
 print(classification_report(y_test, y_pred))
 
 # === Confusion Matrix ===
-cm = confusion_matrix(y_test, y_pred)
-plt.figure(figsize=(6, 4))
-sns.heatmap(cm, annot=True, fmt="d", cmap="Greens", xticklabels=["Human", "Bot"], yticklabels=["Human", "Bot"])
-plt.title("Test Set Confusion Matrix")
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.tight_layout()
-plt.show()
-
-
-from sklearn.preprocessing import LabelEncoder
-
-le = LabelEncoder()
-y_test_encoded = le.fit_transform(y_test)
-
-# Load GBM model
-model = joblib.load("savedModels/gradient_boosting_classifier.joblib")
-
-# Predict
-y_pred = model.predict(X_test)
-
-# Evaluation
-print("\n=== Accuracy GBM ===")
-print(f"{accuracy_score(y_test_encoded, y_pred):.4f}")
-
-print("\n=== Classification Report GBM ===")
-print(classification_report(y_test_encoded, y_pred, target_names=le.classes_))
-
-# Confusion matrix
-cm = confusion_matrix(y_test_encoded, y_pred)
-plt.figure(figsize=(6, 4))
-sns.heatmap(cm, annot=True, fmt="d", cmap="Blues", xticklabels=le.classes_, yticklabels=le.classes_)
-plt.title("GBM: Test Set Confusion Matrix")
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.tight_layout()
-plt.show()
+labels = ["Human", "Bot"]
+cm = confusion_matrix(y_test, y_pred, labels=labels)
+print("\n=== Confusion Matrix (rows: actual, columns: predicted) ===")
+print(cm)
+if not args.no_plot:
+    plt.figure(figsize=(6, 4))
+    sns.heatmap(cm, annot=True, fmt="d", cmap="Greens", xticklabels=labels, yticklabels=labels)
+    plt.title(f"{model_id}: Test Set Confusion Matrix")
+    plt.xlabel("Predicted")
+    plt.ylabel("Actual")
+    plt.tight_layout()
+    plt.show()
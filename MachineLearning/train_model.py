@@ -1,134 +1,433 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+"""
+Headless, parallel training for the three session classifiers.
+
+Replaces fitting RandomForest, XGBoost and GradientBoosting one after another
+on a single train/validation split (with a plt.show() between each):
+
+1. The train split is cut into stratified k folds once. The fold arrays are
+   materialized to FoldCache/ as .npy files, keyed by the feature store file
+   and the fold settings, so later runs and every worker memory-map the same
+   arrays instead of re-splitting and pickling the data.
+2. Each model gets a bounded hyperparameter search: its current default
+   configuration plus up to --budget - 1 configurations sampled from its grid.
+   Every (model, configuration, fold) fit is one task on a process pool.
+3. The boosters stop early: XGBoost on a holdout carved out of each training
+   fold, GradientBoosting with its own n_iter_no_change holdout. The final
+   number of rounds is the median of the folds' stopping points.
+4. The best configuration of each model (mean ROC AUC over the folds) is refit
+   on the whole train split, in parallel. Its out-of-fold probabilities are
+   used to fit a post-hoc calibration (--calibration, default sigmoid, see
+   calibration.py). The server applies it before thresholding scores. A
+   calibration whose cross-fitted log loss is worse than the raw
+   probabilities' is reported but not registered.
+5. savedModels/leaderboard.json records every configuration's CV metrics and
+   the time spent per model.
+6. Each refit model is saved to a temporary folder and registered from there
+   as a new version in the model registry (model_registry.py) with its CV
+   metrics and calibration; the XGBoost model is staged (--stage, default
+   shadow) for the server to score next to the champion. The artifacts in
+   savedModels/ are never overwritten.
+
+--features extended trains on the trajectory statistics as well as the five
+base features (feature_store.FEATURE_SETS), to measure what they add. Those
+models are registered without an alias: the server only scores the base
+features, so it can't serve them. Compare them with test_model.py --version.
+
+Usage:
+    python train_model.py --workers 8
+    python train_model.py --models xgboost --folds 3 --budget 4 --no-save
+    python train_model.py --features extended
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-
-
-#Loading features and labels
-
-features_df = pd.read_csv('ProcessedPhase1/train_features.csv')
-labels_df = pd.read_csv('ProcessedPhase1/train_labels.csv')
-
-df = pd.merge(features_df, labels_df, on='session_id')
-
-X = df.drop(columns=["session_id", "label"])
-y = df["label"]
-
-# === Train-test split ===
-X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.3, random_state=42)
-
-# === Train model ===
-RandomClf = RandomForestClassifier(n_estimators=100, random_state=42)
-RandomClf.fit(X_train, y_train)
-
-# === Save the model ===
-joblib.dump(RandomClf, "savedModels/random_forest_classifier.joblib")
-
-# === Predictions & Evaluation ===
-y_pred = RandomClf.predict(X_val)
-
-print("\n=== Accuracy ===")
-print(f"{accuracy_score(y_val, y_pred):.4f}")
-
-print("\n=== Classification Report ===")
-print(classification_report(y_val, y_pred))
-
-# === Confusion Matrix ===
-cm = confusion_matrix(y_val, y_pred)
-plt.figure(figsize=(6, 4))
-sns.heatmap(cm, annot=True, fmt="d", cmap="Blues", xticklabels=["Human", "Bot"], yticklabels=["Human", "Bot"])
-plt.title("Confusion Matrix")
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.tight_layout()
-plt.show()
-
-# === Feature Importances ===
-importances = RandomClf.feature_importances_
-indices = np.argsort(importances)[::-1]
-feature_names = X.columns[indices]
-
-plt.figure(figsize=(10, 6))
-plt.title("Feature Importances")
-plt.bar(range(len(importances)), importances[indices], align="center")
-plt.xticks(range(len(importances)), feature_names, rotation=90)
-plt.tight_layout()
-plt.show()
-
-
-#=====xGBoost Classifier=====
-
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, brier_score_loss, log_loss, roc_auc_score
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
 from sklearn.preprocessing import LabelEncoder
-
-# Encode string labels to integers
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
-
-# Now split using the encoded labels
-X_train, X_val, y_train, y_val = train_test_split(X, y_encoded, test_size=0.3, random_state=42)
-
-
 from xgboost import XGBClassifier
 
-# === Train XGBoost model ===
-xgb_clf = XGBClassifier(use_label_encoder=False, eval_metric='mlogloss', random_state=42)
-xgb_clf.fit(X_train, y_train)
-
-# === Save XGBoost model ===
-joblib.dump(xgb_clf, "savedModels/xgboost_classifier.joblib")
-
-# === Predictions & Evaluation for XGBoost ===
-y_pred_xgb = xgb_clf.predict(X_val)
-
-print("\n=== [XGBoost] Accuracy ===")
-print(f"{accuracy_score(y_val, y_pred_xgb):.4f}")
-
-print("\n=== [XGBoost] Classification Report ===")
-print(classification_report(y_val, y_pred_xgb))
-
-# === Confusion Matrix for XGBoost ===
-cm_xgb = confusion_matrix(y_val, y_pred_xgb)
-plt.figure(figsize=(6, 4))
-sns.heatmap(cm_xgb, annot=True, fmt="d", cmap="Greens", xticklabels=["Human", "Bot"], yticklabels=["Human", "Bot"])
-plt.title("Confusion Matrix (XGBoost)")
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.tight_layout()
-plt.show()
-
-
-#=====Gradient Boosting Classifier=====
-
-from sklearn.ensemble import GradientBoostingClassifier
-
-# Instantiate and train
-gbm_clf = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=3, random_state=42)
-gbm_clf.fit(X_train, y_train)
-joblib.dump(gbm_clf, "savedModels/gradient_boosting_classifier.joblib")
-
-y_pred = gbm_clf.predict(X_val)
-
-# Evaluate
-print("Accuracy GBM:", accuracy_score(y_val, y_pred))
-print("Classification Report GBM:\n", classification_report(y_val, y_pred))
-print("Confusion Matrix GBM:\n", confusion_matrix(y_val, y_pred))
-
-importances = gbm_clf.feature_importances_
-indices = np.argsort(importances)[::-1]
-features = X.columns  # if X is a DataFrame
-
-plt.figure(figsize=(10,6))
-plt.title("Feature Importances")
-plt.bar(range(len(importances)), importances[indices])
-plt.xticks(range(len(importances)), [features[i] for i in indices], rotation=90)
-plt.tight_layout()
-plt.show()
-
-from sklearn.metrics import roc_auc_score
-
-y_proba = gbm_clf.predict_proba(X_val)[:,1]
-print("ROC AUC Score:", roc_auc_score(y_val, y_proba))
+import calibration
+import feature_store
+import model_registry
+
+SAVED_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'savedModels')
+FOLD_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FoldCache')
+LEADERBOARD_PATH = os.path.join(SAVED_MODELS_DIR, 'leaderboard.json')
+
+MAX_ROUNDS = 2000           # boosting rounds before early stopping
+EARLY_STOPPING_ROUNDS = 30  # rounds without improvement on the holdout
+EARLY_STOPPING_FRACTION = 0.1
+SEED = 42
+
+# name -> (estimator class, fixed parameters, default configuration, search grid, early stopping)
+# The default configuration is the one train_model.py has always used, so it is always evaluated
+# (for the boosters, with the number of rounds left to early stopping).
+CANDIDATES = {
+    'random_forest': (
+        RandomForestClassifier, {'random_state': SEED, 'n_jobs': 1},
+        {'n_estimators': 100},
+        {'n_estimators': [100, 200, 400], 'max_depth': [None, 8, 16], 'min_samples_leaf': [1, 2, 5],
+         'max_features': ['sqrt', 0.5, None]},
+        None,
+    ),
+    'xgboost': (
+        XGBClassifier, {'random_state': SEED, 'n_jobs': 1, 'eval_metric': 'logloss'},
+        {},
+        {'max_depth': [3, 4, 6], 'learning_rate': [0.03, 0.1, 0.3], 'subsample': [0.8, 1.0],
+         'colsample_bytree': [0.8, 1.0], 'min_child_weight': [1, 5]},
+        'holdout',
+    ),
+    'gradient_boosting': (
+        GradientBoostingClassifier, {'random_state': SEED},
+        {'learning_rate': 0.1, 'max_depth': 3},
+        {'learning_rate': [0.05, 0.1, 0.2], 'max_depth': [2, 3, 4], 'subsample': [0.8, 1.0]},
+        'n_iter_no_change',
+    ),
+}
+
+# RandomForest is saved with the string labels test_model.py compares against; the
+# boosters with LabelEncoder codes (0 = advanced_bot -> 'Bot', 1 = human -> 'Human' in the server)
+STRING_LABEL_MODELS = {'random_forest'}
+STAGED_MODEL = 'xgboost'  # the model the server serves; --stage applies to it
+
+
+# ---- Fold cache ----
+def _fold_key(store_path: str, columns, n_folds: int, seed: int) -> str:
+    stat = os.stat(store_path)
+    settings = [os.path.abspath(store_path), stat.st_size, stat.st_mtime_ns, list(columns), n_folds, seed,
+                EARLY_STOPPING_FRACTION]
+    return hashlib.sha1(json.dumps(settings).encode()).hexdigest()[:16]
+
+
+def materialize_folds(columns, n_folds: int, seed: int = SEED, parser: str = 'stream',
+                      store_dir: str = feature_store.DEFAULT_STORE_DIR, cache_dir: str = FOLD_CACHE_DIR) -> str:
+    """Writes (once) the full train split and every fold's arrays as .npy files; returns their folder."""
+    store_path = feature_store.split_path('train', parser, store_dir)
+    if not os.path.exists(store_path):
+        raise FileNotFoundError(f"No train features at {store_path}; run pipeline.py first")
+    key = _fold_key(store_path, columns, n_folds, seed)
+    folder = os.path.join(cache_dir, f"{feature_store.version_tag(parser)}-k{n_folds}-{key}")
+    if os.path.exists(os.path.join(folder, 'meta.json')):
+        return folder
+
+    df = feature_store.read_split('train', columns=list(columns) + ['label'], parser=parser, store_dir=store_dir)
+    encoder = LabelEncoder()
+    X = np.ascontiguousarray(df[list(columns)].to_numpy(dtype=np.float64))
+    y = encoder.fit_transform(df['label'].astype(str)).astype(np.int8)
+
+    tmp_folder = folder + '.tmp'
+    os.makedirs(tmp_folder, exist_ok=True)
+    np.save(os.path.join(tmp_folder, 'X.npy'), X)
+    np.save(os.path.join(tmp_folder, 'y.npy'), y)
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    fit_rows = []
+    for fold, (train_idx, val_idx) in enumerate(folds.split(X, y)):
+        fit_idx, holdout_idx = train_test_split(train_idx, test_size=EARLY_STOPPING_FRACTION,
+                                                stratify=y[train_idx], random_state=seed)
+        # Training rows ordered fit-then-holdout: the first fit_rows are what XGBoost fits on
+        train_idx = np.concatenate([fit_idx, holdout_idx])
+        fit_rows.append(len(fit_idx))
+        arrays = {'X_train': X[train_idx], 'y_train': y[train_idx], 'X_val': X[val_idx], 'y_val': y[val_idx]}
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_folder, f'fold{fold}_{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_folder, 'meta.json'), 'w') as f:
+        json.dump({'store': store_path, 'columns': list(columns), 'rows': len(y), 'folds': n_folds, 'seed': seed,
+                   'fit_rows': fit_rows, 'classes': encoder.classes_.tolist(),
+                   'created': datetime.now().isoformat()}, f, indent=2)
+    os.replace(tmp_folder, folder)
+    return folder
+
+
+def _load(folder: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+
+
+def _meta(folder: str) -> dict:
+    with open(os.path.join(folder, 'meta.json')) as f:
+        return json.load(f)
+
+
+# ---- Fitting ----
+def _build(name: str, params: dict, rounds: int = None):
+    estimator, fixed, _, _, early_stopping = CANDIDATES[name]
+    params = {**fixed, **params}
+    if early_stopping == 'holdout':
+        params.update(n_estimators=rounds or MAX_ROUNDS)
+        if rounds is None:
+            params.update(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    elif early_stopping == 'n_iter_no_change' and rounds is None:
+        params.update(n_estimators=MAX_ROUNDS, n_iter_no_change=EARLY_STOPPING_ROUNDS,
+                      validation_fraction=EARLY_STOPPING_FRACTION)
+    elif early_stopping == 'n_iter_no_change':
+        params.update(n_estimators=rounds)
+    return estimator(**params)
+
+
+def fit_fold(name: str, config_id: int, params: dict, folder: str, fold: int) -> dict:
+    """Worker: fits one configuration on one fold and scores it on the fold's validation rows."""
+    X_train, y_train = _load(folder, f'fold{fold}_X_train'), _load(folder, f'fold{fold}_y_train')
+    X_val, y_val = _load(folder, f'fold{fold}_X_val'), _load(folder, f'fold{fold}_y_val')
+    model = _build(name, params)
+
+    start = time.perf_counter()
+    rounds = None
+    if CANDIDATES[name][4] == 'holdout':
+        n_fit = _meta(folder)['fit_rows'][fold]
+        model.fit(X_train[:n_fit], y_train[:n_fit], eval_set=[(X_train[n_fit:], y_train[n_fit:])], verbose=False)
+        rounds = int(model.best_iteration) + 1
+    else:
+        model.fit(X_train, y_train)
+        if CANDIDATES[name][4] == 'n_iter_no_change':
+            rounds = int(model.n_estimators_)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = model.predict_proba(X_val)[:, 1]
+    predict_s = time.perf_counter() - start
+    return {
+        'model': name, 'config_id': config_id, 'fold': fold,
+        'roc_auc': float(roc_auc_score(y_val, proba)),
+        'accuracy': float(accuracy_score(y_val, proba >= 0.5)),
+        'log_loss': float(log_loss(y_val, np.clip(proba, 1e-7, 1 - 1e-7), labels=[0, 1])),
+        'rounds': rounds, 'fit_s': fit_s, 'predict_s': predict_s,
+        'proba': proba.astype(np.float32),  # out-of-fold predictions, for calibrating the chosen configuration
+    }
+
+
+def refit(name: str, params: dict, rounds: int, folder: str, save_path: str = None) -> dict:
+    """Worker: fits the chosen configuration on the whole train split and saves it."""
+    meta = _meta(folder)
+    # Fit on a DataFrame so the saved model keeps its feature names, like the models it replaces
+    X = pd.DataFrame(np.asarray(_load(folder, 'X')), columns=meta['columns'])
+    y = np.asarray(_load(folder, 'y'))
+    if name in STRING_LABEL_MODELS:
+        y = np.array(meta['classes'])[y]
+    model = _build(name, params, rounds)
+
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_s = time.perf_counter() - start
+    if save_path:
+        joblib.dump(model, save_path)
+    return {'model': name, 'refit_s': fit_s, 'saved_to': save_path}
+
+
+def calibrate(name: str, config_id: int, results: list, folder: str, method: str):
+    """(calibration, metrics) fit on a configuration's out-of-fold predictions; metrics are cross-fitted.
+
+    The calibration is None if it makes the cross-fitted log loss worse than the raw probabilities'.
+    """
+    folds = sorted((r for r in results if r['model'] == name and r['config_id'] == config_id), key=lambda r: r['fold'])
+    fold_proba = [r['proba'].astype(np.float64) for r in folds]
+    fold_y = [np.asarray(_load(folder, f"fold{r['fold']}_y_val")) for r in folds]
+    proba, y = np.concatenate(fold_proba), np.concatenate(fold_y)
+    calibrated = calibration.cross_fitted(fold_proba, fold_y, method)
+    metrics = {
+        'method': method,
+        'brier_raw': float(brier_score_loss(y, proba)),
+        'brier_calibrated': float(brier_score_loss(y, calibrated)),
+        'log_loss_raw': float(log_loss(y, np.clip(proba, 1e-7, 1 - 1e-7), labels=[0, 1])),
+        'log_loss_calibrated': float(log_loss(y, np.clip(calibrated, 1e-7, 1 - 1e-7), labels=[0, 1])),
+    }
+    metrics['applied'] = metrics['log_loss_calibrated'] <= metrics['log_loss_raw']
+    return calibration.fit(proba, y, method) if metrics['applied'] else None, metrics
+
+
+# ---- Search ----
+def configurations(name: str, budget: int, seed: int = SEED) -> list:
+    """The default configuration plus up to budget - 1 distinct ones sampled from the grid."""
+    _, _, default, grid, _ = CANDIDATES[name]
+    configs = [default]
+    for params in ParameterSampler(grid, n_iter=max(0, budget - 1), random_state=seed):
+        params = {**default, **params}
+        if params not in configs:
+            configs.append(params)
+    return configs[:budget]
+
+
+def summarize(results: list, configs: dict) -> dict:
+    """Per model: configurations ranked by mean ROC AUC, with fold metrics averaged."""
+    board = {}
+    for name, model_configs in configs.items():
+        rows = []
+        for config_id, params in enumerate(model_configs):
+            folds = [r for r in results if r['model'] == name and r['config_id'] == config_id]
+            if not folds:
+                continue
+            rounds = [r['rounds'] for r in folds if r['rounds'] is not None]
+            rows.append({
+                'config_id': config_id,
+                'params': params,
+                'roc_auc': float(np.mean([r['roc_auc'] for r in folds])),
+                'roc_auc_std': float(np.std([r['roc_auc'] for r in folds])),
+                'accuracy': float(np.mean([r['accuracy'] for r in folds])),
+                'log_loss': float(np.mean([r['log_loss'] for r in folds])),
+                'rounds': int(np.median(rounds)) if rounds else None,
+                'fit_s': float(sum(r['fit_s'] for r in folds)),
+                'predict_s': float(sum(r['predict_s'] for r in folds)),
+            })
+        rows.sort(key=lambda row: (-row['roc_auc'], row['log_loss']))
+        board[name] = rows
+    return board
+
+
+def run(models, n_folds: int, budget: int, workers: int, parser: str = 'stream',
+        store_dir: str = feature_store.DEFAULT_STORE_DIR, save: bool = True,
+        leaderboard_path: str = LEADERBOARD_PATH, seed: int = SEED, stage: str = model_registry.SHADOW,
+        registry_dir: str = model_registry.DEFAULT_REGISTRY_DIR, calibration_method: str = 'sigmoid',
+        features: str = 'base') -> dict:
+    start = time.time()
+    columns = feature_store.FEATURE_SETS[features]
+    folder = materialize_folds(columns, n_folds, seed, parser, store_dir)
+    meta = _meta(folder)
+    print(f"{meta['rows']} training sessions, {n_folds} folds cached in {folder}")
+
+    configs = {name: configurations(name, budget, seed) for name in models}
+    tasks = [(name, config_id, params, fold)
+             for name in models for config_id, params in enumerate(configs[name]) for fold in range(n_folds)]
+    print(f"Cross-validating {len(tasks)} fits ({', '.join(f'{n}: {len(c)} configs' for n, c in configs.items())}) "
+          f"on {workers} workers")
+
+    # === Cross-validation ===
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_fold, name, config_id, params, folder, fold)
+                   for name, config_id, params, fold in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if done % max(1, len(tasks) // 10) == 0 or done == len(tasks):
+                print(f"[{done}/{len(tasks)} fits] {time.time() - start:.1f}s")
+    cv_s = time.time() - start
+    board = summarize(results, configs)
+    calibrations = {name: calibrate(name, board[name][0]['config_id'], results, folder, calibration_method)
+                    for name in models} if calibration_method != 'none' else {}
+
+    # === Refit each model's best configuration on the whole train split ===
+    refits = {}
+    staging_dir = tempfile.mkdtemp(prefix='refit_') if save else None  # registered from here, then removed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(refit, name, board[name][0]['params'], board[name][0]['rounds'], folder,
+                        os.path.join(staging_dir, f'{name}_classifier.joblib') if save else None): name
+            for name in models
+        }
+        for future in as_completed(futures):
+            refits[futures[future]] = future.result()
+
+    leaderboard = {
+        'created': datetime.now().isoformat(),
+        'feature_store': meta['store'],
+        'feature_set': feature_store.version_tag(parser),
+        'features': columns,
+        'rows': meta['rows'],
+        'folds': n_folds,
+        'budget': budget,
+        'workers': workers,
+        'wall_s': time.time() - start,
+        'cv_wall_s': cv_s,
+        'models': {
+            name: {
+                'best': board[name][0],
+                'cv_fit_s': sum(row['fit_s'] for row in board[name]),
+                'calibration': calibrations[name][1] if name in calibrations else None,
+                'refit_s': refits[name]['refit_s'],
+                'configs': board[name],
+            }
+            for name in models
+        },
+    }
+    ranking = sorted(models, key=lambda name: -board[name][0]['roc_auc'])
+    leaderboard['ranking'] = ranking
+
+    # === Register the refit models ===
+    if save:
+        verdicts = ['Human' if label == 'human' else 'Bot' for label in meta['classes']]
+        for name in models:
+            best = board[name][0]
+            label_mapping = dict(zip(meta['classes'] if name in STRING_LABEL_MODELS else range(len(verdicts)), verdicts))
+            model_id = model_registry.register(
+                refits[name]['saved_to'], name, source='train_model.py',
+                metrics={k: best[k] for k in ('roc_auc', 'roc_auc_std', 'accuracy', 'log_loss')},
+                params={**best['params'], 'rounds': best['rounds']}, label_mapping=label_mapping,
+                info={'feature_set': leaderboard['feature_set'], 'rows': meta['rows'], 'folds': n_folds,
+                      'calibration': calibrations[name][0] if name in calibrations else None,
+                      'calibration_metrics': calibrations[name][1] if name in calibrations else None},
+                registry_dir=registry_dir)
+            leaderboard['models'][name]['registered_as'] = model_id
+            if name == STAGED_MODEL and features == 'base':
+                leaderboard['models'][name]['stage'] = model_registry.stage(model_id, stage, registry_dir)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(os.path.abspath(leaderboard_path)), exist_ok=True)
+    with open(leaderboard_path, 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+
+    print(f"\n{'model':<20} {'ROC AUC':>16} {'accuracy':>9} {'log loss':>9} {'rounds':>7} {'CV fit s':>9} {'refit s':>8}")
+    for name in ranking:
+        best, entry = board[name][0], leaderboard['models'][name]
+        print(f"{name:<20} {best['roc_auc']:>8.4f} ± {best['roc_auc_std']:.4f} {best['accuracy']:>9.4f} "
+              f"{best['log_loss']:>9.4f} {best['rounds'] if best['rounds'] else '-':>7} "
+              f"{entry['cv_fit_s']:>9.1f} {entry['refit_s']:>8.1f}")
+    for name in ranking:
+        cal = leaderboard['models'][name]['calibration']
+        if cal:
+            print(f"{name}: {cal['method']} calibration, out-of-fold Brier {cal['brier_raw']:.4f} -> "
+                  f"{cal['brier_calibrated']:.4f}, log loss {cal['log_loss_raw']:.4f} -> {cal['log_loss_calibrated']:.4f}"
+                  + ("" if cal['applied'] else " (worse, not applied)"))
+    print(f"\nLeaderboard written to {leaderboard_path} ({leaderboard['wall_s']:.1f}s total)")
+    if save:
+        for name in models:
+            entry = leaderboard['models'][name]
+            print(f"Registered {name} as {entry['registered_as']}" + (f" ({entry['stage']})" if entry.get('stage') else ''))
+        if features != 'base':
+            print(f"Not staged: the server can't score {features} features")
+    return leaderboard
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cross-validate, tune and refit the session classifiers in parallel.")
+    parser.add_argument('--models', nargs='+', choices=list(CANDIDATES), default=list(CANDIDATES))
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--budget', type=int, default=8, help="configurations evaluated per model")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--parser', choices=sorted(feature_store.PARSER_VERSIONS), default='stream',
+                        help="which feature store version to train on")
+    parser.add_argument('--store-dir', default=feature_store.DEFAULT_STORE_DIR)
+    parser.add_argument('--features', choices=list(feature_store.FEATURE_SETS), default='base',
+                        help="feature columns to train on; 'extended' models are registered without an alias")
+    parser.add_argument('--leaderboard', default=LEADERBOARD_PATH)
+    parser.add_argument('--no-save', action='store_true', help="don't save or register the models")
+    parser.add_argument('--stage', choices=model_registry.STAGES, default=model_registry.SHADOW,
+                        help="alias for the new XGBoost version (a shadow becomes champion if there is none)")
+    parser.add_argument('--registry-dir', default=model_registry.DEFAULT_REGISTRY_DIR)
+    parser.add_argument('--calibration', choices=calibration.METHODS + ('none',), default='sigmoid',
+                        help="post-hoc calibration fit on the out-of-fold predictions (not kept if it makes "
+                             "their cross-fitted log loss worse)")
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    run(
+        models=args.models,
+        n_folds=args.folds,
+        budget=args.budget,
+        workers=args.workers,
+        parser=args.parser,
+        store_dir=args.store_dir,
+        save=not args.no_save,
+        leaderboard_path=args.leaderboard,
+        seed=args.seed,
+        stage=args.stage,
+        registry_dir=args.registry_dir,
+        calibration_method=args.calibration,
+        features=args.features,
+    )
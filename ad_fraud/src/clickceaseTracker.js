@@ -8,10 +8,37 @@ let startTime;
 // New: Track unique URLs hovered over by mouse
 const hoveredUrls = new Set();
 
+// Send sessions in the compact CCS1 binary format (see server/wire.py),
+// gzipped when the browser supports CompressionStream. Uploads made while the
+// page unloads are sent uncompressed: gzip is asynchronous and the page is
+// usually gone before it finishes. Set to false to send the original JSON
+// payload.
+const USE_BINARY_PAYLOAD = true;
+const WIRE_CONTENT_TYPE = "application/x-clickcease-session";
+const ACTION_CODES = { "c(l)": 1, "c(r)": 2, "c(m)": 3 };
+
+// Upload the session in chunks while the user is on the page, so the server
+// can score it before it ends: buffered events are flushed every
+// FLUSH_INTERVAL_MS or once FLUSH_MAX_EVENTS have piled up, and endTracking()
+// sends the last chunk. Set to false to send one payload at the end instead.
+const USE_CHUNKED_UPLOAD = true;
+const FLUSH_INTERVAL_MS = 5000;
+const FLUSH_MAX_EVENTS = 500;
+const SERVER_URL = "http://localhost:5000";
+
+let chunkSeq = 0;
+let flushTimer = null;
+let uploadChain = Promise.resolve(); // chunks are sent one after another, in order
+let queuedChunks = []; // flushed chunks waiting for the upload before them to finish
+
 function startTracking() {
   console.log("Tracking started for session:", sessionId);
   startTime = Date.now();
 
+  if (USE_CHUNKED_UPLOAD) {
+    flushTimer = setInterval(() => flushChunk(false), FLUSH_INTERVAL_MS);
+  }
+
   document.addEventListener("mousemove", handleMousemove);
   document.addEventListener("click", handleClick);
   document.addEventListener("contextmenu", handleRightClick);
@@ -29,20 +56,67 @@ function startTracking() {
 function endTracking() {
   console.log("Ending tracking for session:", sessionId);
 
+  if (USE_CHUNKED_UPLOAD) {
+    clearInterval(flushTimer);
+    flushChunk(true);
+    return;
+  }
+
+  sendSession(`${SERVER_URL}/log-visit`, totalBehaviour, mousemoveTimes, mousemoveTotalBehaviour, true);
+}
+
+// Sends the events buffered since the last flush and starts a new buffer
+function flushChunk(final) {
+  if (!final && totalBehaviour.length === 0 && mousemoveTimes.length === 0) return;
+
+  queuedChunks.push({ actions: totalBehaviour, times: mousemoveTimes, moves: mousemoveTotalBehaviour });
+  totalBehaviour = [];
+  mousemoveTimes = [];
+  mousemoveTotalBehaviour = [];
+
+  if (final) {
+    // The page is unloading: send the last chunk now, together with any chunks
+    // still queued, instead of waiting behind the uploads in flight. Seq numbers
+    // are taken at send time, so the final chunk still has the highest one.
+    const chunks = queuedChunks;
+    queuedChunks = [];
+    sendSession(chunkUrl(true), chunks.flatMap(c => c.actions), chunks.flatMap(c => c.times),
+      chunks.flatMap(c => c.moves), true);
+    return;
+  }
+
+  uploadChain = uploadChain.then(() => {
+    const chunk = queuedChunks.shift(); // gone if the final chunk already took it
+    return chunk && sendSession(chunkUrl(false), chunk.actions, chunk.times, chunk.moves);
+  });
+}
+
+function chunkUrl(final) {
+  return `${SERVER_URL}/log-visit/chunk?seq=${chunkSeq++}${final ? "&final=1" : ""}`;
+}
+
+// `unloading`: the page is going away, so the request must start before this returns
+function sendSession(url, actions, times, moves, unloading = false) {
+  if (USE_BINARY_PAYLOAD) {
+    return sendBinaryPayload(url, actions, times, moves, unloading);
+  }
+
   const payload = {
     session_id: sessionId,
-    total_behaviour: totalBehaviour,
-    mousemove_times: mousemoveTimes,
-    mousemove_total_behaviour: mousemoveTotalBehaviour,
+    total_behaviour: actions,
+    mousemove_times: times,
+    mousemove_total_behaviour: moves,
     Mousemove_visited_urls: hoveredUrls.size // New field added
   };
 
-  fetch("http://localhost:5000/log-visit", {
+  return postPayload(url, JSON.stringify(payload), { "Content-Type": "application/json" });
+}
+
+function postPayload(url, body, headers) {
+  return fetch(url, {
     method: "POST",
-    headers: {
-      "Content-Type": "application/json"
-    },
-    body: JSON.stringify(payload),
+    headers,
+    body,
     keepalive: true
   }).then(res => {
     if (!res.ok) {
@@ -55,24 +129,97 @@ function endTracking() {
   });
 }
 
+// CCS1 layout: magic, session id, counts, int16 coordinate deltas,
+// uint32 time deltas, then 2-bit action codes packed four per byte.
+function encodeSession(actions, times, moves) {
+  const sid = new TextEncoder().encode(sessionId);
+  const nMoves = moves.length;
+  const nTimes = times.length;
+  const nActions = actions.length;
+
+  const bytes = new Uint8Array(6 + sid.length + 16 + 4 * nMoves + 4 * nTimes + Math.ceil(nActions / 4));
+  const view = new DataView(bytes.buffer);
+  let pos = 0;
+
+  bytes.set([67, 67, 83, 49], pos); // "CCS1"
+  view.setUint16(4, sid.length, true);
+  bytes.set(sid, 6);
+  pos = 6 + sid.length;
+
+  view.setUint32(pos, hoveredUrls.size, true);
+  view.setUint32(pos + 4, nMoves, true);
+  view.setUint32(pos + 8, nTimes, true);
+  view.setUint32(pos + 12, nActions, true);
+  pos += 16;
+
+  let prevX = 0;
+  let prevY = 0;
+  for (const { x, y } of moves) {
+    view.setInt16(pos, x - prevX, true);
+    view.setInt16(pos + 2, y - prevY, true);
+    prevX = x;
+    prevY = y;
+    pos += 4;
+  }
+
+  let prevTime = 0;
+  for (const t of times) {
+    view.setUint32(pos, Math.max(0, t - prevTime), true);
+    prevTime = Math.max(prevTime, t);
+    pos += 4;
+  }
+
+  actions.forEach((action, i) => {
+    const code = action[0] === "m" ? 0 : (ACTION_CODES[action] || 1);
+    bytes[pos + (i >> 2)] |= code << ((i & 3) * 2);
+  });
+
+  return bytes;
+}
+
+async function gzip(bytes) {
+  const stream = new Blob([bytes]).stream().pipeThrough(new CompressionStream("gzip"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+function sendBinaryPayload(url, actions, times, moves, unloading) {
+  const bytes = encodeSession(actions, times, moves);
+  const headers = { "Content-Type": WIRE_CONTENT_TYPE };
+
+  if (unloading || typeof CompressionStream === "undefined") {
+    return postPayload(url, bytes, headers);
+  }
+  return gzip(bytes)
+    .then(compressed => postPayload(url, compressed, { ...headers, "Content-Encoding": "gzip" }))
+    .catch(() => postPayload(url, bytes, headers));
+}
+
+function maybeFlush() {
+  if (USE_CHUNKED_UPLOAD && totalBehaviour.length >= FLUSH_MAX_EVENTS) flushChunk(false);
+}
+
 function handleMousemove(e) {
   const now = Date.now();
   totalBehaviour.push(`m(${e.clientX},${e.clientY})`);
   mousemoveTotalBehaviour.push({ x: e.clientX, y: e.clientY });
   mousemoveTimes.push(now - startTime);
+  maybeFlush();
 }
 
 function handleClick() {
   mousemoveTimes.push(Date.now() - startTime);
   totalBehaviour.push("c(l)");
+  maybeFlush();
 }
 function handleRightClick() {
   mousemoveTimes.push(Date.now() - startTime);
   totalBehaviour.push("c(r)");
+  maybeFlush();
 }
 function handleMiddleClick() {
   mousemoveTimes.push(Date.now() - startTime);
   totalBehaviour.push("c(m)");
+  maybeFlush();
 }
 
 export { startTracking, endTracking };
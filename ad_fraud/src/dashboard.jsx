@@ -9,38 +9,40 @@ const COLORS = ['#0088FE', '#FF8042'];
 
 export default function Dashboard() {
   const [sessions, setSessions] = useState([]);
+  const [stats, setStats] = useState(null);
 
   useEffect(() => {
-    fetch("http://localhost:5000/click_logs.json")
+    fetch("http://localhost:5000/api/stats")
       .then((res) => res.json())
-      .then((data) => setSessions(data))
+      .then((data) => setStats(data))
+      .catch((err) => console.error("Failed to fetch stats", err));
+
+    fetch("http://localhost:5000/api/sessions?limit=100")
+      .then((res) => res.json())
+      .then((data) => setSessions(data.sessions))
       .catch((err) => console.error("Failed to fetch sessions", err));
   }, []);
 
-  // Pie data (Human vs Bot)
+  // Pie data (Human vs Bot), counted server-side
+  const byPrediction = stats ? stats.by_prediction : {};
   const pieData = [
     {
       name: "Human",
-      value: sessions.filter((s) => s.prediction === "Human").length,
+      value: byPrediction.Human || 0,
     },
     {
       name: "Bot",
-      value: sessions.filter((s) => s.prediction === "Bot").length,
+      value: byPrediction.Bot || 0,
     },
   ];
 
   // Line chart data (Bots grouped by hour)
-  const botSessions = sessions.filter((s) => s.prediction === "Bot");
-  const hourlyCounts = {};
-  botSessions.forEach((s) => {
-    const hour =
-      new Date(s.timestamp).getHours().toString().padStart(2, "0") + ":00";
-    hourlyCounts[hour] = (hourlyCounts[hour] || 0) + 1;
-  });
-  const lineData = Object.entries(hourlyCounts)
-    .map(([hour, count]) => ({
+  const byHourOfDay = stats ? stats.by_hour_of_day : {};
+  const lineData = Object.entries(byHourOfDay)
+    .filter(([, counts]) => counts.Bot)
+    .map(([hour, counts]) => ({
       name: hour,
-      Fraud: count,
+      Fraud: counts.Bot,
     }))
     .sort((a, b) => a.name.localeCompare(b.name));
 
@@ -153,8 +155,7 @@ export default function Dashboard() {
             {sessions.length === 0 ? (
               <p>Loading logs...</p>
             ) : (
-              [...sessions]
-                .sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))
+              sessions
                 .map((s, idx) => (
                   <div
                     key={idx}
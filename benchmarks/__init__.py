@@ -0,0 +1 @@
+"""Benchmark harness for the ingestion, feature and inference hot paths (see run.py)."""
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+import wire
+from session_features import Session
+from session_features.parity import render_phase1_file
+from session_features.trajectory import synthetic_session
+
+# ---- Synthetic sessions ----
+# Sessions come from session_features.trajectory.synthetic_session (random-walk
+# mouse paths with tracker-like timing), the same generator the trajectory
+# feature benchmark uses. Session lengths follow a log-normal (median
+# MEDIAN_MOVES) clipped to MIN_MOVES..MAX_MOVES: most sessions are a few
+# hundred events, with a long tail of sessions left open on a page.
+
+MIN_MOVES = 10
+MAX_MOVES = 100_000
+MEDIAN_MOVES = 400
+SIGMA = 1.5
+SIZES = (10, 100, 1_000, 10_000, 100_000)  # fixed tiers for per-size results
+
+
+def session_sizes(n_sessions: int, seed: int = 0) -> np.ndarray:
+    """Mousemove counts of n_sessions sessions drawn from the realistic size distribution."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.lognormal(np.log(MEDIAN_MOVES), SIGMA, n_sessions)
+    return np.clip(np.rint(sizes), MIN_MOVES, MAX_MOVES).astype(np.int64)
+
+
+def to_payload(session: Session) -> dict:
+    """The tracker JSON body for a session."""
+    return wire.to_json_payload({
+        'session_id': session.session_id,
+        'coordinates': session.coordinates.astype(np.int64),
+        'times': session.times,
+        'actions': session.actions,
+        'Mousemove_visited_urls': session.visited_urls,
+    })
+
+
+def to_wire(session: Session) -> bytes:
+    """The CCS1 body for a session."""
+    return wire.encode(session.session_id, session.coordinates, session.times, session.actions, session.visited_urls)
+
+
+def to_phase1_file(session: Session) -> str:
+    """The session as a phase1 mouse_movements.json."""
+    return render_phase1_file(to_payload(session))
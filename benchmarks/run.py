@@ -0,0 +1,295 @@
+"""
+Benchmarks for the ingestion, feature and inference hot paths.
+
+Every case times one operation over synthetic sessions (generators.py) and
+reports p50/p99 latency per call, throughput, and the peak Python/NumPy
+allocation of one call (tracemalloc). Results are written as JSON and
+compared against a stored baseline from an earlier run on the same machine.
+
+    features.*    create_feature_vector / trajectory_features on a Session built from the JSON payload
+    parse.*       both phase1 parsers (parse_mouse_data_from_file) on mouse_movements.json files
+    predict.*     model.predict for each saved model, one row and BATCH_ROWS rows per call
+    log_visit.*   POST /log-visit through the Flask test client, JSON and CCS1 bodies
+
+Per-size cases use the fixed SIZES tiers (10 to 100k mousemoves); '.mix'
+cases draw sessions from the realistic size distribution.
+
+Usage (from the repo root):
+    python -m benchmarks.run                          # writes benchmarks/results/latest.json, compares with the baseline
+    python -m benchmarks.run --only features parse --quick
+    python -m benchmarks.run --save-baseline          # record this run as the baseline
+Exits 1 if any case regressed past the tolerances below.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generators import SIZES, session_sizes, synthetic_session, to_payload, to_phase1_file, to_wire
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'MachineLearning'))
+import joblib
+import phase1
+from session_features import MODEL_FEATURES, create_feature_vector, from_json_payload, trajectory_features
+from session_features import mouse_parser
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+MODELS = ('random_forest', 'xgboost', 'gradient_boosting')
+MODELS_DIR = os.path.join(ROOT, 'MachineLearning', 'savedModels')
+GROUPS = ('features', 'parse', 'predict', 'log_visit')
+
+# Calls timed per size tier (fewer for big sessions); --quick divides these by QUICK_DIVISOR
+RUNS = {10: 200, 100: 200, 1_000: 50, 10_000: 10, 100_000: 3}
+QUICK_DIVISOR = 5
+ROUNDS = 3  # passes over a case's inputs; throughput is taken from the fastest
+MIX_SESSIONS = 200
+BATCH_ROWS = 1024
+SUBSET = 'bench'
+
+# A case has regressed if, against the baseline, any of these is exceeded
+LATENCY_TOLERANCE = 0.25     # p50 latency more than 25% higher
+THROUGHPUT_TOLERANCE = 0.20  # throughput more than 20% lower
+MEMORY_TOLERANCE = 0.10      # peak allocation more than 10% higher...
+MEMORY_SLACK_KB = 64         # ...and more than this many KB higher
+
+
+def runs_for(size: int, quick: bool) -> int:
+    return max(2, RUNS[size] // QUICK_DIVISOR) if quick else RUNS[size]
+
+
+def measure(fn, inputs: list, items_per_call: int = 1, unit: str = 'sessions') -> dict:
+    """Latency, throughput and peak allocation of fn over inputs (one call per input, ROUNDS passes)."""
+    fn(inputs[0])  # warm-up
+    timings, round_times = [], []
+    for _ in range(ROUNDS):
+        round_start = len(timings)
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - start)
+        round_times.append(sum(timings[round_start:]))
+
+    tracemalloc.start()
+    fn(inputs[-1])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings_ms = np.array(timings) * 1000
+    return {
+        'calls': len(timings),
+        'unit': unit,
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p99_ms': float(np.percentile(timings_ms, 99)),
+        'throughput': items_per_call * len(inputs) / min(round_times),  # best pass, least disturbed
+        'peak_kb': peak / 1024,
+    }
+
+
+def tier_sessions(quick: bool) -> dict:
+    """Size tier (or 'mix') -> synthetic sessions."""
+    tiers = {size: [synthetic_session(size, seed) for seed in range(runs_for(size, quick))] for size in SIZES}
+    mix_sizes = session_sizes(MIX_SESSIONS // QUICK_DIVISOR if quick else MIX_SESSIONS, seed=1)
+    tiers['mix'] = [synthetic_session(int(size), 10_000 + seed) for seed, size in enumerate(mix_sizes)]
+    return tiers
+
+
+# ---- Cases ----
+def bench_features(tiers: dict) -> dict:
+    results = {}
+    for tier, sessions in tiers.items():
+        payloads = [to_payload(session) for session in sessions]
+        results[f'features.base.{tier}'] = measure(
+            lambda payload: create_feature_vector(from_json_payload(payload)), payloads)
+        results[f'features.trajectory.{tier}'] = measure(trajectory_features, sessions)
+    return results
+
+
+def bench_parse(tiers: dict) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as base_path:
+        for tier, sessions in tiers.items():
+            for session in sessions:
+                folder = os.path.join(base_path, 'data', 'mouse_movements', SUBSET, session.session_id)
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, 'mouse_movements.json'), 'w') as f:
+                    f.write(to_phase1_file(session))
+            session_ids = [session.session_id for session in sessions]
+            results[f'parse.stream.{tier}'] = measure(
+                lambda sid: mouse_parser.parse_mouse_data_from_file(sid, SUBSET, base_path), session_ids)
+            results[f'parse.regex.{tier}'] = measure(
+                lambda sid: phase1.parse_mouse_data_from_file(sid, SUBSET, base_path), session_ids)
+    return results
+
+
+def bench_predict(tiers: dict) -> dict:
+    rows = pd.DataFrame([create_feature_vector(session) for session in tiers['mix']])[MODEL_FEATURES]
+    batch = rows.sample(BATCH_ROWS, replace=True, random_state=0).reset_index(drop=True)
+    singles = [rows.iloc[[i]] for i in range(len(rows))]
+    results = {}
+    for name in MODELS:
+        model = joblib.load(os.path.join(MODELS_DIR, f'{name}_classifier.joblib'))
+        results[f'predict.{name}.single'] = measure(model.predict, singles, unit='rows')
+        results[f'predict.{name}.batch'] = measure(model.predict, [batch] * 20, BATCH_ROWS, unit='rows')
+    return results
+
+
+def _load_server():
+    """Imports server/app.py (from server/, as the server runs) with empty stores and counters for the benchmark."""
+    server_dir = os.path.join(ROOT, 'server')
+    sys.path.insert(0, server_dir)
+    cwd = os.getcwd()
+    os.chdir(server_dir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            import app
+    finally:
+        os.chdir(cwd)
+    from log_store import SessionLogStore
+    from rate_counters import RateCounters
+    from replay_index import ReplayIndex
+    from rollups import SessionRollups
+    from session_index import SessionIndex
+
+    log_dir = tempfile.mkdtemp(prefix='bench_logs_')
+    app.log_store = SessionLogStore(log_dir)
+    app.session_index = SessionIndex()
+    app.rollups = SessionRollups()
+    app.rate_counters = RateCounters()
+    app.replay_index = ReplayIndex(app.REPLAY_WINDOW_S)
+    # Every session is posted once per round, which would trip the replay rule and skip the model
+    app.REPLAY_MATCH_LIMIT = sys.maxsize
+    return app
+
+
+def bench_log_visit(tiers: dict) -> dict:
+    app = _load_server()
+    client = app.app.test_client()
+    requests_sent = [0]
+
+    def post(body):
+        # A new client address per request, so the per-IP rate rule never kicks in
+        n = requests_sent[0] = requests_sent[0] + 1
+        environ = {'REMOTE_ADDR': f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'}
+        if isinstance(body, bytes):
+            response = client.post('/log-visit', data=body, content_type=app.wire.CONTENT_TYPE, environ_base=environ)
+        else:
+            response = client.post('/log-visit', json=body, environ_base=environ)
+        if response.status_code != 200:
+            raise RuntimeError(f"/log-visit answered {response.status_code}: {response.get_data(as_text=True)}")
+
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for tier, sessions in tiers.items():
+            results[f'log_visit.json.{tier}'] = measure(post, [to_payload(session) for session in sessions],
+                                                        unit='requests')
+            results[f'log_visit.ccs1.{tier}'] = measure(post, [to_wire(session) for session in sessions],
+                                                        unit='requests')
+    app.log_store.close()
+    return results
+
+
+CASES = {
+    'features': bench_features,
+    'parse': bench_parse,
+    'predict': bench_predict,
+    'log_visit': bench_log_visit,
+}
+
+
+# ---- Results & baseline ----
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'node': platform.node(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Regression messages for the cases in both runs."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['p50_ms'] > before['p50_ms'] * (1 + LATENCY_TOLERANCE):
+            regressions.append(f"{name}: p50 {before['p50_ms']:.3f} -> {current['p50_ms']:.3f} ms")
+        if current['throughput'] < before['throughput'] * (1 - THROUGHPUT_TOLERANCE):
+            regressions.append(f"{name}: throughput {before['throughput']:.1f} -> {current['throughput']:.1f} "
+                               f"{current['unit']}/s")
+        if (current['peak_kb'] > before['peak_kb'] * (1 + MEMORY_TOLERANCE)
+                and current['peak_kb'] - before['peak_kb'] > MEMORY_SLACK_KB):
+            regressions.append(f"{name}: peak {before['peak_kb']:.0f} -> {current['peak_kb']:.0f} KB")
+    return regressions
+
+
+def print_results(results: dict, baseline: dict):
+    print(f"{'case':<34} {'p50 ms':>10} {'p99 ms':>10} {'throughput':>18} {'peak KB':>10} {'vs base':>8}")
+    for name, r in results.items():
+        before = baseline.get(name)
+        change = f"{(r['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%" if before and before['p50_ms'] else ''
+        print(f"{name:<34} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+              f"{r['throughput']:>10.1f} {r['unit'] + '/s':<7} {r['peak_kb']:>10.0f} {change:>8}")
+
+
+def write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion, feature and inference hot paths.")
+    parser.add_argument('--only', nargs='+', choices=GROUPS, help="case groups to run (default: all)")
+    parser.add_argument('--quick', action='store_true', help=f"{QUICK_DIVISOR}x fewer calls per case")
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, 'latest.json'))
+    parser.add_argument('--baseline', default=os.path.join(RESULTS_DIR, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="also write this run to --baseline")
+    args = parser.parse_args()
+
+    tiers = tier_sessions(args.quick)
+    results = {}
+    for group in args.only or GROUPS:
+        start = time.perf_counter()
+        results.update(CASES[group](tiers))
+        print(f"{group}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    run = {'created': datetime.now().isoformat(), 'quick': args.quick, 'environment': environment(),
+           'results': results}
+    write_json(args.output, run)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored['environment'] != run['environment'] or stored['quick'] != args.quick:
+            print(f"Warning: {args.baseline} was recorded on a different machine or mode; comparisons are rough")
+        baseline = stored['results']
+
+    print_results(results, baseline)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        write_json(args.baseline, run)
+        print(f"Baseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    regressions = compare(results, baseline)
+    if regressions:
+        print(f"{len(regressions)} regressions against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
@@ -16,38 +16,40 @@ const COLORS = ["#0088FE", "#FF8042"];
 
 export default function Dashboard() {
   const [sessions, setSessions] = useState([]);
+  const [stats, setStats] = useState(null);
 
   useEffect(() => {
-    fetch("http://localhost:5000/api/sessions")
+    fetch("http://localhost:5000/api/stats")
       .then((res) => res.json())
-      .then((data) => setSessions(data))
+      .then((data) => setStats(data))
+      .catch((err) => console.error("Failed to fetch stats", err));
+
+    fetch("http://localhost:5000/api/sessions?limit=100")
+      .then((res) => res.json())
+      .then((data) => setSessions(data.sessions))
       .catch((err) => console.error("Failed to fetch sessions", err));
   }, []);
 
-  // ---- Pie Data (count of Human vs Bot) ----
+  // ---- Pie Data (count of Human vs Bot, from server rollups) ----
+  const byPrediction = stats ? stats.by_prediction : {};
   const pieData = [
     {
       name: "Human",
-      value: sessions.filter((s) => s.prediction === "Human").length,
+      value: byPrediction.Human || 0,
     },
     {
       name: "Bot",
-      value: sessions.filter((s) => s.prediction === "Bot").length,
+      value: byPrediction.Bot || 0,
     },
   ];
 
-  // ---- Line Chart Data (group bots by hour) ----
-  const botSessions = sessions.filter((s) => s.prediction === "Bot");
-  const hourlyCounts = {};
-  botSessions.forEach((s) => {
-    const hour =
-      new Date(s.timestamp).getHours().toString().padStart(2, "0") + ":00";
-    hourlyCounts[hour] = (hourlyCounts[hour] || 0) + 1;
-  });
-  const lineData = Object.entries(hourlyCounts)
-    .map(([hour, count]) => ({
+  // ---- Line Chart Data (bots by hour, from server rollups) ----
+  const byHourOfDay = stats ? stats.by_hour_of_day : {};
+  const lineData = Object.entries(byHourOfDay)
+    .filter(([, counts]) => counts.Bot)
+    .map(([hour, counts]) => ({
       name: hour,
-      Fraud: count,
+      Fraud: counts.Bot,
     }))
     .sort((a, b) => a.name.localeCompare(b.name));
 
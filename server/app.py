@@ -1,85 +1,298 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+import atexit
+import functools
 import json
+import logging
 import os
+import sys
+import threading
+import time
 from datetime import datetime
 import joblib
-import pandas as pd
 import numpy as np
 
+from batcher import MicroBatcher
+from live_sessions import FINALIZED, LiveSessions, SessionAggregate
+from log_store import SessionLogStore
+from rate_counters import RateCounters, block_reason
+from replay_index import ReplayIndex, minhash
+from model_pool import ModelPool, export_native
+import tree_ensemble
+from rollups import SessionRollups
+from session_index import SessionIndex
+from shadow import ShadowScorer
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SIZE_BUCKETS, Registry
+import structured_log
+import wire
+
+# Feature extraction is shared with the offline pipeline through session_features/ at the repo root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session_features import (LABEL_MAPPING, MODEL_FEATURES, create_feature_vector, from_json_payload, from_wire,
+                              pack_coordinates, trajectory_features)
+# Versioned models live in MachineLearning/ModelRegistry/, with their calibration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'MachineLearning'))
+import calibration
+import model_registry
+
 # ---- Configuration ----
-MODEL_PATH = os.path.join('..', 'MachineLearning', 'savedModels', 'xgboost_classifier.joblib')
-LOG_FILE = "click_logs.json"
+MODEL_REGISTRY_DIR = os.path.join('..', 'MachineLearning', 'ModelRegistry')
+MODEL_PATH = os.path.join('..', 'MachineLearning', 'savedModels', 'xgboost_classifier.joblib')  # while the registry has no champion
+SHADOW_LOG = "shadow_log.jsonl"  # one line per session scored by both the champion and the shadow
+SHADOW_MAX_QUEUE = 1000  # sessions waiting for the shadow model before new ones are skipped
+LOG_FILE = "click_logs.json"  # legacy single-array log, imported once into LOG_DIR
+LOG_DIR = "click_logs"
+MAX_BATCH_SIZE = 64     # rows per batched model.predict call
+MAX_BATCH_WAIT_MS = 2   # how long the first request in a batch may wait for others
+SESSIONS_PAGE_SIZE = 100
+MAX_SESSIONS_PAGE_SIZE = 1000
+MAX_PAYLOAD_BYTES = 32 * 1024 * 1024  # limit for a decompressed /log-visit body
+MODEL_WORKERS = 0       # >0: score batches on this many model processes (model_pool.py)
+FLAT_MODEL = True       # score in-process with tree_ensemble.py's flat-array export of the model
+FLAT_BATCH_WAIT_MS = 0  # the flat model is cheap per call, so batches only take rows already queued
+NATIVE_MODEL_DIR = os.path.join('..', 'MachineLearning', 'savedModels', 'native')
+LIVE_SESSIONS_MAX_BYTES = 64 * 1024 * 1024  # hard cap for the live (chunked) session table
+LIVE_SESSION_TTL_S = 600  # a live session idle this long is finalized and logged
+# Pre-model block rule: a session is a Bot, without consulting the model, when
+# its source exceeds any of these counts (FEATURE_NAMES in rate_counters.py)
+RATE_BLOCK_LIMITS = {
+    'ip_sessions_1m': 60,
+    'ip_clicks_1m': 600,
+    'subnet_sessions_1m': 300,
+    'ip_sessions_1h': 1000,
+}
+REPLAY_WINDOW_S = 6 * 3600  # how far back replayed mouse paths are matched
+REPLAY_MATCH_LIMIT = 3      # a session whose path matches more sessions than this is a Bot
+ADMIN_ADDRESSES = ('127.0.0.1', '::1')  # clients allowed to call /admin/* endpoints
+# Decisions on the calibrated bot score: 'challenge' at or above the first
+# threshold, 'block' at or above the second, else 'allow'. A request can pass
+# its own with ?challenge=&block=. The prediction follows the same cut: 'Bot'
+# exactly when the decision isn't 'allow'.
+DECISION_THRESHOLDS = (0.5, 0.9)
+# Compute trajectory_features for every whole-session upload and log them under
+# `trajectory`. Off while no model uses them: they cost several ms per large
+# session on the request path, and the logged events let them be computed offline.
+LOG_TRAJECTORY = False
+LOG_LEVEL = 'INFO'  # DEBUG also logs every session's verdict (they are in the session store either way)
+
+structured_log.configure(LOG_LEVEL)
+log = logging.getLogger('app')
+
+# ---- Metrics (GET /metrics) ----
+metrics = Registry('ad_fraud')
+STAGE_SECONDS = metrics.histogram(
+    'log_visit_stage_seconds', "Time spent in each stage of scoring a session: parse (decompress and decode "
+    "the body), features (create_feature_vector), trajectory (with LOG_TRAJECTORY), predict (model.predict, batch wait included), "
+    "log_write", ('stage',))
+PAYLOAD_BYTES = metrics.histogram(
+    'log_visit_payload_bytes', "Size of /log-visit request bodies as received", ('format', 'encoding'),
+    SIZE_BUCKETS)
+VERDICTS = metrics.counter(
+    'verdicts', "Sessions scored, by prediction, what decided it (model, idle, rate, replay) and decision",
+    ('prediction', 'reason', 'decision'))
+ERRORS = metrics.counter(
+    'errors', "Requests and sessions that failed, by endpoint and kind", ('endpoint', 'kind'))
 
 # ---- Load ML Model ----
+def load_model(alias: str):
+    """(model, metadata) of a registry alias, or (None, None) if it isn't set.
+
+    The champion falls back to MODEL_PATH while the registry has none. A model
+    trained on other features than MODEL_FEATURES is refused.
+    """
+    model_id = model_registry.resolve(alias, MODEL_REGISTRY_DIR)
+    if model_id is None:
+        if alias != model_registry.CHAMPION:
+            return None, None
+        return joblib.load(MODEL_PATH), {'id': MODEL_PATH, 'features': MODEL_FEATURES, 'label_mapping': LABEL_MAPPING}
+    loaded, metadata = model_registry.load(model_id, MODEL_REGISTRY_DIR)
+    if metadata['features'] != MODEL_FEATURES:
+        raise ValueError(f"{model_id} expects features {metadata['features']}, not {MODEL_FEATURES}")
+    return loaded, metadata
+
 try:
-    model = joblib.load(MODEL_PATH)
-    print("ML Model loaded successfully.")
-except FileNotFoundError:
-    print(f"Error: Model file not found at {MODEL_PATH}")
-    model = None
+    model, model_info = load_model(model_registry.CHAMPION)
+    log.info("Model loaded", extra={"model_id": model_info['id']})
+except FileNotFoundError as e:
+    log.error("Model file not found", extra={"path": e.filename})
+    model, model_info = None, None
+except ValueError as e:
+    log.error("Can't serve the champion model: %s", e)
+    model, model_info = None, None
+
+# ---- Batched inference ----
+DECISIONS = np.array(['allow', 'challenge', 'block'])
+
+def decide(scores: np.ndarray, challenge, block) -> np.ndarray:
+    """Decision per score; the thresholds are scalars or one per score."""
+    return DECISIONS[(scores >= challenge).astype(np.intp) + (scores >= block)]
+
+def parse_thresholds(get) -> tuple:
+    """(challenge, block) from a request's query args (`get` is args.get); ValueError if out of order or range."""
+    challenge, block = (float(get(name)) if get(name) is not None else default
+                        for name, default in zip(('challenge', 'block'), DECISION_THRESHOLDS))
+    if not 0.0 <= challenge <= block <= 1.0:
+        raise ValueError(f"need 0 <= challenge ({challenge}) <= block ({block}) <= 1")
+    return challenge, block
+
+def scorer(proba_fn, info: dict):
+    """predict_fn for a MicroBatcher: rows are MODEL_FEATURES then the (challenge, block) thresholds.
+
+    Returns (prediction, calibrated bot score, decision) per row, all computed
+    over the whole batch at once; the prediction is 'Bot' at or above the row's
+    challenge threshold, so it never contradicts the decision. The model's calibration and label mapping are
+    bound here, so a hot swap changes them together with the model.
+    """
+    n_features = len(MODEL_FEATURES)
+    fitted = info.get('calibration')
+    bot_is_class_1 = info['label_mapping'][max(info['label_mapping'])] == 'Bot'
+    def predict(X):
+        proba = calibration.apply(fitted, proba_fn(X[:, :n_features]))
+        scores = proba if bot_is_class_1 else 1.0 - proba
+        decisions = decide(scores, X[:, n_features], X[:, n_features + 1])
+        predictions = np.where(decisions == 'allow', 'Human', 'Bot')
+        return list(zip(predictions.tolist(), scores.tolist(), decisions.tolist()))
+    return predict
+
+def model_proba_fn(model):
+    """(P(class 1) function, batch wait in ms): the flat-array export if FLAT_MODEL is set and it matches the model, else model.predict_proba."""
+    if FLAT_MODEL:
+        try:
+            flat = tree_ensemble.convert(model)
+            parity = tree_ensemble.check_parity(model, flat, tree_ensemble.probe_rows(flat))
+        except ValueError as e:
+            log.warning("Can't flatten the model (%s); using model.predict_proba", e)
+            return lambda X: model.predict_proba(X)[:, 1], MAX_BATCH_WAIT_MS
+        if parity['ok'] and not parity['label_mismatches']:
+            log.info("Scoring with the flat-array model", extra={"trees": flat.n_trees, "depth": flat.depth})
+            return flat.positive_proba, FLAT_BATCH_WAIT_MS
+        log.warning("Flat-array model disagrees with the original; using model.predict_proba", extra={"parity": parity})
+    return lambda X: model.predict_proba(X)[:, 1], MAX_BATCH_WAIT_MS
+
+model_pool = None
+predictor = None
 
-# ---- Feature list and label mapping ----
-MODEL_FEATURES = ['total_events', 'mouse_distance', 'session_duration_ms', 'avg_velocity', 'click_count']
-LABEL_MAPPING = {0: 'Bot', 1: 'Human'}
+def serve_model(new_model, info: dict):
+    """Scores every later batch with `new_model`, creating the predictor (and model pool) on first use.
+
+    The model, its calibration and its label mapping are bound into one
+    predict_fn (on the pool, pinned to the model's own native export), so
+    replacing predictor.predict_fn is the whole switch: a batch is scored
+    entirely by the old model or entirely by the new one. Returns the pool
+    generation (None without a pool).
+    """
+    global model_pool, predictor
+    if MODEL_WORKERS:
+        native_path = export_native(new_model, NATIVE_MODEL_DIR)
+        if model_pool is None:
+            model_pool = ModelPool(MODEL_WORKERS, native_path)
+            log.info("Scoring on model worker processes", extra={"workers": MODEL_WORKERS})
+        predict_fn = scorer(functools.partial(model_pool.positive_proba, model_path=native_path), info)
+        batch_wait_ms = MAX_BATCH_WAIT_MS
+    else:
+        proba_fn, batch_wait_ms = model_proba_fn(new_model)
+        predict_fn = scorer(proba_fn, info)
+
+    if predictor is None:
+        predictor = MicroBatcher(predict_fn, MAX_BATCH_SIZE, batch_wait_ms, concurrency=MODEL_WORKERS or 1)
+    else:
+        predictor.predict_fn, predictor.max_wait = predict_fn, batch_wait_ms / 1000.0
+    # Only moves the pool's default path and generation; batches already use native_path
+    return model_pool.load(native_path) if MODEL_WORKERS else None
+
+if model:
+    serve_model(model, model_info)
+
+# ---- Shadow model ----
+def start_shadow():
+    """A ShadowScorer for the registry's shadow model, or None if none is set (or it can't be loaded)."""
+    try:
+        shadow_model, shadow_info = load_model(model_registry.SHADOW)
+    except (OSError, ValueError, KeyError) as e:
+        log.error("Can't load the shadow model: %s", e)
+        return None
+    if shadow_model is None:
+        return None
+    proba_fn, batch_wait_ms = model_proba_fn(shadow_model)
+    log.info("Shadow scoring", extra={"shadow_id": shadow_info['id'], "model_id": model_info['id']})
+    return ShadowScorer(scorer(proba_fn, shadow_info), model_info['id'], shadow_info['id'],
+                        SHADOW_LOG, SHADOW_MAX_QUEUE, MAX_BATCH_SIZE, batch_wait_ms)
+
+shadow = start_shadow() if model else None
 
 # ---- Feature engineering ----
-def create_feature_vector(session_data: dict):
-    features = {'session_id': session_data.get("session_id")}
-    
-    coords = session_data.get('mousemove_total_behaviour', [])
-    times = session_data.get('mousemove_times', [])
-    actions = session_data.get('total_behaviour', [])
-
-    features['total_events'] = len(actions)
-    
-    # Mouse distance
-    features['mouse_distance'] = 0
-    if len(coords) > 1:
-        total_dist = sum(
-            np.sqrt((coords[i]['x'] - coords[i - 1]['x']) ** 2 + (coords[i]['y'] - coords[i - 1]['y']) ** 2)
-            for i in range(1, len(coords))
-        )
-        features['mouse_distance'] = total_dist
-    
-    # Duration & velocity
-    features['session_duration_ms'] = 0
-    features['avg_velocity'] = 0
-    if len(times) > 1:
-        duration_ms = times[-1] - times[0]
-        features['session_duration_ms'] = duration_ms
-        if duration_ms > 0:
-            features['avg_velocity'] = features['mouse_distance'] / (duration_ms / 1000.0)
-    
-    # Click count
-    features['click_count'] = sum(1 for action in actions if action.startswith('c'))
-        
+def session_features_dict(session) -> dict:
+    """MODEL_FEATURES, plus the trajectory statistics if LOG_TRAJECTORY is set (logged with the session, not model inputs)."""
+    start = time.perf_counter()
+    features = create_feature_vector(session)
+    features_done = time.perf_counter()
+    STAGE_SECONDS.observe(features_done - start, 'features')
+    if LOG_TRAJECTORY:
+        features['trajectory'] = trajectory_features(session)
+        STAGE_SECONDS.observe(time.perf_counter() - features_done, 'trajectory')
     return features
 
-# ---- Flask App ----
-app = Flask(__name__)
-CORS(app)
+def decode_session_payload(body: bytes, mimetype: str = None, content_encoding: str = None):
+    """Returns (session_data, feature_dict, fingerprint) for a JSON or CCS1 body, gzipped or not.
 
-# Ensure log file exists
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, 'w') as f:
-        json.dump([], f)
+    `fingerprint` is the mouse path's replay (minhash, shingles). A CCS1 body is
+    logged as its decoded arrays (wire.to_log_details), not expanded into JSON events.
+    """
+    gzipped = (content_encoding or '').lower() == 'gzip'
+    PAYLOAD_BYTES.observe(len(body), 'ccs1' if mimetype == wire.CONTENT_TYPE else 'json',
+                          'gzip' if gzipped else 'identity')
+    start = time.perf_counter()
+    if gzipped:
+        body = wire.decompress(body, MAX_PAYLOAD_BYTES)
 
-@app.route('/')
-def home():
-    return "Click fraud tracker backend is running at http://localhost:5000"
+    if mimetype == wire.CONTENT_TYPE:
+        decoded = wire.decode(body)
+        session_data, session = wire.to_log_details(decoded), from_wire(decoded)
+    else:
+        session_data = json.loads(body)
+        session = from_json_payload(session_data)
+    STAGE_SECONDS.observe(time.perf_counter() - start, 'parse')
+    return session_data, session_features_dict(session), minhash(session.coordinates)
 
-# ---- Log Visit Endpoint ----
-@app.route('/log-visit', methods=['POST'])
-def log_visit():
-    if not model:
-        return jsonify({"status": "error", "message": "Model not loaded"}), 500
+def decode_chunk_payload(body: bytes, mimetype: str = None, content_encoding: str = None):
+    """Returns (session_id, SessionAggregate) for one JSON or CCS1 chunk of a live session."""
+    if (content_encoding or '').lower() == 'gzip':
+        body = wire.decompress(body, MAX_PAYLOAD_BYTES)
+
+    if mimetype == wire.CONTENT_TYPE:
+        decoded = wire.decode(body)
+        session_id, chunk = decoded['session_id'], from_wire(decoded)
+    else:
+        payload = json.loads(body)
+        session_id, chunk = payload['session_id'], from_json_payload(payload)
+    return session_id, SessionAggregate.from_arrays(
+        chunk.coordinates, chunk.times, len(chunk), chunk.clicks, chunk.visited_urls)
+
+# Errors decode_session_payload/decode_chunk_payload raise for a bad payload (answered with 400)
+PAYLOAD_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+# ---- Scoring & logging (shared by the Flask and ASGI servers) ----
+# Sessions and clicks per IP, /24 and user agent over 1m/10m/1h
+rate_counters = RateCounters()
+# Fingerprints of the mouse paths seen over the last REPLAY_WINDOW_S
+replay_index = ReplayIndex(REPLAY_WINDOW_S)
 
-    session_data = request.get_json()
+def predict_features(feature_dict: dict, thresholds: tuple = DECISION_THRESHOLDS):
+    """Returns (prediction_label, log_reason, score, decision) for a feature dict (with rate features and replay_matches, if present).
 
-    # --- Feature Engineering ---
-    feature_dict = create_feature_vector(session_data)
-    features_df = pd.DataFrame([feature_dict])[MODEL_FEATURES]
+    `score` is the calibrated bot score, None when a rule decided without the model.
+    """
+    feature_row = [feature_dict[name] for name in MODEL_FEATURES]
+
+    # --- Rate Rule (before the model) ---
+    blocked = block_reason(feature_dict, RATE_BLOCK_LIMITS)
+    if blocked:
+        return "Bot", f"Rate rule ({blocked})", None, "block"
+
+    # --- Replay Rule ---
+    replayed = block_reason(feature_dict, {'replay_matches': REPLAY_MATCH_LIMIT})
+    if replayed:
+        return "Bot", f"Replay rule ({replayed})", None, "block"
 
     # --- Idle Session Detection ---
     is_idle = (
@@ -90,66 +303,364 @@ def log_visit():
 
     # --- Prediction Logic ---
     if is_idle:
-        prediction_label = "Human"
-        log_reason = "Idle override (no interaction)"
-        print(f"Session {session_data.get('session_id')} classified as: Human (idle override)")
-    else:
-        prediction_numeric = model.predict(features_df)
-        prediction_label = LABEL_MAPPING.get(prediction_numeric[0], 'Unknown')
-        log_reason = "Predicted via model"
-        print(f"Session {session_data.get('session_id')} classified as: {prediction_label}")
+        return "Human", "Idle override (no interaction)", None, "allow"
+    start = time.perf_counter()
+    prediction_label, score, decision = predictor.predict(feature_row + list(thresholds))
+    STAGE_SECONDS.observe(time.perf_counter() - start, 'predict')
+    return prediction_label, "Predicted via model", score, decision
+
+# The `reason` label of VERDICTS, from the first word of a log_reason
+VERDICT_REASONS = {"Predicted": "model", "Idle": "idle", "Rate": "rate", "Replay": "replay"}
+
+def score_session(session_data: dict, feature_dict: dict, thresholds: tuple = DECISION_THRESHOLDS):
+    """Returns (prediction_label, log_reason, score, decision) for one session."""
+    prediction_label, log_reason, score, decision = predict_features(feature_dict, thresholds)
+    VERDICTS.inc(prediction_label, VERDICT_REASONS[log_reason.split(" ", 1)[0]], decision)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Session classified", extra={"session_id": session_data.get("session_id"),
+                                               "prediction": prediction_label, "log_reason": log_reason,
+                                               "score": score, "decision": decision})
+    return prediction_label, log_reason, score, decision
+
+def record_session(log_entry: dict):
+    """Appends a log entry to the store and updates the dashboard index and rollups."""
+    start = time.perf_counter()
+    location = log_store.append(log_entry)
+    STAGE_SECONDS.observe(time.perf_counter() - start, 'log_write')
+    session_index.add(log_entry, location)
+    rollups.add(log_entry)
+
+def process_session(session_data: dict, feature_dict: dict, ip: str, user_agent: str,
+                    fingerprint: tuple = None, thresholds: tuple = DECISION_THRESHOLDS) -> dict:
+    """Scores and logs one session; returns the log entry.
+
+    `fingerprint` is the session's (minhash, shingles) if already known (decoded
+    payloads, live sessions); otherwise it is computed from the JSON mouse path in session_data. `thresholds` are
+    the (challenge, block) score thresholds for the decision.
+    """
+    rates = rate_counters.record(ip, user_agent, feature_dict["click_count"])
+    if fingerprint is None:
+        fingerprint = minhash(pack_coordinates(session_data.get('mousemove_total_behaviour', [])))
+    replay_matches = replay_index.add(*fingerprint)  # None if the path is too short to fingerprint
+    prediction_label, log_reason, score, decision = score_session(
+        session_data, {**feature_dict, **rates, "replay_matches": replay_matches}, thresholds)
+    current_shadow = shadow
+    if current_shadow and log_reason == "Predicted via model":
+        current_shadow.submit(session_data.get("session_id"),
+                              [feature_dict[name] for name in MODEL_FEATURES] + list(thresholds),
+                              (prediction_label, score, decision))
 
-    # --- Log Entry ---
     log_entry = {
         "timestamp": datetime.now().isoformat(),
-        "ip": request.remote_addr,
-        "userAgent": request.headers.get("User-Agent"),
+        "ip": ip,
+        "userAgent": user_agent,
         "session_id": session_data.get("session_id"),
         "prediction": prediction_label,
         "log_reason": log_reason,
+        "model_version": model_info["id"],
+        "score": score,  # calibrated bot score; None when a rule decided
+        "decision": decision,
+        "thresholds": list(thresholds),
+        "rates": rates,
+        "replay_matches": replay_matches,
+        "trajectory": feature_dict.get("trajectory"),  # None unless LOG_TRAJECTORY, and for streamed sessions
         "details": session_data
     }
+    record_session(log_entry)
+    return log_entry
+
+# ---- Flask App ----
+app = Flask(__name__)
+CORS(app)
+
+# Open the append-only session store (migrating the legacy log on first run)
+log_store = SessionLogStore(LOG_DIR)
+if log_store.is_empty() and os.path.exists(LOG_FILE):
+    imported = log_store.import_legacy_json(LOG_FILE)
+    log.info("Imported the legacy session log", extra={"sessions": imported, "source": LOG_FILE, "log_dir": LOG_DIR})
+
+# Build the dashboard index and rollups from the store once; log_visit keeps them current
+session_index = SessionIndex()
+rollups = SessionRollups()
+for location, entry in log_store.iter_entries(with_location=True):
+    session_index.add(entry, location)
+    rollups.add(entry)
+if log_store.corrupt_records:
+    log.warning("Skipped corrupt records in the session log", extra={"count": len(log_store.corrupt_records),
+                                                                     "first": log_store.corrupt_records[0]})
+
+@app.route('/')
+def home():
+    return "Click fraud tracker backend is running at http://localhost:5000"
+
+# ---- Log Visit Endpoint ----
+@app.route('/log-visit', methods=['POST'])
+def log_visit():
+    if not model:
+        ERRORS.inc('log_visit', 'model_not_loaded')
+        return jsonify({"status": "error", "message": "Model not loaded"}), 500
 
     try:
-        with open(LOG_FILE, 'r+') as f:
-            logs = json.load(f)
-            logs.append(log_entry)
-            f.seek(0)
-            json.dump(logs, f, indent=2)
-    except Exception as e:
-        print(f"Error writing to log file: {e}")
+        thresholds = parse_thresholds(request.args.get)
+    except ValueError as e:
+        ERRORS.inc('log_visit', 'invalid_thresholds')
+        return jsonify({"status": "error", "message": f"Invalid thresholds: {e}"}), 400
+
+    # --- Decode Payload & Feature Engineering ---
+    try:
+        session_data, feature_dict, fingerprint = decode_session_payload(
+            request.get_data(), request.mimetype, request.headers.get('Content-Encoding'))
+    except PAYLOAD_ERRORS as e:
+        ERRORS.inc('log_visit', 'invalid_payload')
+        return jsonify({"status": "error", "message": f"Invalid session payload: {e}"}), 400
+
+    # --- Prediction & Log Entry ---
+    try:
+        log_entry = process_session(session_data, feature_dict, request.remote_addr, request.headers.get("User-Agent"),
+                                    fingerprint, thresholds)
+    except Exception:
+        ERRORS.inc('log_visit', 'process_failed')
+        log.exception("Error scoring or writing a session", extra={"session_id": session_data.get("session_id")})
         return jsonify({"status": "error", "message": "Failed to write log"}), 500
 
-    return jsonify({"status": "ok", "prediction": prediction_label})
+    return jsonify({"status": "ok", "prediction": log_entry["prediction"], "score": log_entry["score"],
+                    "decision": log_entry["decision"]})
+
+# ---- Chunked (live) sessions ----
+def finalize_live_session(snapshot: dict, ip: str = None, user_agent: str = None,
+                          thresholds: tuple = DECISION_THRESHOLDS) -> dict:
+    """Scores and logs a live session from its aggregate, like log_visit does for a whole payload."""
+    details = {
+        "session_id": snapshot["session_id"],
+        "streamed": True,
+        "chunks": snapshot["chunks"],
+        "end_reason": snapshot["end_reason"],
+        "Mousemove_visited_urls": snapshot["visited_urls"],
+        "features": snapshot["features"],
+    }
+    return process_session(details, snapshot["features"], ip or snapshot["ip"], user_agent or snapshot["user_agent"],
+                           snapshot["fingerprint"], thresholds)
+
+# Sessions uploaded in chunks that haven't sent their final chunk yet. Ones
+# that go idle or are pushed out by the memory cap are finalized as above.
+live_sessions = LiveSessions(LIVE_SESSIONS_MAX_BYTES, LIVE_SESSION_TTL_S, on_evict=finalize_live_session)
+
+# ---- Shutdown ----
+_shut_down = False
+
+def shutdown():
+    """Stops the server's background work in dependency order; later calls do nothing.
+
+    Live sessions are finalized first, while the model, the shadow and the
+    session store can still score and log them. Then the shadow is closed,
+    the store is synced and closed, and the model workers stop. Runs at exit
+    and from the ASGI server's lifespan shutdown.
+    """
+    global _shut_down
+    if _shut_down:
+        return
+    _shut_down = True
+    live_sessions.close()
+    if shadow:
+        shadow.close()
+    log_store.close()
+    if model_pool:
+        model_pool.close()
+atexit.register(shutdown)
+
+@app.route('/log-visit/chunk', methods=['POST'])
+def log_visit_chunk():
+    """One batch of events for a live session; ?seq=N orders retries, ?final=1 ends the session."""
+    if not model:
+        ERRORS.inc('log_visit_chunk', 'model_not_loaded')
+        return jsonify({"status": "error", "message": "Model not loaded"}), 500
+    try:
+        thresholds = parse_thresholds(request.args.get)
+    except ValueError as e:
+        ERRORS.inc('log_visit_chunk', 'invalid_thresholds')
+        return jsonify({"status": "error", "message": f"Invalid thresholds: {e}"}), 400
+
+    try:
+        seq = request.args.get('seq', type=int)
+        session_id, chunk = decode_chunk_payload(
+            request.get_data(), request.mimetype, request.headers.get('Content-Encoding'))
+        applied = live_sessions.add_chunk(session_id, chunk, seq,
+                                          request.remote_addr, request.headers.get("User-Agent"))
+    except PAYLOAD_ERRORS as e:
+        ERRORS.inc('log_visit_chunk', 'invalid_payload')
+        return jsonify({"status": "error", "message": f"Invalid session chunk: {e}"}), 400
+    if applied is FINALIZED:
+        return jsonify({"status": "error", "message": "Session already finalized"}), 409
+
+    if request.args.get('final') in ('1', 'true'):
+        snapshot = live_sessions.finalize(session_id)
+        if snapshot is None:
+            return jsonify({"status": "error", "message": "Session already finalized"}), 409
+        try:
+            log_entry = finalize_live_session(snapshot, request.remote_addr, request.headers.get("User-Agent"),
+                                              thresholds)
+        except Exception:
+            ERRORS.inc('log_visit_chunk', 'process_failed')
+            log.exception("Error scoring or writing a live session", extra={"session_id": session_id})
+            return jsonify({"status": "error", "message": "Failed to write log"}), 500
+        return jsonify({"status": "ok", "prediction": log_entry["prediction"], "score": log_entry["score"],
+                        "decision": log_entry["decision"], "final": True, "chunks": snapshot["chunks"]})
+
+    if applied is None:  # retried chunk: answer with the current verdict
+        snapshot = live_sessions.get(session_id)
+        return jsonify({"status": "ok", "prediction": snapshot["prediction"], "final": False,
+                        "chunks": snapshot["chunks"], "duplicate": True})
+
+    features, chunks = applied
+    rates = rate_counters.counts(request.remote_addr, request.headers.get("User-Agent"))
+    prediction, _, score, decision = predict_features({**features, **rates}, thresholds)
+    live_sessions.set_prediction(session_id, prediction)
+    return jsonify({"status": "ok", "prediction": prediction, "score": score, "decision": decision, "final": False,
+                    "chunks": chunks})
+
+@app.route('/api/sessions/<session_id>/live', methods=['GET'])
+def get_live_session(session_id):
+    """Interim verdict and running features of a session that is still being uploaded."""
+    snapshot = live_sessions.get(session_id)
+    if snapshot is None:
+        return jsonify({"status": "error", "message": "No live session with that id"}), 404
+    return jsonify(snapshot)
+
+@app.route('/api/rate-stats', methods=['GET'])
+def rate_stats():
+    """Sketch sizes and, with ?ip= and/or ?ua=, that source's current rate features."""
+    stats = rate_counters.stats()
+    stats["block_limits"] = RATE_BLOCK_LIMITS
+    if request.args.get('ip') or request.args.get('ua'):
+        stats["rates"] = rate_counters.counts(request.args.get('ip'), request.args.get('ua'))
+    return jsonify(stats)
+
+@app.route('/api/replay-stats', methods=['GET'])
+def replay_stats():
+    """Size of the replay fingerprint index."""
+    stats = replay_index.stats()
+    stats["match_limit"] = REPLAY_MATCH_LIMIT
+    return jsonify(stats)
+
+@app.route('/api/live-stats', methods=['GET'])
+def live_stats():
+    """Live session table occupancy and eviction counters."""
+    return jsonify(live_sessions.stats())
 
 # ---- Serve Filtered Dashboard Logs ----
+def _iso_param(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value).isoformat() if value else None
+
 @app.route('/api/sessions', methods=['GET'])
 def get_sessions():
     try:
-        with open(LOG_FILE, 'r') as f:
-            logs = json.load(f)
+        limit = min(int(request.args.get('limit', SESSIONS_PAGE_SIZE)), MAX_SESSIONS_PAGE_SIZE)
+        prediction = request.args.get('prediction') or request.args.get('filter')
+        if prediction == 'All':
+            prediction = None
+        page = session_index.query(
+            prediction=prediction,
+            decision=request.args.get('decision'),
+            since=_iso_param('since'),
+            until=_iso_param('until'),
+            cursor=request.args.get('cursor'),
+            limit=max(limit, 1),
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid query: {e}"}), 400
+
+    return jsonify(page)
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    found = session_index.get(session_id)
+    if found is None:
+        return jsonify({"status": "error", "message": "Session not found"}), 404
+
+    try:
+        return jsonify(log_store.read_at(*found[1]))
+    except Exception:
+        log.exception("Error reading a session from the log store", extra={"session_id": session_id})
+        return jsonify({"status": "error", "message": "Could not retrieve session"}), 500
+
+# ---- Dashboard rollups ----
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    try:
+        return jsonify(rollups.snapshot(
+            hours=int(request.args.get('hours', 168)),
+            days=int(request.args.get('days', 90)),
+            top=int(request.args.get('top', 10)),
+        ))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid query: {e}"}), 400
+
+# ---- Inference batching metrics ----
+@app.route('/api/inference-stats', methods=['GET'])
+def inference_stats():
+    if not predictor:
+        return jsonify({"status": "error", "message": "Model not loaded"}), 500
+    stats = predictor.stats()
+    if model_pool:
+        stats["model_pool"] = model_pool.stats()
+    return jsonify(stats)
+
+@app.route('/api/shadow-stats', methods=['GET'])
+def shadow_stats():
+    """How often the shadow model disagrees with the champion since it was loaded."""
+    current_shadow = shadow
+    if not current_shadow:
+        return jsonify({"champion": model_info["id"] if model_info else None, "shadow": None})
+    return jsonify(current_shadow.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Per-stage /log-visit latencies, payload sizes, verdict and error counters (Prometheus text format)."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+# ---- Model hot swap ----
+_reload_lock = threading.Lock()
+
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """Loads the registry's champion and shadow again and switches new predictions to them.
 
-        dashboard_data = [
-            {
-                "session_id": log.get("session_id"),
-                "timestamp": log.get("timestamp"),
-                "prediction": log.get("prediction")
-            }
-            for log in logs
-        ]
+    In-flight batches finish on the old model. Also loads the first model of a
+    server that started without one.
+    """
+    global model, model_info, shadow
+    if request.remote_addr not in ADMIN_ADDRESSES:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
 
-        return jsonify(sorted(dashboard_data, key=lambda x: x['timestamp'], reverse=True))
+    with _reload_lock:
+        try:
+            new_model, new_info = load_model(model_registry.CHAMPION)
+            new_model.predict(np.zeros((1, len(MODEL_FEATURES))))  # refuse a model that can't score our features
+            generation = serve_model(new_model, new_info)
+        except Exception as e:
+            log.exception("Model reload failed, keeping the current model")
+            return jsonify({"status": "error", "message": f"Model reload failed: {e}"}), 500
 
-    except Exception as e:
-        print(f"Error reading log file: {e}")
-        return jsonify({"status": "error", "message": "Could not retrieve logs"}), 500
+        model, model_info = new_model, new_info
+        old_shadow, shadow = shadow, start_shadow()
+        if old_shadow:
+            old_shadow.close()
+    log.info("Model reloaded", extra={"model_id": model_info['id'], "shadow_id": shadow.shadow_id if shadow else None})
+    return jsonify({"status": "ok", "model": model_info['id'], "shadow": shadow.shadow_id if shadow else None,
+                    "generation": generation})
 
-# ✅ Serve full raw JSON for direct use in dashboard.jsx
+# ✅ Serve full raw JSON (dashboards use /api/stats and /api/sessions instead)
 @app.route('/click_logs.json')
 def serve_click_logs():
-    return send_from_directory(os.path.dirname(__file__), 'click_logs.json', mimetype='application/json')
+    def generate():
+        yield "["
+        for i, entry in enumerate(log_store.iter_entries()):
+            yield ("," if i else "") + json.dumps(entry)
+        yield "]"
+    return Response(generate(), mimetype='application/json')
 
 # ---- Run the app ----
 if __name__ == '__main__':
-    print("Backend is running. Listening at: http://localhost:5000")
+    log.info("Backend is running", extra={"url": "http://localhost:5000"})
     app.run(debug=True, port=5000)
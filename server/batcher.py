@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# ---- Micro-batching inference ----
+# Concurrent requests each submit one feature row. A single worker thread
+# collects rows for up to `max_wait_ms` (or until `max_batch_size` rows are
+# waiting), runs one vectorized predict call over the stacked matrix and
+# hands each caller back its own result. With `concurrency` > 1 that many
+# worker threads collect and score batches side by side (for a predict_fn
+# that scores on several processes, see model_pool.py).
+#
+# predict_fn and max_wait may be reassigned at any time; each batch uses the
+# ones that were current when it started.
+
+
+class MicroBatcher:
+    """Groups single-row predictions from concurrent requests into batches."""
+
+    def __init__(self, predict_fn, max_batch_size: int = 64, max_wait_ms: float = 2.0, concurrency: int = 1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch = 0
+        self._max_queue_depth = 0
+        self._size_histogram = {}  # power-of-two upper bound -> number of batches
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"micro-batcher-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, row) -> Future:
+        """Queue one feature row; the returned future resolves to its prediction."""
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float64).ravel(), future))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, row, timeout: float = None):
+        return self.submit(row).result(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()  # rows already waiting never wait for the deadline
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)  # let the outer loop see the shutdown
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            futures = [future for _, future in batch]
+            try:
+                results = self.predict_fn(np.vstack([row for row, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            self._record(len(batch))
+
+    def _record(self, size: int):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += size
+            self._max_batch = max(self._max_batch, size)
+            self._size_histogram[bucket] = self._size_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "rows": self._rows,
+                "avg_batch_size": self._rows / self._batches if self._batches else 0,
+                "max_batch_size": self._max_batch,
+                "batch_size_histogram": {f"<={k}": v for k, v in sorted(self._size_histogram.items())},
+            }
+
+    def close(self):
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,328 @@
+"""
+Async ingestion server for /log-visit.
+
+Run from the server/ directory (one process: it owns the session store):
+    uvicorn ingest_asgi:app --port 5000
+
+POST /log-visit reads and validates the payload, puts it on a bounded queue
+and answers 202 straight away; a pool of workers scores and persists queued
+sessions off the event loop. When the queue is full the request is refused
+with 503 and Retry-After, so a traffic spike can't grow memory without bound.
+Callers that want the verdict inline pass ?sync=1 and get the same 200
+response as app.py once their session has been scored.
+
+Every other route (/api/sessions, /api/stats, ...) is served by the Flask app
+in app.py, run on a thread so it never blocks ingestion.
+"""
+import asyncio
+import io
+import json
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as backend
+
+# ---- Config ----
+INGEST_QUEUE_SIZE = 10000     # sessions waiting to be scored before we answer 503
+INGEST_WORKERS = 8            # concurrent scoring/persistence jobs
+DECODE_WORKERS = 4            # threads decoding payloads before the ack
+WSGI_WORKERS = 8              # threads serving the Flask dashboard routes
+SYNC_TIMEOUT_S = 10.0
+RETRY_AFTER_S = 1
+
+log = logging.getLogger('ingest_asgi')
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+PREFLIGHT_HEADERS = CORS_HEADERS + [
+    (b'access-control-allow-methods', b'POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type, Content-Encoding'),
+    (b'access-control-max-age', b'86400'),
+]
+
+
+class _PayloadTooLarge(Exception):
+    pass
+
+
+# ---- Ingestion queue & workers ----
+class Ingestor:
+    """Bounded queue of decoded sessions drained by worker tasks on a thread pool."""
+
+    def __init__(self, queue_size: int = INGEST_QUEUE_SIZE, workers: int = INGEST_WORKERS,
+                 decode_workers: int = DECODE_WORKERS):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.decode_pool = ThreadPoolExecutor(decode_workers, thread_name_prefix='decode')
+        self.score_pool = ThreadPoolExecutor(workers, thread_name_prefix='score')
+        self.queue = None
+        self.tasks = []
+        self.counters = {'accepted': 0, 'rejected': 0, 'invalid': 0, 'processed': 0, 'failed': 0}
+        self.max_queue_depth = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Drains what was already accepted, then stops the workers."""
+        if self.queue is not None:
+            await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.decode_pool.shutdown()
+        self.score_pool.shutdown()
+
+    async def decode(self, body: bytes, mimetype: str, content_encoding: str):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.decode_pool, backend.decode_session_payload, body, mimetype, content_encoding)
+
+    def offer(self, session_data: dict, feature_dict: dict, fingerprint: tuple, ip: str, user_agent: str,
+              want_verdict: bool, thresholds: tuple = backend.DECISION_THRESHOLDS):
+        """Enqueues a decoded session; returns a future for its log entry (or None), False if the queue is full."""
+        future = asyncio.get_running_loop().create_future() if want_verdict else None
+        try:
+            self.queue.put_nowait((session_data, feature_dict, fingerprint, ip, user_agent, thresholds, future))
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            backend.ERRORS.inc('log_visit', 'queue_full')
+            return False
+        self.counters['accepted'] += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session_data, feature_dict, fingerprint, ip, user_agent, thresholds, future = await self.queue.get()
+            try:
+                log_entry = await loop.run_in_executor(
+                    self.score_pool, backend.process_session, session_data, feature_dict, ip, user_agent, fingerprint,
+                    thresholds)
+                self.counters['processed'] += 1
+                if future is not None and not future.done():
+                    future.set_result(log_entry)
+            except Exception as e:
+                self.counters['failed'] += 1
+                backend.ERRORS.inc('log_visit', 'process_failed')
+                log.error("Error scoring or writing a session", exc_info=e,
+                          extra={"session_id": session_data.get('session_id')})
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'queue_size': self.queue_size,
+            'workers': self.workers,
+        }
+
+
+# ---- ASGI helpers ----
+async def _read_body(receive, limit: int) -> bytes:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("client disconnected")
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise _PayloadTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _send_json(send, status: int, payload: dict, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                    *CORS_HEADERS, *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _headers(scope) -> dict:
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def _wsgi_environ(scope, headers: dict, body: bytes) -> dict:
+    server = scope.get('server') or ('localhost', 5000)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_TYPE': headers.get('content-type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        if name not in ('content-type', 'content-length'):
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+# ---- ASGI App ----
+class IngestApp:
+    def __init__(self, flask_app=backend.app):
+        self.flask_app = flask_app
+        self.ingestor = Ingestor()
+        self.wsgi_pool = ThreadPoolExecutor(WSGI_WORKERS, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'] == '/log-visit':
+                await self.log_visit(scope, receive, send)
+            elif scope['path'] == '/api/ingest-stats':
+                await _send_json(send, 200, self.ingestor.stats())
+            else:
+                await self.call_flask(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.ingestor.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.ingestor.stop()
+                self.wsgi_pool.shutdown()
+                backend.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ---- Log Visit Endpoint ----
+    async def log_visit(self, scope, receive, send):
+        if scope['method'] == 'OPTIONS':
+            await send({'type': 'http.response.start', 'status': 204, 'headers': PREFLIGHT_HEADERS})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        if scope['method'] != 'POST':
+            await _send_json(send, 405, {"status": "error", "message": "Method not allowed"})
+            return
+        if not backend.model:
+            backend.ERRORS.inc('log_visit', 'model_not_loaded')
+            await _send_json(send, 500, {"status": "error", "message": "Model not loaded"})
+            return
+
+        headers = _headers(scope)
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        try:
+            thresholds = backend.parse_thresholds(lambda name: query.get(name, [None])[0])
+        except ValueError as e:
+            backend.ERRORS.inc('log_visit', 'invalid_thresholds')
+            await _send_json(send, 400, {"status": "error", "message": f"Invalid thresholds: {e}"})
+            return
+        try:
+            body = await _read_body(receive, backend.MAX_PAYLOAD_BYTES)
+        except _PayloadTooLarge:
+            backend.ERRORS.inc('log_visit', 'payload_too_large')
+            await _send_json(send, 413, {"status": "error", "message": "Payload too large"})
+            return
+        except ConnectionError:
+            return
+
+        # --- Validate before acknowledging ---
+        mimetype = headers.get('content-type', '').split(';')[0].strip().lower()
+        try:
+            session_data, feature_dict, fingerprint = await self.ingestor.decode(
+                body, mimetype, headers.get('content-encoding'))
+        except backend.PAYLOAD_ERRORS as e:
+            self.ingestor.counters['invalid'] += 1
+            backend.ERRORS.inc('log_visit', 'invalid_payload')
+            await _send_json(send, 400, {"status": "error", "message": f"Invalid session payload: {e}"})
+            return
+
+        want_verdict = query.get('sync', ['0'])[0] not in ('0', 'false', '')
+        client = scope.get('client') or (None, 0)
+        future = self.ingestor.offer(session_data, feature_dict, fingerprint, client[0], headers.get('user-agent'),
+                                     want_verdict, thresholds)
+        if future is False:
+            await _send_json(send, 503, {"status": "error", "message": "Ingestion queue full, retry later"},
+                             headers=[(b'retry-after', str(RETRY_AFTER_S).encode())])
+            return
+        if future is None:
+            await _send_json(send, 202, {"status": "accepted", "session_id": session_data.get("session_id")})
+            return
+
+        # --- Synchronous verdict ---
+        try:
+            log_entry = await asyncio.wait_for(asyncio.shield(future), SYNC_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            await _send_json(send, 202, {"status": "accepted", "session_id": session_data.get("session_id"),
+                                         "message": "Verdict not ready, session is still queued"})
+            return
+        except Exception:
+            await _send_json(send, 500, {"status": "error", "message": "Failed to write log"})
+            return
+        await _send_json(send, 200, {"status": "ok", "prediction": log_entry["prediction"],
+                                     "score": log_entry["score"], "decision": log_entry["decision"]})
+
+    # ---- Everything else: the Flask app on a thread ----
+    async def call_flask(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        try:
+            body = await _read_body(receive, backend.MAX_PAYLOAD_BYTES)
+        except _PayloadTooLarge:
+            await _send_json(send, 413, {"status": "error", "message": "Payload too large"})
+            return
+        except ConnectionError:
+            return
+
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response_headers]
+
+        environ = _wsgi_environ(scope, _headers(scope), body)
+        result = await loop.run_in_executor(self.wsgi_pool, self.flask_app, environ, start_response)
+        chunks = iter(result)
+        try:
+            await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            # Pull chunks on the pool too: streamed responses like /click_logs.json read from disk
+            while True:
+                chunk = await loop.run_in_executor(self.wsgi_pool, next, chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.wsgi_pool, result.close)
+
+
+app = IngestApp()
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    log.info("Ingestion server running", extra={"url": "http://localhost:5000"})
+    uvicorn.run(app, host='127.0.0.1', port=5000, log_level='warning', access_log=False)
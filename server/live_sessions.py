@@ -0,0 +1,379 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from replay_index import EMPTY_SIGNATURE, NUM_HASHES, merge_signatures, minhash
+
+log = logging.getLogger(__name__)
+
+# ---- Live session aggregates ----
+# A tracker can upload a session as a series of chunks while the user is
+# still on the page. The server never keeps the events themselves: each
+# chunk is reduced to a SessionAggregate (counts, path length, first/last
+# point and time) and merged into the session's running aggregate, which is
+# O(1) work and memory per session. The merged aggregate yields exactly the
+# features session_features.create_feature_vector computes over the whole
+# session, so an interim verdict can be produced after any chunk. It also
+# carries the session's replay fingerprint, merged from the chunks'
+# (replay_index.py).
+#
+# Chunks must be applied in order (the tracker sends them one after another);
+# a chunk whose seq was already applied is a retry and is ignored, and so is
+# a chunk for a session that was finalized recently.
+#
+# Live sessions are held in a fixed-size slot table (LiveSessions): one
+# preallocated NumPy structured array sized from a memory cap, plus a
+# session_id -> slot dict. Slots are threaded on an intrusive doubly linked
+# LRU list (prev/next columns), so touching, evicting and freeing a slot are
+# O(1). Since every chunk moves its session to the head, the tail is also the
+# least recently seen session, and TTL expiry just walks the tail. A session
+# is evicted when it has been idle for `ttl` seconds or when the table is
+# full and a new session arrives; either way it is handed to `on_evict` to be
+# scored and logged like a finished session.
+
+FINALIZED = 'finalized'
+
+SLOT_DTYPE = np.dtype([
+    ('events', np.int64), ('clicks', np.int64), ('distance', np.float64),
+    ('first_x', np.float64), ('first_y', np.float64), ('last_x', np.float64), ('last_y', np.float64),
+    ('has_point', np.bool_), ('first_time', np.int64), ('last_time', np.int64), ('n_times', np.int64),
+    ('visited_urls', np.int64), ('minhash', np.uint64, (NUM_HASHES,)), ('shingles', np.int64),
+    ('chunks', np.int32), ('last_seq', np.int64),
+    ('first_seen', np.float64), ('last_seen', np.float64),
+    ('prev', np.int32), ('next', np.int32),
+])
+
+# Python-side cost per occupied slot on top of SLOT_DTYPE: the dict entry, the
+# session id, IP and user agent strings (lengths are capped below) and the
+# object-array pointers. An upper bound, used to size the table from max_bytes.
+MAX_ID_LENGTH = 128
+MAX_IP_LENGTH = 64
+MAX_USER_AGENT_LENGTH = 256
+SLOT_OVERHEAD_BYTES = 104 + (49 + MAX_ID_LENGTH) + (49 + MAX_IP_LENGTH) + (49 + MAX_USER_AGENT_LENGTH) + 4 * 8
+SLOT_BYTES = SLOT_DTYPE.itemsize + SLOT_OVERHEAD_BYTES
+
+_NIL = -1
+
+
+class SessionAggregate:
+    """Running totals for one session (or one chunk of it)."""
+
+    __slots__ = ('events', 'clicks', 'distance', 'first_point', 'last_point',
+                 'first_time', 'last_time', 'n_times', 'visited_urls', 'minhash', 'shingles')
+
+    def __init__(self):
+        self.events = 0
+        self.clicks = 0
+        self.distance = 0.0
+        self.first_point = None   # (x, y)
+        self.last_point = None
+        self.first_time = None
+        self.last_time = None
+        self.n_times = 0
+        self.visited_urls = 0
+        self.minhash = EMPTY_SIGNATURE
+        self.shingles = 0        # summed over chunks, so shingles repeated across chunks count twice
+
+    @classmethod
+    def from_arrays(cls, coordinates: np.ndarray, times, events: int, clicks: int, visited_urls: int = 0):
+        """Aggregate of one chunk: (n, 2) coordinates, its timestamps and action counts."""
+        agg = cls()
+        agg.events = events
+        agg.clicks = clicks
+        agg.visited_urls = visited_urls
+        if len(coordinates):
+            steps = np.diff(coordinates, axis=0).astype(np.float64)
+            agg.distance = float(np.sqrt((steps * steps).sum(axis=1)).sum())
+            agg.first_point = (float(coordinates[0][0]), float(coordinates[0][1]))
+            agg.last_point = (float(coordinates[-1][0]), float(coordinates[-1][1]))
+            agg.minhash, agg.shingles = minhash(coordinates)
+        if len(times):
+            agg.first_time = int(times[0])
+            agg.last_time = int(times[-1])
+            agg.n_times = len(times)
+        return agg
+
+    def merge(self, later: 'SessionAggregate'):
+        """Appends a later chunk in place, joining the two mouse paths."""
+        self.events += later.events
+        self.clicks += later.clicks
+        self.distance += later.distance
+        if self.last_point is not None and later.first_point is not None:
+            self.distance += float(np.hypot(later.first_point[0] - self.last_point[0],
+                                            later.first_point[1] - self.last_point[1]))
+        if later.first_point is not None:
+            if self.first_point is None:
+                self.first_point = later.first_point
+            self.last_point = later.last_point
+        if later.n_times:
+            if not self.n_times:
+                self.first_time = later.first_time
+            self.last_time = later.last_time
+            self.n_times += later.n_times
+        self.visited_urls = max(self.visited_urls, later.visited_urls)
+        self.minhash = merge_signatures(self.minhash, later.minhash)
+        self.shingles += later.shingles
+
+    def features(self, session_id: str = None) -> dict:
+        """The same dict create_feature_vector returns for the whole session."""
+        features = {
+            'session_id': session_id,
+            'total_events': self.events,
+            'mouse_distance': self.distance,
+            'session_duration_ms': 0,
+            'avg_velocity': 0,
+            'click_count': self.clicks,
+        }
+        if self.n_times > 1:
+            duration_ms = self.last_time - self.first_time
+            features['session_duration_ms'] = duration_ms
+            if duration_ms > 0:
+                features['avg_velocity'] = features['mouse_distance'] / (duration_ms / 1000.0)
+        return features
+
+
+class LiveSessions:
+    """Bounded session_id -> running aggregate table with LRU/TTL eviction."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600.0, on_evict=None,
+                 sweep_interval: float = 5.0, remember_finalized: int = 10000):
+        self.capacity = max(1, max_bytes // SLOT_BYTES)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.sweep_interval = sweep_interval
+        self.remember_finalized = remember_finalized
+
+        self._lock = threading.Lock()
+        self._slots = np.zeros(self.capacity, dtype=SLOT_DTYPE)
+        self._ids = np.empty(self.capacity, dtype=object)
+        self._ips = np.empty(self.capacity, dtype=object)
+        self._user_agents = np.empty(self.capacity, dtype=object)
+        self._predictions = np.empty(self.capacity, dtype=object)
+        self._index = {}                 # session_id -> slot
+        self._head = self._tail = _NIL   # most / least recently seen
+        self._slots['next'] = np.arange(1, self.capacity + 1)
+        self._slots['next'][-1] = _NIL
+        self._free = 0                   # free slots are chained through 'next'
+        self._finalized = OrderedDict()  # recently finalized session ids, oldest first
+
+        self._created = 0
+        self._evictions = {'ttl': 0, 'capacity': 0}
+        self._finalized_count = 0
+
+        self._closed = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="live-sessions-sweep", daemon=True)
+        self._sweeper.start()
+
+    # ---- LRU list ----
+    def _unlink(self, slot: int):
+        prev, nxt = int(self._slots['prev'][slot]), int(self._slots['next'][slot])
+        if prev == _NIL:
+            self._head = nxt
+        else:
+            self._slots['next'][prev] = nxt
+        if nxt == _NIL:
+            self._tail = prev
+        else:
+            self._slots['prev'][nxt] = prev
+
+    def _push_head(self, slot: int):
+        self._slots['prev'][slot] = _NIL
+        self._slots['next'][slot] = self._head
+        if self._head != _NIL:
+            self._slots['prev'][self._head] = slot
+        self._head = slot
+        if self._tail == _NIL:
+            self._tail = slot
+
+    # ---- Slot <-> aggregate ----
+    def _load(self, slot: int) -> SessionAggregate:
+        row = self._slots[slot]
+        agg = SessionAggregate()
+        agg.events = int(row['events'])
+        agg.clicks = int(row['clicks'])
+        agg.distance = float(row['distance'])
+        if row['has_point']:
+            agg.first_point = (float(row['first_x']), float(row['first_y']))
+            agg.last_point = (float(row['last_x']), float(row['last_y']))
+        agg.n_times = int(row['n_times'])
+        if agg.n_times:
+            agg.first_time = int(row['first_time'])
+            agg.last_time = int(row['last_time'])
+        agg.visited_urls = int(row['visited_urls'])
+        agg.minhash = row['minhash'].copy()
+        agg.shingles = int(row['shingles'])
+        return agg
+
+    def _store(self, slot: int, agg: SessionAggregate, chunks: int, last_seq: int, first_seen: float, last_seen: float):
+        first = agg.first_point or (0.0, 0.0)
+        last = agg.last_point or (0.0, 0.0)
+        row = self._slots[slot]
+        self._slots[slot] = (
+            agg.events, agg.clicks, agg.distance, first[0], first[1], last[0], last[1],
+            agg.first_point is not None, agg.first_time or 0, agg.last_time or 0, agg.n_times,
+            agg.visited_urls, agg.minhash, agg.shingles, chunks, last_seq, first_seen, last_seen, row['prev'], row['next'],
+        )
+
+    # ---- Allocation & eviction (lock held) ----
+    def _allocate(self, session_id: str, ip: str, user_agent: str, now: float):
+        """Returns (slot, snapshot of the session evicted to make room or None)."""
+        evicted = None
+        if self._free == _NIL:
+            evicted = self._remove(self._tail, 'capacity')
+        slot = self._free
+        self._free = int(self._slots['next'][slot])
+        self._slots[slot] = 0
+        self._slots['minhash'][slot] = EMPTY_SIGNATURE
+        self._slots['last_seq'][slot] = -1
+        self._slots['first_seen'][slot] = now
+        self._ids[slot] = session_id
+        self._ips[slot] = (ip or '')[:MAX_IP_LENGTH]
+        self._user_agents[slot] = sys.intern((user_agent or '')[:MAX_USER_AGENT_LENGTH])
+        self._predictions[slot] = None
+        self._index[session_id] = slot
+        self._created += 1
+        self._push_head(slot)
+        return slot, evicted
+
+    def _remove(self, slot: int, reason: str) -> dict:
+        """Frees a slot, remembers its session as finalized and returns its snapshot and fingerprint."""
+        snapshot = self._snapshot(slot)
+        snapshot['end_reason'] = reason
+        snapshot['fingerprint'] = (self._slots['minhash'][slot].copy(), int(self._slots['shingles'][slot]))
+        session_id = self._ids[slot]
+        self._unlink(slot)
+        del self._index[session_id]
+        self._ids[slot] = self._ips[slot] = self._user_agents[slot] = self._predictions[slot] = None
+        self._slots['next'][slot] = self._free
+        self._free = slot
+
+        self._finalized[session_id] = True
+        if len(self._finalized) > self.remember_finalized:
+            self._finalized.popitem(last=False)
+        if reason in self._evictions:
+            self._evictions[reason] += 1
+        self._finalized_count += 1
+        return snapshot
+
+    def _snapshot(self, slot: int) -> dict:
+        session_id = self._ids[slot]
+        row = self._slots[slot]
+        agg = self._load(slot)
+        return {
+            'session_id': session_id,
+            'features': agg.features(session_id),
+            'visited_urls': agg.visited_urls,
+            'chunks': int(row['chunks']),
+            'first_seen': float(row['first_seen']),
+            'last_seen': float(row['last_seen']),
+            'prediction': self._predictions[slot],
+            'ip': self._ips[slot],
+            'user_agent': self._user_agents[slot],
+        }
+
+    def _evicted(self, snapshots):
+        """Hands evicted sessions to on_evict (called without the lock held)."""
+        for snapshot in snapshots:
+            if self.on_evict is None:
+                continue
+            try:
+                self.on_evict(snapshot)
+            except Exception:
+                log.exception("Error finalizing an evicted session", extra={"session_id": snapshot['session_id']})
+
+    # ---- Public API ----
+    def add_chunk(self, session_id: str, chunk: SessionAggregate, seq: int = None,
+                  ip: str = None, user_agent: str = None):
+        """Merges a chunk; returns (features, chunks so far), None for an already applied seq,
+        or FINALIZED if the session has already been finalized."""
+        if len(session_id) > MAX_ID_LENGTH:
+            raise ValueError(f"session_id longer than {MAX_ID_LENGTH} characters")
+        now = time.time()
+        evicted = None
+        with self._lock:
+            if session_id in self._finalized:
+                return FINALIZED
+            slot = self._index.get(session_id)
+            if slot is None:
+                slot, evicted = self._allocate(session_id, ip, user_agent, now)
+            row = self._slots[slot]
+            if seq is not None and seq <= row['last_seq']:
+                result = None
+            else:
+                agg = self._load(slot)
+                agg.merge(chunk)
+                chunks = int(row['chunks']) + 1
+                self._store(slot, agg, chunks, row['last_seq'] if seq is None else seq, row['first_seen'], now)
+                self._unlink(slot)
+                self._push_head(slot)
+                result = agg.features(session_id), chunks
+        if evicted is not None:
+            self._evicted([evicted])
+        return result
+
+    def set_prediction(self, session_id: str, prediction: str):
+        with self._lock:
+            slot = self._index.get(session_id)
+            if slot is not None:
+                self._predictions[slot] = prediction
+
+    def get(self, session_id: str):
+        """Snapshot of a live session as a dict, or None."""
+        with self._lock:
+            slot = self._index.get(session_id)
+            return None if slot is None else self._snapshot(slot)
+
+    def finalize(self, session_id: str):
+        """Removes a session and returns its final snapshot, or None; later chunks for it are refused."""
+        with self._lock:
+            slot = self._index.get(session_id)
+            return None if slot is None else self._remove(slot, 'final')
+
+    def expire(self, now: float = None) -> int:
+        """Evicts (and finalizes) every session idle for longer than `ttl`; returns how many."""
+        cutoff = (time.time() if now is None else now) - self.ttl
+        expired = []
+        with self._lock:
+            while self._tail != _NIL and self._slots['last_seen'][self._tail] < cutoff:
+                expired.append(self._remove(self._tail, 'ttl'))
+        self._evicted(expired)
+        return len(expired)
+
+    def drain(self) -> int:
+        """Finalizes every live session (on shutdown); returns how many."""
+        with self._lock:
+            drained = [self._remove(self._tail, 'shutdown') for _ in range(len(self._index))]
+        self._evicted(drained)
+        return len(drained)
+
+    def _sweep_loop(self):
+        while not self._closed.wait(self.sweep_interval):
+            self.expire()
+
+    def close(self):
+        """Stops the sweeper and finalizes what is still live."""
+        self._closed.set()
+        self._sweeper.join()
+        self.drain()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._index),
+                "capacity": self.capacity,
+                "occupancy": len(self._index) / self.capacity,
+                "max_bytes": self.max_bytes,
+                "slot_bytes": SLOT_BYTES,
+                "ttl_s": self.ttl,
+                "created": self._created,
+                "finalized": self._finalized_count,
+                "evictions": dict(self._evictions),
+            }
+
+    def __len__(self):
+        return len(self._index)
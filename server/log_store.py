@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# ---- Append-only session log ----
+# Sessions are written one JSON record per line into numbered segment files
+# (segment-00000001.jsonl, segment-00000002.jsonl, ...). Appends never read
+# or rewrite existing data, so the cost of logging a session does not depend
+# on how many sessions are already stored.
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+log = logging.getLogger(__name__)
+
+
+def _segment_name(seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}"
+
+
+def _segment_seq(name: str):
+    if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+        return None
+    digits = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+    return int(digits) if digits.isdigit() else None
+
+
+def list_segments(directory: str):
+    """Sequence numbers of the segments in a store directory, oldest first."""
+    seqs = (_segment_seq(name) for name in os.listdir(directory))
+    return sorted(seq for seq in seqs if seq is not None)
+
+
+def end_position(directory: str) -> tuple:
+    """(segment, offset) just past the last complete record: where read_entries would stop now."""
+    segments = list_segments(directory)
+    if not segments:
+        return 0, 0
+    with open(os.path.join(directory, _segment_name(segments[-1])), 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return segments[-1], start + newline + 1
+            end = start
+    return segments[-1], 0
+
+
+def read_entries(directory: str, since: tuple = (0, 0), until: tuple = None, corrupt: list = None):
+    """
+    Yields (segment, start offset, end offset, record) for every complete
+    record from position `since` up to (not including) `until`, in append
+    order. Only reads the files, so it is safe while a server is appending;
+    a record still being written is left for the next read.
+
+    A complete line that isn't valid JSON (e.g. a record torn by a crash in a
+    segment that was rotated since) is skipped with a warning, and its
+    (segment, offset) appended to `corrupt` if given.
+    """
+    for seq in list_segments(directory):
+        if seq < since[0] or (until is not None and seq > until[0]):
+            continue
+        with open(os.path.join(directory, _segment_name(seq)), 'rb') as f:
+            offset = since[1] if seq == since[0] else 0
+            f.seek(offset)
+            for line in f:
+                start = offset
+                offset += len(line)
+                if until is not None and (seq, start) >= tuple(until):
+                    return
+                if not line.endswith(b"\n"):
+                    break  # record still being written
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    log.warning("Skipped a corrupt record", extra={"segment": seq, "offset": start, "bytes": len(line)})
+                    if corrupt is not None:
+                        corrupt.append((seq, start))
+                    continue
+                yield seq, start, offset, record
+
+
+class SessionLogStore:
+    """
+    Segmented, append-only JSON-lines store for logged sessions.
+
+    - Each append is a single buffered write of one line to the open segment.
+    - fsync is batched: it runs once `fsync_every` records are pending or
+      `fsync_interval` seconds have passed, whichever comes first.
+    - A new segment is started when the current one exceeds
+      `max_segment_bytes` or is older than `max_segment_age` seconds.
+    - On open, a torn trailing record left by a crash is truncated away.
+      A corrupt record anywhere else is skipped on read (read_entries).
+    """
+
+    def __init__(self, directory: str, max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_segment_age: float = 24 * 3600, fsync_every: int = 64,
+                 fsync_interval: float = 1.0):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._size = 0
+        self._opened_at = 0.0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._closed = threading.Event()
+        self.corrupt_records = []  # (segment, offset) of the records iter_entries skipped
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        if segments:
+            self._recover(segments[-1])
+            self._open_segment(segments[-1])
+        else:
+            self._open_segment(1)
+
+        self._syncer = threading.Thread(target=self._sync_loop, name="log-store-fsync", daemon=True)
+        self._syncer.start()
+
+    # ---- Segment management ----
+    def segments(self):
+        """Sequence numbers of all segments on disk, oldest first."""
+        return list_segments(self.directory)
+
+    def segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, _segment_name(seq))
+
+    def _recover(self, seq: int):
+        """Drop a partially written last record (no newline or invalid JSON)."""
+        path = self.segment_path(seq)
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = len(data)
+            if end and not data.endswith(b"\n"):
+                end = data.rfind(b"\n") + 1
+            else:
+                # A full line can still be garbage if the crash hit before fsync
+                start = data.rfind(b"\n", 0, max(end - 1, 0)) + 1
+                if start < end:
+                    try:
+                        json.loads(data[start:end])
+                    except ValueError:
+                        end = start
+            if end != len(data):
+                log.warning("Truncated torn data at the end of a segment", extra={"bytes": len(data) - end, "path": path})
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _open_segment(self, seq: int):
+        path = self.segment_path(seq)
+        self._file = open(path, 'ab')
+        self._seq = seq
+        self._size = self._file.tell()
+        self._opened_at = os.path.getmtime(path) if self._size else time.time()
+
+    def _rotate_if_needed(self):
+        too_big = self._size >= self.max_segment_bytes
+        too_old = self._size and time.time() - self._opened_at >= self.max_segment_age
+        if too_big or too_old:
+            self._sync_locked()
+            self._file.close()
+            self._open_segment(self._seq + 1)
+
+    # ---- Writes ----
+    def append(self, entry: dict):
+        """Append one record; returns its (segment, offset) location."""
+        line = json.dumps(entry, separators=(',', ':')).encode('utf-8') + b"\n"
+        with self._lock:
+            if self._file is None:
+                raise ValueError("Log store is closed")
+            self._rotate_if_needed()
+            location = (self._seq, self._size)
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)
+            self._pending += 1
+            if self._pending >= self.fsync_every:
+                self._sync_locked()
+        return location
+
+    def _sync_locked(self):
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._file is not None and time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync_locked()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+
+    # ---- Reads ----
+    def iter_entries(self, with_location: bool = False):
+        """Yield every stored record in append order, skipping (and noting in corrupt_records) unreadable ones."""
+        self.corrupt_records = []
+        for seq, start, _, entry in read_entries(self.directory, corrupt=self.corrupt_records):
+            yield ((seq, start), entry) if with_location else entry
+
+    def read_at(self, seq: int, offset: int) -> dict:
+        """Read the single record stored at a (segment, offset) location."""
+        with open(self.segment_path(seq), 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def is_empty(self) -> bool:
+        segments = self.segments()
+        return len(segments) == 1 and os.path.getsize(self.segment_path(segments[0])) == 0
+
+    def import_legacy_json(self, path: str) -> int:
+        """Copy sessions from the old single-array click_logs.json into the store."""
+        with open(path, 'r') as f:
+            logs = json.load(f)
+        for entry in logs:
+            self.append(entry)
+        self.sync()
+        return len(logs)
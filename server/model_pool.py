@@ -0,0 +1,180 @@
+import hashlib
+import os
+import queue
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# ---- Multi-process model serving ----
+# The XGBoost model is exported once to the native UBJSON booster format,
+# under a name derived from its contents. Each worker process loads only that
+# file with xgboost (no joblib/sklearn import), so workers start quickly and
+# hold just the booster. The server hands each batch to an
+# idle worker together with the path of the current model.
+#
+# Hot swap: the server exports the new model and load() switches the current
+# path under a lock. Batches already sent keep the path they were sent with, so
+# in-flight requests finish on the old model and every later batch uses the
+# new one; each worker reloads the first time it sees a new path. A caller can
+# also pin a path per call (positive_proba's model_path), so the model stays
+# bound to whatever else it is versioned with (app.py's calibration).
+
+WORKER_START_TIMEOUT = 30.0
+KEEP_EXPORTS = 3  # native exports kept on disk (the current one and the previous ones)
+
+
+def export_native(model, out_dir: str) -> str:
+    """Writes the classifier's booster as out_dir/xgboost-<sha1>.ubj and returns the path."""
+    if not hasattr(model, 'get_booster'):
+        raise ValueError(f"{type(model).__name__} has no native booster to export")
+    raw = bytes(model.get_booster().save_raw('ubj'))
+    path = os.path.join(out_dir, f"xgboost-{hashlib.sha1(raw).hexdigest()[:16]}.ubj")
+    if not os.path.exists(path):
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+    return path
+
+
+class ModelPool:
+    """N worker processes scoring feature batches with a shared native model file."""
+
+    def __init__(self, workers: int, model_path: str):
+        self.model_path = model_path
+        self.generation = 1
+        self._lock = threading.Lock()
+        self._authkey = secrets.token_bytes(32)
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        self._idle = queue.Queue()
+        self._procs = []
+        for worker in self._spawn(workers):
+            self._idle.put(worker)
+
+    def _spawn(self, count: int):
+        """Starts `count` workers at once and returns their (process, connection) pairs."""
+        procs = {}
+        for _ in range(count):
+            proc = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), f"{self._listener.address[1]}"],
+                stdin=subprocess.PIPE,
+            )
+            proc.stdin.write(self._authkey.hex().encode())
+            proc.stdin.close()
+            procs[proc.pid] = proc
+
+        accepted = queue.Queue()
+
+        def accept():
+            for _ in range(count):
+                conn = self._listener.accept()
+                accepted.put((conn.recv(), conn))  # each worker introduces itself with its pid
+
+        threading.Thread(target=accept, daemon=True).start()
+        workers = []
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while len(workers) < count:
+            try:
+                pid, conn = accepted.get(timeout=0.2)
+                workers.append((procs[pid], conn))
+            except queue.Empty:
+                failed = [proc for proc in procs.values() if proc.poll() is not None]
+                if failed or time.monotonic() > deadline:
+                    for proc in procs.values():
+                        proc.kill()
+                    raise RuntimeError(f"model worker failed to start (exit codes {[p.poll() for p in failed]})")
+        self._procs.extend(procs.values())
+        return workers
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Class predictions (0/1) for a 2-D feature matrix."""
+        return (self.positive_proba(X) > 0.5).astype(np.int64)
+
+    def positive_proba(self, X: np.ndarray, model_path: str = None) -> np.ndarray:
+        """P(class 1) for a 2-D feature matrix, scored on one idle worker with `model_path` (default: the current model)."""
+        if model_path is None:
+            with self._lock:
+                model_path = self.model_path
+        proc, conn = self._idle.get()
+        try:
+            conn.send((model_path, np.ascontiguousarray(X, dtype=np.float64)))
+            ok, result = conn.recv()
+        except (EOFError, OSError):
+            # Worker died: replace it and fail just this batch
+            self._procs.remove(proc)
+            proc.kill()
+            self._idle.put(self._spawn(1)[0])
+            raise RuntimeError("model worker exited while scoring")
+        self._idle.put((proc, conn))
+        if not ok:
+            raise RuntimeError(f"model worker error: {result}")
+        return result
+
+    def load(self, model_path: str) -> int:
+        """Switches every later batch to `model_path`; returns the new generation."""
+        with self._lock:
+            if model_path != self.model_path:
+                self.model_path = model_path
+                self.generation += 1
+            self._prune(os.path.dirname(model_path))
+            return self.generation
+
+    def _prune(self, out_dir: str):
+        exports = sorted(
+            (os.path.join(out_dir, name) for name in os.listdir(out_dir) if name.endswith('.ubj')),
+            key=os.path.getmtime, reverse=True,
+        )
+        for path in exports[KEEP_EXPORTS:]:
+            if path != self.model_path:
+                os.remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._procs),
+                "idle_workers": self._idle.qsize(),
+                "model_path": self.model_path,
+                "generation": self.generation,
+            }
+
+    def close(self):
+        for proc, conn in list(self._idle.queue):
+            conn.close()
+        for proc in self._procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._listener.close()
+
+
+# ---- Worker process ----
+def _serve(port: int, authkey: bytes):
+    import xgboost as xgb
+
+    conn = Client(('127.0.0.1', port), authkey=authkey)
+    conn.send(os.getpid())
+    loaded_path, booster = None, None
+    while True:
+        try:
+            model_path, X = conn.recv()
+        except EOFError:
+            return  # server closed the connection
+        try:
+            if model_path != loaded_path:
+                booster = xgb.Booster(model_file=model_path)
+                booster.set_param('nthread', 1)
+                loaded_path = model_path
+            conn.send((True, booster.inplace_predict(X)))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+if __name__ == '__main__':
+    _serve(int(sys.argv[1]), bytes.fromhex(sys.stdin.read()))
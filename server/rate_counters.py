@@ -0,0 +1,157 @@
+import hashlib
+import ipaddress
+import threading
+import time
+
+import numpy as np
+
+# ---- Sliding-window rate counters ----
+# Sessions and clicks per source (IP, /24 subnet, user agent) over the last
+# 1 minute, 10 minutes and 1 hour, in constant memory.
+#
+# Each window is a ring of time buckets; each bucket is a count-min sketch
+# (depth x width counters, one column per row picked by hashing the key) with
+# a sessions and a clicks plane. A running sum of the buckets in the window is
+# kept next to the ring: an update adds to the current bucket and the running
+# sum (`depth` cells), a query reads `depth` cells of the running sum and takes
+# the minimum, and when a bucket falls out of the window it is subtracted
+# from the running sum and cleared. Updates and queries are O(depth) whatever
+# the number of sources, and counts can only be overestimated, by at most
+# e/width of the window's total with high probability.
+#
+# The window slides in bucket steps: the 1h window, for example, covers the
+# last 55-60 minutes.
+
+SESSIONS = 0
+CLICKS = 1
+
+# window name -> (length in seconds, number of buckets)
+WINDOWS = {'1m': (60, 6), '10m': (600, 10), '1h': (3600, 12)}
+KINDS = ('ip', 'subnet', 'ua')
+
+FEATURE_NAMES = [
+    f"{kind}_{metric}_{window}"
+    for kind in KINDS for metric in ('sessions', 'clicks') for window in WINDOWS
+]
+
+
+def subnet_of(ip: str):
+    """'a.b.c.0/24' for IPv4, the /64 for IPv6, None if `ip` isn't an address."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+class SlidingCountMin:
+    """Count-min sketch of (sessions, clicks) per key over a sliding time window."""
+
+    def __init__(self, window_s: float, n_buckets: int, width: int = 1 << 14, depth: int = 4):
+        self.bucket_s = window_s / n_buckets
+        self.n_buckets = n_buckets
+        self.width = width
+        self.depth = depth
+        self._ring = np.zeros((n_buckets, 2, depth, width), dtype=np.int32)
+        self._window = np.zeros((2, depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+        self._epoch = None  # index of the current bucket since the Unix epoch
+
+    def _advance(self, now: float):
+        epoch = int(now // self.bucket_s)
+        if self._epoch is None:
+            self._epoch = epoch
+        elif epoch > self._epoch:
+            for step in range(1, min(epoch - self._epoch, self.n_buckets) + 1):
+                bucket = (self._epoch + step) % self.n_buckets
+                self._window -= self._ring[bucket]
+                self._ring[bucket] = 0
+            self._epoch = epoch
+
+    def add(self, columns: np.ndarray, sessions: int, clicks: int, now: float):
+        """Counts for every key given by `columns`, a (n_keys, depth) array of sketch columns."""
+        self._advance(now)
+        bucket = self._ring[self._epoch % self.n_buckets]
+        cells = (np.broadcast_to(self._rows, columns.shape), columns)
+        for metric, amount in ((SESSIONS, sessions), (CLICKS, clicks)):
+            if amount:
+                # add.at, not +=, so two keys sharing a column in a row both count
+                np.add.at(bucket[metric], cells, amount)
+                np.add.at(self._window[metric], cells, amount)
+
+    def estimate(self, columns: np.ndarray, now: float) -> np.ndarray:
+        """(n_keys, 2) array of (sessions, clicks) seen for each key in the window."""
+        self._advance(now)
+        return self._window[:, self._rows, columns].min(axis=-1).T
+
+    @property
+    def nbytes(self) -> int:
+        return self._ring.nbytes + self._window.nbytes
+
+
+class RateCounters:
+    """Per-IP, per-/24 and per-user-agent session and click rates over 1m/10m/1h."""
+
+    def __init__(self, width: int = 1 << 14, depth: int = 4):
+        self.depth = depth
+        self.width = width
+        # Keys of all three kinds share one sketch per window (keys are prefixed with their kind)
+        self._sketches = {name: SlidingCountMin(length, buckets, width, depth)
+                          for name, (length, buckets) in WINDOWS.items()}
+        self._lock = threading.Lock()
+
+    def _columns(self, key: str) -> np.ndarray:
+        digest = hashlib.blake2b(key.encode('utf-8', 'replace'), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype='<u4') % self.width
+
+    def _keys(self, ip: str, user_agent: str):
+        """(kinds present, (n_kinds, depth) sketch columns)."""
+        keys = {'ip': ip or None, 'subnet': subnet_of(ip) if ip else None, 'ua': user_agent or None}
+        kinds = [kind for kind in KINDS if keys[kind] is not None]
+        columns = np.array([self._columns(f"{kind}:{keys[kind]}") for kind in kinds], dtype=np.intp)
+        return kinds, columns.reshape(len(kinds), self.depth)
+
+    def _counts(self, kinds, columns: np.ndarray, now: float) -> dict:
+        features = dict.fromkeys(FEATURE_NAMES, 0)
+        if not kinds:
+            return features
+        for window, sketch in self._sketches.items():
+            for kind, (sessions, clicks) in zip(kinds, sketch.estimate(columns, now).tolist()):
+                features[f"{kind}_sessions_{window}"] = sessions
+                features[f"{kind}_clicks_{window}"] = clicks
+        return features
+
+    def record(self, ip: str, user_agent: str, clicks: int = 0, now: float = None) -> dict:
+        """Counts one session and returns the rate features including it."""
+        now = time.time() if now is None else now
+        kinds, columns = self._keys(ip, user_agent)
+        with self._lock:
+            if kinds:
+                for sketch in self._sketches.values():
+                    sketch.add(columns, 1, int(clicks), now)
+            return self._counts(kinds, columns, now)
+
+    def counts(self, ip: str, user_agent: str, now: float = None) -> dict:
+        """Rate features for a source without counting anything."""
+        now = time.time() if now is None else now
+        kinds, columns = self._keys(ip, user_agent)
+        with self._lock:
+            return self._counts(kinds, columns, now)
+
+    def stats(self) -> dict:
+        return {
+            "windows": {name: {"seconds": length, "buckets": buckets} for name, (length, buckets) in WINDOWS.items()},
+            "sketch_width": self.width,
+            "sketch_depth": self.depth,
+            "memory_bytes": sum(sketch.nbytes for sketch in self._sketches.values()),
+        }
+
+
+def block_reason(features: dict, limits: dict):
+    """'name=count > limit' for the first rate feature over its limit, else None."""
+    for name, limit in limits.items():
+        count = features.get(name)
+        if count is not None and count > limit:
+            return f"{name}={count} > {limit}"
+    return None
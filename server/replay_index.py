@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# ---- Replay fingerprints ----
+# Scripted bots replay the same mouse path over and over. A session's path is
+# reduced to a MinHash signature of its set of shingles. The path is first
+# resampled into steps of about STEP_PX (the next point kept is the first one
+# at least STEP_PX away from the last kept point), and each step is reduced to
+# one of DIRECTIONS compass directions; a shingle is a run of SHINGLE
+# consecutive directions. Resampling makes the shingles insensitive to the
+# event rate and to a pixel or two of jitter, and since only directions are
+# kept, moving the whole path doesn't change them either. On the sessions in
+# click_logs.json, the closest pair of different visitors shares about 19% of
+# its signature; a copy of a path with +/-1 px of noise shares about 55%.
+#
+# Signatures merge with an elementwise minimum, so a session uploaded in
+# chunks gets its signature from the per-chunk ones (live_sessions.py). Only
+# the few shingles that straddle a chunk boundary are lost.
+#
+# ---- Index ----
+# The signature is cut into BANDS bands of ROWS values and each band is hashed
+# to one 64-bit key (locality-sensitive hashing). Two sessions whose shingle
+# sets have Jaccard similarity s share at least one band key with probability
+# 1 - (1 - s**ROWS)**BANDS: about 1.0 at s = 0.9, 0.4 at s = 0.5 and 0.01 at
+# s = 0.2.
+#
+# Keys are counted in time buckets covering the window. The current bucket is
+# a dict of key -> count. When time moves to a new bucket, the old one is
+# frozen into a sorted uint64 key array with a count array (12 bytes per key,
+# 96 per session). Buckets that leave the window are dropped whole. A lookup
+# is one searchsorted per frozen bucket plus BANDS dict lookups, so it costs
+# O(BANDS * buckets * log n) however many sessions are indexed.
+#
+# A session's match count is the largest count of any one of its band keys:
+# how many sessions in the window share a band with it. Sessions that share
+# different bands are not added together, so this can undercount loosely
+# similar paths, but for replays, which share every band, it is exact.
+
+STEP_PX = 20         # resampled step length
+DIRECTIONS = 8
+SHINGLE = 8          # steps per shingle
+NUM_HASHES = 32
+BANDS = 8
+ROWS = NUM_HASHES // BANDS
+MIN_SHINGLES = 12    # paths with fewer distinct shingles are too generic to fingerprint
+
+EMPTY_SIGNATURE = np.full(NUM_HASHES, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+_SEEDS = np.random.default_rng(0x5EED).integers(0, np.iinfo(np.uint64).max, NUM_HASHES,
+                                                dtype=np.uint64, endpoint=True)
+_BAND_SEEDS = np.random.default_rng(0xBA4D).integers(0, np.iinfo(np.uint64).max, BANDS,
+                                                     dtype=np.uint64, endpoint=True)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, elementwise on a uint64 array (wraps on overflow)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def resample(coordinates: np.ndarray, step_px: float = STEP_PX) -> np.ndarray:
+    """The points of an (n, 2) path that are at least step_px from the previous point kept."""
+    if len(coordinates) < 2:
+        return coordinates
+    xs, ys = coordinates[:, 0].tolist(), coordinates[:, 1].tolist()
+    last_x, last_y = xs[0], ys[0]
+    keep = [0]
+    min_sq = step_px * step_px
+    for i in range(1, len(xs)):
+        dx, dy = xs[i] - last_x, ys[i] - last_y
+        if dx * dx + dy * dy >= min_sq:
+            keep.append(i)
+            last_x, last_y = xs[i], ys[i]
+    return coordinates[keep]
+
+
+def minhash(coordinates: np.ndarray):
+    """(signature, number of distinct shingles) of an (n, 2) mouse path."""
+    steps = np.diff(resample(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)), axis=0)
+    if len(steps) < SHINGLE:
+        return EMPTY_SIGNATURE.copy(), 0
+    angles = np.arctan2(steps[:, 1], steps[:, 0])
+    tokens = (np.rint(angles / (2 * np.pi) * DIRECTIONS).astype(np.int64) % DIRECTIONS).astype(np.uint64)
+
+    n = len(tokens) - SHINGLE + 1
+    shingles = np.zeros(n, dtype=np.uint64)
+    for offset in range(SHINGLE):
+        shingles = _mix(shingles ^ tokens[offset:offset + n])
+    shingles = np.unique(shingles)
+    return _mix(shingles[None, :] ^ _SEEDS[:, None]).min(axis=1), len(shingles)
+
+
+def merge_signatures(signature: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Signature of the union of two shingle sets."""
+    return np.minimum(signature, other)
+
+
+def band_keys(signature: np.ndarray) -> np.ndarray:
+    """The BANDS locality-sensitive keys of a signature."""
+    keys = _BAND_SEEDS.copy()
+    for row in signature.reshape(BANDS, ROWS).T:
+        keys = _mix(keys ^ row)
+    return keys
+
+
+class ReplayIndex:
+    """Band-key counts of the sessions fingerprinted over the last `window_s` seconds."""
+
+    def __init__(self, window_s: float = 6 * 3600, n_buckets: int = 12):
+        self.window_s = window_s
+        self.bucket_s = window_s / n_buckets
+        self.n_buckets = n_buckets
+        self._lock = threading.Lock()
+        self._epoch = None
+        self._open = {}          # band key -> count, for the current bucket
+        self._open_sessions = 0
+        self._frozen = deque()   # (epoch, sorted keys, counts, sessions), oldest first
+        self._indexed = 0
+        self._skipped = 0
+
+    def _advance(self, now: float):
+        epoch = int(now // self.bucket_s)
+        if self._epoch is None:
+            self._epoch = epoch
+        elif epoch > self._epoch:
+            if self._open:
+                keys = np.fromiter(self._open.keys(), dtype=np.uint64, count=len(self._open))
+                counts = np.fromiter(self._open.values(), dtype=np.uint32, count=len(self._open))
+                order = np.argsort(keys)
+                self._frozen.append((self._epoch, keys[order], counts[order], self._open_sessions))
+            self._open, self._open_sessions = {}, 0
+            self._epoch = epoch
+        while self._frozen and self._frozen[0][0] <= self._epoch - self.n_buckets:
+            self._frozen.popleft()
+
+    def _count(self, keys: np.ndarray) -> int:
+        counts = np.array([self._open.get(key, 0) for key in keys.tolist()], dtype=np.int64)
+        for _, frozen_keys, frozen_counts, _ in self._frozen:
+            at = np.minimum(np.searchsorted(frozen_keys, keys), len(frozen_keys) - 1)
+            counts += np.where(frozen_keys[at] == keys, frozen_counts[at], 0)
+        return int(counts.max())
+
+    def matches(self, signature: np.ndarray, shingles: int, now: float = None):
+        """Sessions in the window sharing a band with this one, or None if the path is too short."""
+        if shingles < MIN_SHINGLES:
+            return None
+        keys = band_keys(signature)
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            return self._count(keys)
+
+    def add(self, signature: np.ndarray, shingles: int, now: float = None):
+        """Like matches() for the sessions seen before this one, then indexes it."""
+        if shingles < MIN_SHINGLES:
+            with self._lock:
+                self._skipped += 1
+            return None
+        keys = band_keys(signature)
+        with self._lock:
+            self._advance(time.time() if now is None else now)
+            matches = self._count(keys)
+            for key in keys.tolist():
+                self._open[key] = self._open.get(key, 0) + 1
+            self._open_sessions += 1
+            self._indexed += 1
+            return matches
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._advance(time.time())
+            return {
+                "window_s": self.window_s,
+                "buckets": len(self._frozen) + 1,
+                "sessions_in_window": self._open_sessions + sum(bucket[3] for bucket in self._frozen),
+                "indexed": self._indexed,
+                "too_short": self._skipped,
+                "frozen_bytes": sum(keys.nbytes + counts.nbytes for _, keys, counts, _ in self._frozen),
+            }
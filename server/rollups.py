@@ -0,0 +1,120 @@
+import heapq
+import threading
+
+# ---- Dashboard rollups ----
+# Counters updated once per logged session so the dashboard can be served a
+# few kilobytes of aggregates instead of the raw session log.
+
+SCORE_BINS = 20  # bot score histogram buckets of 0.05
+TOP_CAPACITY = 1000  # IPs / user agents tracked per table for the top lists
+
+
+class SpaceSaving:
+    """Approximate counts of the heaviest keys of a stream in `capacity` slots (Space-Saving).
+
+    When every slot is taken, a new key replaces the key with the smallest count
+    and inherits that count as its possible overcount (`error`). A tracked key's
+    `total` is never below its true count and overcounts it by at most `error`.
+    Every key seen more than n / capacity times out of n is tracked. Counts are
+    bucketed by value, so an update is O(1) however many keys the stream has.
+    """
+
+    def __init__(self, capacity: int = TOP_CAPACITY):
+        self.capacity = capacity
+        self._entries = {}   # key -> [total, error, {prediction: count since tracked}]
+        self._buckets = {}   # total -> keys with that total
+        self._min = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _unbucket(self, key, total):
+        bucket = self._buckets[total]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[total]
+
+    def add(self, key, prediction):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._unbucket(key, entry[0])
+        elif len(self._entries) < self.capacity:
+            entry = self._entries[key] = [0, 0, {}]
+        else:
+            evicted = next(iter(self._buckets[self._min]))
+            self._unbucket(evicted, self._min)
+            del self._entries[evicted]
+            entry = self._entries[key] = [self._min, self._min, {}]
+        entry[0] += 1
+        entry[2][prediction] = entry[2].get(prediction, 0) + 1
+        self._buckets.setdefault(entry[0], set()).add(key)
+        if entry[0] < self._min or self._min not in self._buckets:
+            self._min = entry[0]
+
+    def top(self, n: int, key_name: str) -> list:
+        top = heapq.nlargest(n, self._entries.items(), key=lambda item: item[1][0])
+        return [{key_name: key, "total": total, "error": error, **counts} for key, (total, error, counts) in top]
+
+
+class SessionRollups:
+    """Incrementally maintained prediction counts by time, and the heaviest IPs and user agents."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.by_prediction = {}
+        self.by_decision = {}
+        self.score_histogram = [0] * SCORE_BINS  # model-scored sessions only
+        self.by_hour = {}          # 'YYYY-MM-DDTHH' -> {prediction: count}
+        self.by_day = {}           # 'YYYY-MM-DD'    -> {prediction: count}
+        self.by_hour_of_day = {}   # 'HH:00'         -> {prediction: count}
+        self.by_ip = SpaceSaving()
+        self.by_user_agent = SpaceSaving()
+
+    @staticmethod
+    def _bump(table: dict, key, prediction):
+        counts = table.get(key)
+        if counts is None:
+            counts = table[key] = {}
+        counts[prediction] = counts.get(prediction, 0) + 1
+
+    def add(self, entry: dict):
+        prediction = entry.get("prediction") or "Unknown"
+        timestamp = entry.get("timestamp") or ""
+        with self._lock:
+            self.total += 1
+            self.by_prediction[prediction] = self.by_prediction.get(prediction, 0) + 1
+            decision = entry.get("decision")
+            if decision is not None:
+                self.by_decision[decision] = self.by_decision.get(decision, 0) + 1
+            score = entry.get("score")
+            if score is not None:
+                self.score_histogram[min(int(score * SCORE_BINS), SCORE_BINS - 1)] += 1
+            if len(timestamp) >= 13:
+                self._bump(self.by_hour, timestamp[:13], prediction)
+                self._bump(self.by_day, timestamp[:10], prediction)
+                self._bump(self.by_hour_of_day, timestamp[11:13] + ":00", prediction)
+            self.by_ip.add(entry.get("ip") or "unknown", prediction)
+            self.by_user_agent.add(entry.get("userAgent") or "unknown", prediction)
+
+    def snapshot(self, hours: int = 168, days: int = 90, top: int = 10) -> dict:
+        """Aggregates for the dashboard, limited to the most recent buckets.
+
+        The top lists are approximate (SpaceSaving): `total` may overcount by up
+        to `error`, and the per-prediction counts start when the key was last tracked.
+        """
+        with self._lock:
+            recent_hours = sorted(self.by_hour)[-hours:] if hours > 0 else []
+            recent_days = sorted(self.by_day)[-days:] if days > 0 else []
+            return {
+                "total": self.total,
+                "by_prediction": dict(self.by_prediction),
+                "by_decision": dict(self.by_decision),
+                "score_histogram": {f"{i / SCORE_BINS:.2f}": n for i, n in enumerate(self.score_histogram)},
+                "by_hour": {h: dict(self.by_hour[h]) for h in recent_hours},
+                "by_day": {d: dict(self.by_day[d]) for d in recent_days},
+                "by_hour_of_day": {h: dict(c) for h, c in sorted(self.by_hour_of_day.items())},
+                "top_approximate": True,
+                "top_ips": self.by_ip.top(top, "ip"),
+                "top_user_agents": self.by_user_agent.top(top, "userAgent"),
+            }
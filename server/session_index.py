@@ -0,0 +1,182 @@
+import base64
+import bisect
+import threading
+
+# ---- In-memory session index ----
+# Keeps a small projection of every logged session (timestamp, session_id,
+# prediction, score, decision and its location in the log store) sorted by
+# timestamp, once overall, once per prediction label and once per decision. A page of results is a binary search
+# plus a slice, so serving it never touches the rest of the history.
+#
+# Records are ordered by (timestamp, segment, offset): ties on the timestamp
+# are broken by the record's position in the log store, which is the same
+# across restarts, so a cursor handed out before a restart still resumes at
+# the same record.
+
+BLOCK_SIZE = 1024  # records per block of a _SortedRecords; a block is split at twice this
+
+
+def encode_cursor(key) -> str:
+    timestamp, segment, offset = key
+    return base64.urlsafe_b64encode(f"{timestamp}|{segment}|{offset}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, segment, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 2)
+        return timestamp, int(segment), int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"malformed cursor {cursor!r}")
+
+
+class _SortedRecords:
+    """Records kept in (timestamp, segment, offset) order, in blocks with a list of their last keys for bisect.
+
+    Records mostly arrive in order and are appended to the last block. One that
+    arrives out of order (concurrent requests finishing slightly out of
+    timestamp order) is inserted into its own block, so the cost is bounded by
+    the block size instead of the number of records.
+    """
+
+    def __init__(self):
+        self._keys = []      # per block, sorted
+        self._records = []   # per block, parallel to _keys
+        self._maxes = []     # last key of each block
+        self._starts = []    # index of each block's first record
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key, record):
+        if not self._maxes or key >= self._maxes[-1]:
+            if not self._maxes or len(self._keys[-1]) >= BLOCK_SIZE:
+                self._keys.append([])
+                self._records.append([])
+                self._maxes.append(key)
+                self._starts.append(self._len)
+            self._keys[-1].append(key)
+            self._records[-1].append(record)
+            self._maxes[-1] = key
+        else:
+            block = bisect.bisect_right(self._maxes, key)
+            keys = self._keys[block]
+            i = bisect.bisect_right(keys, key)
+            keys.insert(i, key)
+            self._records[block].insert(i, record)
+            for later in range(block + 1, len(self._starts)):
+                self._starts[later] += 1
+            if len(keys) > 2 * BLOCK_SIZE:
+                self._split(block)
+        self._len += 1
+
+    def _split(self, block: int):
+        keys, records = self._keys[block], self._records[block]
+        self._keys[block:block + 1] = [keys[:BLOCK_SIZE], keys[BLOCK_SIZE:]]
+        self._records[block:block + 1] = [records[:BLOCK_SIZE], records[BLOCK_SIZE:]]
+        self._maxes.insert(block, keys[BLOCK_SIZE - 1])
+        self._starts.insert(block + 1, self._starts[block] + BLOCK_SIZE)
+
+    def _bisect_left(self, key) -> int:
+        """Index of the first record whose key is >= key."""
+        block = bisect.bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            return self._len
+        return self._starts[block] + bisect.bisect_left(self._keys[block], key)
+
+    def _locate(self, i: int):
+        block = bisect.bisect_right(self._starts, i) - 1
+        return block, i - self._starts[block]
+
+    def key_at(self, i: int):
+        block, j = self._locate(i)
+        return self._keys[block][j]
+
+    def newest_first(self, start: int, stop: int) -> list:
+        """Records start..stop-1, newest first."""
+        page = []
+        if start >= stop:
+            return page
+        block, j = self._locate(stop - 1)
+        while len(page) < stop - start:
+            records = self._records[block]
+            take = min(j + 1, stop - start - len(page))
+            page.extend(records[j - take + 1:j + 1][::-1])
+            block -= 1
+            j = len(self._records[block]) - 1 if block >= 0 else 0
+        return page
+
+    def bounds(self, since=None, until=None, before=None):
+        lo = self._bisect_left((since,)) if since else 0
+        hi = self._bisect_left((until,)) if until else self._len
+        if before is not None:
+            hi = min(hi, self._bisect_left(before))
+        return lo, max(lo, hi)
+
+
+class SessionIndex:
+    """Timestamp / prediction / session_id index over the session log."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._all = _SortedRecords()
+        self._by_prediction = {}
+        self._by_decision = {}
+        self._by_session_id = {}
+
+    def add(self, entry: dict, location: tuple):
+        """Indexes a logged entry; `location` is its (segment, offset) in the log store."""
+        record = {
+            "session_id": entry.get("session_id"),
+            "timestamp": entry.get("timestamp"),
+            "prediction": entry.get("prediction"),
+            "score": entry.get("score"),
+            "decision": entry.get("decision"),
+        }
+        with self._lock:
+            key = (record["timestamp"] or "", *location)
+            self._all.add(key, record)
+            self._by_prediction.setdefault(record["prediction"], _SortedRecords()).add(key, record)
+            if record["decision"] is not None:
+                self._by_decision.setdefault(record["decision"], _SortedRecords()).add(key, record)
+            self._by_session_id[record["session_id"]] = (record, location)
+
+    def __len__(self):
+        return len(self._all)
+
+    def get(self, session_id: str):
+        """Returns (record, log store location) for a session, or None."""
+        with self._lock:
+            return self._by_session_id.get(session_id)
+
+    def query(self, prediction: str = None, since: str = None, until: str = None,
+              cursor: str = None, limit: int = 100, decision: str = None) -> dict:
+        """
+        Newest-first page of sessions, optionally only one prediction or one decision.
+
+        `since` is inclusive and `until` exclusive (ISO timestamps); `cursor`
+        is the `next_cursor` returned by the previous page.
+        """
+        if prediction is not None and decision is not None:
+            raise ValueError("filter by prediction or by decision, not both")
+        before = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            if decision is not None:
+                records = self._by_decision.get(decision, _SortedRecords())
+            else:
+                records = self._all if prediction is None else self._by_prediction.get(prediction, _SortedRecords())
+            lo, end = records.bounds(since, until)
+            _, hi = records.bounds(since, until, before)
+            total = end - lo
+            start = max(lo, hi - limit)
+            page = records.newest_first(start, hi)
+            next_key = records.key_at(start) if start > lo else None
+
+        return {
+            "sessions": page,
+            "total_count": total,
+            "page_info": {
+                "has_next": next_key is not None,
+                "next_cursor": encode_cursor(next_key) if next_key else None,
+            },
+        }
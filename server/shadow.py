@@ -0,0 +1,95 @@
+import json
+import threading
+from datetime import datetime
+
+from batcher import MicroBatcher
+
+# ---- Shadow scoring ----
+# A candidate model scores the same sessions as the champion without the
+# request waiting for it. The request thread queues the session's feature
+# row and moves on. The shadow's own MicroBatcher thread scores it and
+# compares its (prediction, score, decision) with the champion's. Each
+# comparison is appended to the shadow log, which `model_registry.py report`
+# summarizes. When more than `max_queue` rows are waiting, new sessions are
+# skipped (and counted) rather than letting a slow shadow build up a backlog.
+
+
+class ShadowScorer:
+    """Scores sessions with a shadow model off the request path and logs disagreements with the champion."""
+
+    def __init__(self, predict_fn, champion_id: str, shadow_id: str, log_path: str, max_queue: int = 1000,
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.champion_id = champion_id
+        self.shadow_id = shadow_id
+        self.max_queue = max_queue
+        self._batcher = MicroBatcher(predict_fn, max_batch_size, max_wait_ms)
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a', buffering=1)
+        self._pending = 0
+        self._compared = 0
+        self._disagreements = 0
+        self._decision_disagreements = 0
+        self._skipped = 0
+        self._errors = 0
+        self._verdicts = {}  # "champion->shadow" -> sessions
+
+    def submit(self, session_id, row, champion: tuple):
+        """Queues one session for the shadow; returns without waiting for it."""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._skipped += 1
+                return
+            self._pending += 1
+        future = self._batcher.submit(row)
+        future.add_done_callback(lambda f: self._compare(f, session_id, champion))
+
+    def _compare(self, future, session_id, champion: tuple):
+        # Runs on the batcher thread once the shadow has scored the row
+        try:
+            shadow_prediction, shadow_score, shadow_decision = future.result()
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._errors += 1
+            return
+        champion_prediction, champion_score, champion_decision = champion
+        key = f"{champion_prediction}->{shadow_prediction}"
+        with self._lock:
+            self._pending -= 1
+            self._compared += 1
+            self._disagreements += shadow_prediction != champion_prediction
+            self._decision_disagreements += shadow_decision != champion_decision
+            self._verdicts[key] = self._verdicts.get(key, 0) + 1
+            self._log.write(json.dumps({
+                "timestamp": datetime.now().isoformat(),
+                "session_id": session_id,
+                "champion": self.champion_id,
+                "shadow": self.shadow_id,
+                "champion_prediction": champion_prediction,
+                "shadow_prediction": shadow_prediction,
+                "champion_score": champion_score,
+                "shadow_score": shadow_score,
+                "champion_decision": champion_decision,
+                "shadow_decision": shadow_decision,
+            }) + "\n")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "champion": self.champion_id,
+                "shadow": self.shadow_id,
+                "compared": self._compared,
+                "disagreements": self._disagreements,
+                "disagreement_rate": self._disagreements / self._compared if self._compared else None,
+                "decision_disagreements": self._decision_disagreements,
+                "verdicts": dict(self._verdicts),
+                "pending": self._pending,
+                "skipped": self._skipped,
+                "errors": self._errors,
+            }
+
+    def close(self):
+        """Scores whatever is still queued, then closes the log."""
+        self._batcher.close()
+        with self._lock:
+            self._log.close()
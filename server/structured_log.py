@@ -0,0 +1,46 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+# ---- Structured logging ----
+# The server's modules log through `logging.getLogger(__name__)`; configure()
+# sends every record to stderr as one JSON object per line:
+#
+#   {"ts": "...", "level": "INFO", "logger": "app", "msg": "Model loaded", "model_id": "xgboost/3"}
+#
+# Fields passed with `extra={...}` become keys of the object, so logs can be
+# filtered by session_id, model_id, ... without parsing the message.
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON line: timestamp, level, logger, message, then its extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level: str = 'INFO', stream=None):
+    """Routes the root logger to `stream` (stderr) as JSON lines at `level`; safe to call more than once."""
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if getattr(h, '_structured', False)]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    handler._structured = True
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
@@ -0,0 +1,271 @@
+import json
+import os
+
+import numpy as np
+
+# ---- Flat-array tree ensembles ----
+# Every tree of a RandomForest, GradientBoosting or XGBoost binary classifier
+# is laid end to end in a handful of NumPy arrays (one entry per node):
+#
+#   feature    int32    feature index tested at the node (0 for leaves)
+#   threshold  float32  go left when x <= threshold (+inf for leaves)
+#   left/right int32    absolute child indices; leaves point at themselves
+#   nan_left   bool     where a missing (NaN) value goes
+#   value      float64  leaf output (P(class 1) for forests, margin otherwise)
+#
+# plus the root index of each tree. Because leaves loop onto themselves,
+# evaluation is `depth` rounds of gather + compare over all trees at once,
+# with no per-node branching and no pandas or model library involved.
+#
+# Split tests are normalized at export so one comparison serves all three
+# libraries: both compare float32 features, sklearn as x <= t (t float64) and
+# XGBoost as x < t (t float32), and each is rewritten as x <= t' with t' the
+# largest float32 that gives the same answer.
+
+FOREST = 'forest'   # P(class 1) = mean of leaf probabilities
+LOGIT = 'logit'     # P(class 1) = sigmoid(base_score + sum of leaf values)
+
+
+def _float32_at_most(t: np.ndarray) -> np.ndarray:
+    """Largest float32 <= t, so (x32 <= t) == (x32 <= result) for every float32 x."""
+    t32 = t.astype(np.float32)
+    over = t32.astype(np.float64) > t
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+class FlatTreeEnsemble:
+    """Binary tree-ensemble classifier evaluated over flat node arrays."""
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'nan_left', 'value', 'roots')
+
+    def __init__(self, kind, feature, threshold, left, right, nan_left, value, roots,
+                 classes, base_score=0.0, feature_names=None):
+        self.kind = kind
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.nan_left = np.ascontiguousarray(nan_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.classes = np.asarray(classes)
+        if self.classes.dtype == object:
+            self.classes = self.classes.astype(str)  # saved without pickle
+        self.base_score = float(base_score)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.depth = self._max_depth()
+
+    def _max_depth(self) -> int:
+        depth, idx = 0, self.roots
+        while True:
+            nxt = self.left[idx]
+            moving = nxt != idx
+            if not moving.any():
+                return depth
+            idx = np.concatenate([nxt[moving], self.right[idx][moving]])
+            depth += 1
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    # ---- Evaluation ----
+    def leaves(self, X) -> np.ndarray:
+        """(n_rows, n_trees) leaf node index reached by each row in each tree."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        has_nan = np.isnan(X).any()
+        rows = np.arange(len(X))[:, None]
+        idx = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[idx]]
+            go_left = x <= self.threshold[idx]
+            if has_nan:
+                go_left |= np.isnan(x) & self.nan_left[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return idx
+
+    def positive_proba(self, X) -> np.ndarray:
+        """P(classes[1]) for each row."""
+        leaf_values = self.value[self.leaves(X)]
+        if self.kind == FOREST:
+            return leaf_values.mean(axis=1)
+        return 1.0 / (1.0 + np.exp(-(self.base_score + leaf_values.sum(axis=1))))
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.positive_proba(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes[(self.positive_proba(X) > 0.5).astype(np.intp)]
+
+    # ---- Persistence ----
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        meta = {'kind': self.kind, 'base_score': self.base_score, 'feature_names': self.feature_names}
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, classes=self.classes, meta=np.array(json.dumps(meta)),
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FlatTreeEnsemble':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['kind'], *(data[name] for name in cls.ARRAYS), classes=data['classes'],
+                       base_score=meta['base_score'], feature_names=meta['feature_names'])
+
+
+# ---- Exporters ----
+def _concat_trees(trees):
+    """trees: list of (feature, threshold float32, left, right, nan_left, value, is_leaf) per tree."""
+    parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'nan_left', 'value')}
+    roots, offset = [], 0
+    for feature, threshold, left, right, nan_left, value, is_leaf in trees:
+        n = len(feature)
+        own = np.arange(n) + offset
+        parts['feature'].append(np.where(is_leaf, 0, feature))
+        parts['threshold'].append(np.where(is_leaf, np.float32(np.inf), threshold).astype(np.float32))
+        parts['left'].append(np.where(is_leaf, own, left + offset))
+        parts['right'].append(np.where(is_leaf, own, right + offset))
+        parts['nan_left'].append(nan_left)
+        parts['value'].append(value)
+        roots.append(offset)
+        offset += n
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}, np.array(roots)
+
+
+def _sklearn_tree(tree, value):
+    is_leaf = tree.children_left == -1
+    nan_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)).astype(bool)
+    return (tree.feature, _float32_at_most(tree.threshold), tree.children_left, tree.children_right,
+            nan_left, value, is_leaf)
+
+
+def from_random_forest(model) -> FlatTreeEnsemble:
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        trees.append(_sklearn_tree(tree, counts[:, 1] / counts.sum(axis=1)))
+    arrays, roots = _concat_trees(trees)
+    return FlatTreeEnsemble(FOREST, roots=roots, classes=model.classes_,
+                            feature_names=getattr(model, 'feature_names_in_', None), **arrays)
+
+
+def from_gradient_boosting(model) -> FlatTreeEnsemble:
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("only binary GradientBoostingClassifier models are supported")
+    trees = [_sklearn_tree(e.tree_, e.tree_.value[:, 0, 0] * model.learning_rate) for e in model.estimators_[:, 0]]
+    arrays, roots = _concat_trees(trees)
+    base_score = model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0]
+    return FlatTreeEnsemble(LOGIT, roots=roots, classes=model.classes_, base_score=base_score,
+                            feature_names=getattr(model, 'feature_names_in_', None), **arrays)
+
+
+def from_xgboost(model) -> FlatTreeEnsemble:
+    booster = model.get_booster()
+    learner = json.loads(bytes(booster.save_raw('json')))['learner']
+    if learner['objective']['name'] != 'binary:logistic' or learner['gradient_booster']['name'] != 'gbtree':
+        raise ValueError("only binary:logistic gbtree XGBoost models are supported")
+
+    trees = []
+    for tree in learner['gradient_booster']['model']['trees']:
+        left = np.array(tree['left_children'], dtype=np.int64)
+        is_leaf = left == -1
+        conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        # x < t  <=>  x <= (largest float32 below t); a leaf's split_condition holds its value
+        threshold = np.nextafter(conditions, np.float32(-np.inf))
+        trees.append((np.array(tree['split_indices']), threshold, left, np.array(tree['right_children']),
+                      np.array(tree['default_left'], dtype=bool), conditions.astype(np.float64), is_leaf))
+    arrays, roots = _concat_trees(trees)
+
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    classes = getattr(model, 'classes_', np.array([0, 1]))
+    return FlatTreeEnsemble(LOGIT, roots=roots, classes=classes, base_score=np.log(base_score / (1 - base_score)),
+                            feature_names=booster.feature_names, **arrays)
+
+
+def convert(model) -> FlatTreeEnsemble:
+    """Flat export of a fitted RandomForest, GradientBoosting or XGBoost classifier."""
+    if hasattr(model, 'get_booster'):
+        return from_xgboost(model)
+    if type(model).__name__ == 'GradientBoostingClassifier':
+        return from_gradient_boosting(model)
+    if hasattr(model, 'estimators_'):
+        return from_random_forest(model)
+    raise ValueError(f"can't flatten a {type(model).__name__}")
+
+
+def probe_rows(flat: FlatTreeEnsemble, n: int = 2000, seed: int = 0) -> np.ndarray:
+    """Rows built from the model's own split thresholds and their float32 neighbours."""
+    rng = np.random.default_rng(seed)
+    n_features = int(flat.feature.max()) + 1 if flat.feature_names is None else len(flat.feature_names)
+    X = np.zeros((n, n_features), dtype=np.float32)
+    splits = flat.threshold != np.float32(np.inf)
+    for f in range(n_features):
+        t = flat.threshold[splits & (flat.feature == f)]
+        if not len(t):
+            continue
+        t = np.concatenate([t, np.nextafter(t, np.float32(np.inf)), np.nextafter(t, np.float32(-np.inf))])
+        X[:, f] = rng.choice(t, n)
+    return X
+
+
+def check_parity(model, flat: FlatTreeEnsemble, X: np.ndarray, atol: float = 1e-5) -> dict:
+    """Compares predict_proba and predict of the original model and its flat export."""
+    expected = model.predict_proba(X)[:, 1]
+    got = flat.positive_proba(X)
+    return {
+        'rows': len(X),
+        'max_proba_diff': float(np.abs(expected - got).max()),
+        'label_mismatches': int((model.predict(X) != flat.predict(X)).sum()),
+        'ok': bool(np.allclose(expected, got, rtol=0, atol=atol)),
+    }
+
+
+if __name__ == '__main__':
+    # Export the saved models next to them and verify each against the original
+    import argparse
+    import time
+    import warnings
+
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Export saved tree models to flat arrays and check parity.")
+    parser.add_argument('--models-dir', default=os.path.join('..', 'MachineLearning', 'savedModels'))
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    failed = False
+    for name in ('random_forest_classifier', 'gradient_boosting_classifier', 'xgboost_classifier'):
+        path = os.path.join(args.models_dir, f"{name}.joblib")
+        if not os.path.exists(path):
+            continue
+        model = joblib.load(path)
+        flat = convert(model)
+        X = probe_rows(flat, args.rows)
+        frame = pd.DataFrame(X, columns=flat.feature_names) if flat.feature_names else X
+        parity = check_parity(model, flat, frame)
+        failed |= not parity['ok']
+
+        out_path = os.path.join(args.models_dir, 'flat', f"{name}.npz")
+        flat.save(out_path)
+
+        timings = {}
+        for label, fn, row in (('original', model.predict_proba, frame[:1]), ('flat', flat.predict_proba, X[0])):
+            runs = []
+            for _ in range(500):
+                start = time.perf_counter()
+                fn(row)
+                runs.append(time.perf_counter() - start)
+            timings[label] = np.percentile(runs, 99) * 1e6
+        print(f"{name}: {flat.n_trees} trees, {len(flat.feature)} nodes, depth {flat.depth} -> {out_path}")
+        print(f"  parity on {parity['rows']} threshold rows: max |dp| {parity['max_proba_diff']:.2e}, "
+              f"{parity['label_mismatches']} label mismatches, {'OK' if parity['ok'] else 'FAILED'}")
+        print(f"  single-row p99: original {timings['original']:.0f}us, flat {timings['flat']:.0f}us")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,148 @@
+import gzip
+import struct
+import zlib
+
+import numpy as np
+
+# ---- Compact tracker wire format ----
+# Content-Type: application/x-clickcease-session (optionally Content-Encoding: gzip)
+#
+# All integers little-endian:
+#   4 bytes   magic b'CCS1'
+#   u16       session_id length, then that many UTF-8 bytes
+#   u32       Mousemove_visited_urls
+#   u32       n_moves, u32 n_times, u32 n_actions
+#   i16 x 2n  mousemove coordinates as (dx, dy) deltas from the previous point
+#             (the first point is relative to 0, 0)
+#   u32 x n   mousemove_times as deltas from the previous time (the first is
+#             relative to 0: the tracker's times are ms since tracking started)
+#   u8 x ...  actions, 2 bits each, low bits first (ACTION_* codes; any other
+#             click is sent as a left click, like the tracker does)
+#
+# Coordinates and times decode straight into NumPy arrays with frombuffer
+# and cumsum; nothing is parsed per event. encode refuses a session whose
+# deltas don't fit their field (e.g. epoch-millisecond times, or times that go
+# backwards) instead of letting them wrap around.
+
+CONTENT_TYPE = 'application/x-clickcease-session'
+MAGIC = b'CCS1'
+
+ACTION_MOVE = 0
+ACTION_LEFT_CLICK = 1
+ACTION_RIGHT_CLICK = 2
+ACTION_MIDDLE_CLICK = 3
+ACTION_OTHER_CLICK = 4  # session_features' code for any other click; doesn't fit in 2 bits
+ACTION_STRINGS = {ACTION_LEFT_CLICK: 'c(l)', ACTION_RIGHT_CLICK: 'c(r)', ACTION_MIDDLE_CLICK: 'c(m)'}
+
+_HEADER = struct.Struct('<IIII')
+_COORDINATE_DELTA = np.iinfo(np.int16)
+_TIME_DELTA = np.iinfo(np.uint32)
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def decompress(body: bytes, max_size: int) -> bytes:
+    """gunzips a request body, refusing anything that inflates past `max_size`."""
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = inflater.decompress(body, max_size)
+    except zlib.error as e:
+        raise WireFormatError(f"bad gzip body: {e}")
+    if inflater.unconsumed_tail:
+        raise WireFormatError(f"decompressed payload exceeds {max_size} bytes")
+    return data
+
+
+def decode(body: bytes) -> dict:
+    """Decodes a CCS1 payload into session_id, visited URL count and typed arrays."""
+    if body[:4] != MAGIC:
+        raise WireFormatError("not a CCS1 payload")
+    try:
+        (id_len,) = struct.unpack_from('<H', body, 4)
+        pos = 6 + id_len
+        session_id = body[6:pos].decode('utf-8')
+        visited_urls, n_moves, n_times, n_actions = _HEADER.unpack_from(body, pos)
+        pos += _HEADER.size
+
+        deltas = np.frombuffer(body, dtype='<i2', count=2 * n_moves, offset=pos).reshape(-1, 2)
+        pos += deltas.nbytes
+        time_deltas = np.frombuffer(body, dtype='<u4', count=n_times, offset=pos)
+        pos += time_deltas.nbytes
+        packed = np.frombuffer(body, dtype=np.uint8, count=(n_actions + 3) // 4, offset=pos)
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        raise WireFormatError(f"truncated or malformed CCS1 payload: {e}")
+
+    # 2-bit codes, four per byte, low bits first
+    actions = ((packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3).ravel()[:n_actions]
+
+    return {
+        'session_id': session_id,
+        'Mousemove_visited_urls': visited_urls,
+        'coordinates': np.cumsum(deltas, axis=0, dtype=np.int64),
+        'times': np.cumsum(time_deltas, dtype=np.int64),
+        'actions': actions,
+    }
+
+
+def encode(session_id: str, coordinates, times, actions, visited_urls: int = 0, compress: bool = False) -> bytes:
+    """Inverse of decode (the tracker's encoder, in Python for tools and bots)."""
+    coordinates = np.asarray(coordinates, dtype=np.int64).reshape(-1, 2)
+    times = np.asarray(times, dtype=np.int64)
+    actions = np.asarray(actions, dtype=np.int64).ravel()
+    if len(actions) and (actions.min() < ACTION_MOVE or actions.max() > ACTION_OTHER_CLICK):
+        raise WireFormatError(f"action codes must be {ACTION_MOVE}..{ACTION_OTHER_CLICK}")
+    actions = np.where(actions == ACTION_OTHER_CLICK, ACTION_LEFT_CLICK, actions).astype(np.uint8)
+
+    sid = session_id.encode('utf-8')
+    deltas = np.diff(coordinates, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    if deltas.size and (deltas.min() < _COORDINATE_DELTA.min or deltas.max() > _COORDINATE_DELTA.max):
+        raise WireFormatError(f"coordinate deltas must be {_COORDINATE_DELTA.min}..{_COORDINATE_DELTA.max}")
+    time_deltas = np.diff(times, prepend=0)
+    if time_deltas.size and (time_deltas.min() < 0 or time_deltas.max() > _TIME_DELTA.max):
+        raise WireFormatError(f"times must be non-decreasing from 0, at most {_TIME_DELTA.max} ms apart "
+                              f"(relative times, not epoch milliseconds)")
+    deltas, time_deltas = deltas.astype('<i2'), time_deltas.astype('<u4')
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    packed = (padded.reshape(-1, 4) << np.array([0, 2, 4, 6], dtype=np.uint8)).sum(axis=1, dtype=np.uint8)
+
+    body = b''.join([
+        MAGIC, struct.pack('<H', len(sid)), sid,
+        _HEADER.pack(visited_urls, len(coordinates), len(times), len(actions)),
+        deltas.tobytes(), time_deltas.tobytes(), packed.tobytes(),
+    ])
+    return gzip.compress(body) if compress else body
+
+
+def to_log_details(decoded: dict) -> dict:
+    """The decoded arrays as plain lists, as the session log stores a CCS1 session (session_features.from_wire reads it back).
+
+    Much cheaper than to_json_payload: no per-event dicts or strings are built.
+    """
+    return {
+        'session_id': decoded['session_id'],
+        'format': 'ccs1',
+        'Mousemove_visited_urls': decoded['Mousemove_visited_urls'],
+        'coordinates': decoded['coordinates'].tolist(),
+        'times': decoded['times'].tolist(),
+        'actions': decoded['actions'].tolist(),
+    }
+
+
+def to_json_payload(decoded: dict) -> dict:
+    """Rebuilds the JSON tracker payload shape, so logged sessions look the same either way."""
+    coords = decoded['coordinates'].tolist()
+    moves = iter(coords)
+    total_behaviour = [
+        'm({},{})'.format(*next(moves, (0, 0))) if code == ACTION_MOVE else ACTION_STRINGS[code]
+        for code in decoded['actions'].tolist()
+    ]
+    return {
+        'session_id': decoded['session_id'],
+        'total_behaviour': total_behaviour,
+        'mousemove_times': decoded['times'].tolist(),
+        'mousemove_total_behaviour': [{'x': x, 'y': y} for x, y in coords],
+        'Mousemove_visited_urls': decoded['Mousemove_visited_urls'],
+    }
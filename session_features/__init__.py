@@ -0,0 +1,7 @@
+"""Session feature extraction shared by the server, the phase1 scripts and the pipeline."""
+
+from .adapters import action_codes, from_json_payload, from_parsed, from_wire, pack_coordinates, read_session_file
+from .features import LABEL_MAPPING, MODEL_FEATURES, create_feature_vector, path_length
+from .session import (ACTION_LEFT_CLICK, ACTION_MIDDLE_CLICK, ACTION_MOVE, ACTION_OTHER_CLICK, ACTION_RIGHT_CLICK,
+                      Session)
+from .trajectory import FEATURE_NAMES as TRAJECTORY_FEATURES, trajectory_features
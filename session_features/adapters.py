@@ -0,0 +1,64 @@
+import numpy as np
+
+from .mouse_parser import parse_session_file
+from .session import (ACTION_LEFT_CLICK, ACTION_MIDDLE_CLICK, ACTION_MOVE, ACTION_OTHER_CLICK,
+                      ACTION_RIGHT_CLICK, Session)
+
+# ---- Adapters: every input format -> Session ----
+#   from_json_payload   tracker JSON body (/log-visit, /log-visit/chunk)
+#   from_wire           wire.decode() output (CCS1 body)
+#   from_parsed         a parsed phase1 file: phase1.parse_mouse_data_from_file
+#                       (lists, action strings) or mouse_parser (typed arrays)
+#   read_session_file   a phase1 mouse_movements.json, with the streaming parser
+
+
+def pack_coordinates(moves) -> np.ndarray:
+    """Packs [{'x', 'y'}, ...] into one contiguous (n, 2) float64 array."""
+    return np.fromiter(
+        (v for c in moves for v in (c['x'], c['y'])),
+        dtype=np.float64, count=2 * len(moves)
+    ).reshape(-1, 2)
+
+
+def action_codes(actions) -> np.ndarray:
+    """ACTION_* codes for action strings like 'm(10,20)' and 'c(l)'."""
+    if not len(actions):
+        return np.empty(0, dtype=np.uint8)
+    prefix = np.array(actions, dtype='U3')  # 'm(1', 'c(l', ...
+    codes = np.where(np.char.startswith(prefix, 'c'), ACTION_OTHER_CLICK, ACTION_MOVE).astype(np.uint8)
+    codes[prefix == 'c(l'] = ACTION_LEFT_CLICK
+    codes[prefix == 'c(r'] = ACTION_RIGHT_CLICK
+    codes[prefix == 'c(m'] = ACTION_MIDDLE_CLICK
+    return codes
+
+
+def from_json_payload(payload: dict) -> Session:
+    """Session from a tracker JSON body (a whole session or one chunk of it)."""
+    return Session(
+        payload.get('session_id'),
+        pack_coordinates(payload.get('mousemove_total_behaviour', [])),
+        payload.get('mousemove_times', []),
+        action_codes(payload.get('total_behaviour', [])),
+        payload.get('Mousemove_visited_urls', 0),
+    )
+
+
+def from_wire(decoded: dict) -> Session:
+    """Session from the dict wire.decode returns."""
+    return Session(decoded['session_id'], decoded['coordinates'], decoded['times'], decoded['actions'],
+                   decoded['Mousemove_visited_urls'])
+
+
+def from_parsed(session_id: str, parsed: dict) -> Session:
+    """Session from either phase1 file parser's output; an empty one if parsing failed (None)."""
+    if not parsed:
+        return Session(session_id)
+    actions = parsed['actions']
+    if not isinstance(actions, np.ndarray):
+        actions = action_codes(actions)
+    return Session(session_id, parsed['coordinates'], parsed['timestamps'], actions)
+
+
+def read_session_file(file_path: str, session_id: str = None) -> Session:
+    """Session from a phase1 mouse_movements.json, read with the streaming parser."""
+    return from_parsed(session_id, parse_session_file(file_path, session_id))
@@ -0,0 +1,18 @@
+"""
+Checks the trajectory feature cost against its per-session budget.
+
+Usage (from the repo root):
+    python -m session_features.benchmark     # exits 1 if p99 at 50k events is over BUDGET_MS
+"""
+import sys
+
+from .trajectory import BENCHMARK_EVENTS, BUDGET_MS, benchmark
+
+if __name__ == '__main__':
+    for n_events in (1_000, 10_000, BENCHMARK_EVENTS):
+        result = benchmark(n_events)
+        print(f"{result['events']:>6} events: p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+    if result['p99_ms'] > BUDGET_MS:
+        print(f"Over budget: p99 {result['p99_ms']:.2f} ms > {BUDGET_MS} ms at {BENCHMARK_EVENTS} events")
+        sys.exit(1)
+    print(f"Within budget ({BUDGET_MS} ms at {BENCHMARK_EVENTS} events)")
@@ -0,0 +1,43 @@
+import numpy as np
+
+from .session import Session
+
+# ---- Base features ----
+# The five features the deployed models are trained on.
+
+MODEL_FEATURES = ['total_events', 'mouse_distance', 'session_duration_ms', 'avg_velocity', 'click_count']
+# Class code of the encoded-label models -> verdict the server reports
+LABEL_MAPPING = {0: 'Bot', 1: 'Human'}
+
+
+def path_length(points: np.ndarray) -> float:
+    """Total euclidean length of the polyline through an (n, 2) array of points."""
+    steps = np.diff(points, axis=0).astype(np.float64)
+    return float(np.sqrt((steps * steps).sum(axis=1)).sum())
+
+
+def create_feature_vector(session: Session) -> dict:
+    """session_id and the MODEL_FEATURES of one session."""
+    features = {'session_id': session.session_id}
+
+    features['total_events'] = len(session.actions)
+
+    # Mouse distance (sum of segment lengths)
+    features['mouse_distance'] = 0
+    if len(session.coordinates) > 1:
+        features['mouse_distance'] = path_length(session.coordinates)
+
+    # Duration & velocity (only the first and last timestamps are needed)
+    features['session_duration_ms'] = 0
+    features['avg_velocity'] = 0
+    times = session.times
+    if len(times) > 1:
+        duration_ms = (times[-1] - times[0]).item()
+        features['session_duration_ms'] = duration_ms
+        if duration_ms > 0:
+            features['avg_velocity'] = features['mouse_distance'] / (duration_ms / 1000.0)
+
+    # Every non-move action is a click
+    features['click_count'] = session.clicks
+
+    return features
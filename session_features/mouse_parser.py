@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+
+from .session import (ACTION_LEFT_CLICK, ACTION_MIDDLE_CLICK, ACTION_MOVE, ACTION_OTHER_CLICK,
+                      ACTION_RIGHT_CLICK)
+
+# ---- Streaming mouse_movements.json tokenizer ----
+# Reads a session file in fixed-size byte chunks and splits it on quote
+# characters only, so the JSON structure between fields never has to be
+# valid (this also repairs the missing-comma '}"' files without rewriting
+# them). The three value strings are fed chunk by chunk into typed arrays:
+#
+#   mousemove_total_behaviour  -> coordinates  int64 (n, 2)
+#   mousemove_times            -> timestamps   int64 (n,)
+#   total_behaviour            -> actions      uint8 (n,) of ACTION_* codes
+#
+# Peak memory per session is one chunk plus the output arrays.
+
+CHUNK_SIZE = 1 << 20
+
+_CLICK_CODES = np.full(256, ACTION_OTHER_CLICK, dtype=np.uint8)
+_CLICK_CODES[ord('l')] = ACTION_LEFT_CLICK
+_CLICK_CODES[ord('r')] = ACTION_RIGHT_CLICK
+_CLICK_CODES[ord('m')] = ACTION_MIDDLE_CLICK
+
+_IS_DIGIT = np.zeros(256, dtype=bool)
+_IS_DIGIT[ord('0'):ord('9') + 1] = True
+_IS_WORD = _IS_DIGIT.copy()
+_IS_WORD[ord('a'):ord('z') + 1] = True
+_IS_WORD[ord('A'):ord('Z') + 1] = True
+_IS_WORD[ord('_')] = True
+
+_DIGITS = b"0123456789"
+_NON_DIGITS_TO_SPACE = bytes(c if c in _DIGITS else ord(' ') for c in range(256))
+
+
+class _IntFeeder:
+    """Collects every run of digits in a value string as int64."""
+
+    def __init__(self):
+        self.parts = []
+        self.carry = b""
+
+    def feed(self, piece: bytes):
+        data = self.carry + piece
+        cut = len(data)
+        while cut and data[cut - 1] in _DIGITS:
+            cut -= 1  # keep a number split across chunks for the next call
+        self.carry = data[cut:]
+        self._parse(data[:cut])
+
+    def _parse(self, data: bytes):
+        numbers = data.translate(_NON_DIGITS_TO_SPACE).strip()
+        if numbers:
+            self.parts.append(np.fromstring(numbers, dtype=np.int64, sep=' '))
+
+    def close(self):
+        self._parse(self.carry)
+        self.carry = b""
+
+    def array(self) -> np.ndarray:
+        return np.concatenate(self.parts) if self.parts else np.empty(0, dtype=np.int64)
+
+
+class _ActionFeeder:
+    """Emits an ACTION_* code for each 'm(<digit>' and 'c(<char>)' token, in order."""
+
+    def __init__(self):
+        self.parts = []
+        self.carry = b""
+
+    def feed(self, piece: bytes):
+        data = self.carry + piece
+        self._scan(data)
+        # '(' tokens within two bytes of the end are scanned on the next call
+        self.carry = data[-3:]
+
+    def _scan(self, data: bytes):
+        buf = np.frombuffer(data, dtype=np.uint8)
+        idx = np.flatnonzero(buf == ord('('))
+        idx = idx[(idx >= 1) & (idx + 2 < len(buf))]
+        if not len(idx):
+            return
+        before, after, closing = buf[idx - 1], buf[idx + 1], buf[idx + 2]
+        move = (before == ord('m')) & _IS_DIGIT[after]
+        click = (before == ord('c')) & _IS_WORD[after] & (closing == ord(')'))
+        keep = move | click
+        if keep.any():
+            self.parts.append(np.where(move[keep], ACTION_MOVE, _CLICK_CODES[after[keep]]).astype(np.uint8))
+
+    def close(self):
+        self.carry = b""
+
+    def array(self) -> np.ndarray:
+        return np.concatenate(self.parts) if self.parts else np.empty(0, dtype=np.uint8)
+
+
+_FEEDERS = {
+    b'mousemove_total_behaviour': _IntFeeder,
+    b'mousemove_times': _IntFeeder,
+    b'total_behaviour': _ActionFeeder,
+}
+
+
+def tokenize(stream, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Single pass over a binary stream; returns {field name: typed array}."""
+    feeders = {}
+    in_string = False
+    feeder = None        # feeder for the value string currently open, if any
+    key = None           # bytearray while reading a key string
+    pending_key = None   # last key seen, waiting for its ':'
+    value_for = None     # key whose string value comes next
+
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        pos = 0
+        while pos < len(chunk):
+            quote = chunk.find(b'"', pos)
+            end = len(chunk) if quote < 0 else quote
+            piece = chunk[pos:end]
+
+            if in_string:
+                if feeder is not None:
+                    feeder.feed(piece)
+                elif key is not None and len(key) < 64:
+                    key += piece
+            else:
+                if pending_key is not None and b':' in piece:
+                    value_for, pending_key = pending_key, None
+                    piece = piece[piece.index(b':') + 1:]
+                if value_for is not None and piece.strip():
+                    value_for = None  # non-string value
+
+            if quote < 0:
+                break
+            if in_string:
+                if feeder is not None:
+                    feeder.close()
+                elif key is not None:
+                    pending_key = bytes(key)
+                feeder = key = None
+            elif value_for is not None:
+                if value_for in _FEEDERS:
+                    feeder = feeders[value_for] = _FEEDERS[value_for]()
+                value_for = None
+            else:
+                key = bytearray()
+            in_string = not in_string
+            pos = quote + 1
+
+    if feeder is not None:
+        feeder.close()  # truncated file: keep what was read
+    return {name.decode(): f.array() for name, f in feeders.items()}
+
+
+def parse_session_file(file_path: str, session_id: str = None):
+    """Parses one mouse_movements.json into typed arrays, or None if unreadable."""
+    try:
+        with open(file_path, 'rb') as f:
+            fields = tokenize(f)
+    except OSError as e:
+        print(f"Warning: Could not parse file for session {session_id}. Error: {e}")
+        return None
+
+    coords = fields.get('mousemove_total_behaviour', np.empty(0, dtype=np.int64))
+    return {
+        'session_id': session_id,
+        'coordinates': coords[:len(coords) // 2 * 2].reshape(-1, 2),
+        'timestamps': fields.get('mousemove_times', np.empty(0, dtype=np.int64)),
+        'actions': fields.get('total_behaviour', np.empty(0, dtype=np.uint8)),
+    }
+
+
+def parse_mouse_data_from_file(session_id: str, data_subset_folder: str, base_path: str):
+    """Drop-in for phase1.parse_mouse_data_from_file that returns typed arrays."""
+    file_path = os.path.join(base_path, 'data', 'mouse_movements', data_subset_folder, session_id, 'mouse_movements.json')
+    return parse_session_file(file_path, session_id)
+
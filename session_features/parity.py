@@ -0,0 +1,217 @@
+"""
+Golden parity checks for every way a session reaches the feature code.
+
+Each session in golden.json (a tracker payload and the features expected for
+it) is fed through every entry point, and each must reproduce the expected
+features:
+
+    json      tracker JSON body                  (server /log-visit)
+    wire      CCS1 encode -> decode              (server /log-visit, binary)
+    chunks    SessionAggregate merged over chunks (server /log-visit/chunk; base features only)
+    stream    phase1 file, streaming parser      (pipeline.py --parser stream)
+    regex     phase1 file, regex parser          (scripts.py, parse_test_data.py, pipeline.py --parser regex)
+
+The MALFORMED payloads, whose arrays don't line up, must featurize through the
+json entry point without raising and with finite values, as the server and
+the offline pipeline see such payloads from real trackers.
+
+Usage (from the repo root):
+    python -m session_features.parity                      # exits 1 on any mismatch
+    python -m session_features.parity --update             # rewrite the expected features after a deliberate change
+    python -m session_features.parity --base-path MachineLearning/phase1 --limit 1000
+                                                           # also time and compare both parsers on a dataset
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(_ROOT, 'server'))
+sys.path.insert(0, os.path.join(_ROOT, 'MachineLearning'))
+
+import phase1
+import wire
+from live_sessions import SessionAggregate
+
+from . import MODEL_FEATURES, create_feature_vector, from_json_payload, from_wire, trajectory_features
+from .mouse_parser import parse_mouse_data_from_file
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+SUBSET = 'golden'
+N_CHUNKS = 3
+RTOL = 1e-9
+
+# name -> tracker payload whose arrays disagree in length
+MALFORMED = {
+    'more_move_times_than_coordinates': {
+        'session_id': 'malformed-1', 'total_behaviour': [f'm({i},{i})' for i in range(10)],
+        'mousemove_times': [100 * i for i in range(10)],
+        'mousemove_total_behaviour': [{'x': 3 * i, 'y': i} for i in range(5)], 'Mousemove_visited_urls': 1,
+    },
+    'more_coordinates_than_move_times': {
+        'session_id': 'malformed-2', 'total_behaviour': [f'm({i},{i})' for i in range(5)] + ['c(l)'],
+        'mousemove_times': [100 * i for i in range(6)],
+        'mousemove_total_behaviour': [{'x': 3 * i, 'y': i} for i in range(10)], 'Mousemove_visited_urls': 1,
+    },
+    'clicks_only': {
+        'session_id': 'malformed-3', 'total_behaviour': ['c(l)', 'c(r)'], 'mousemove_times': [100, 250],
+        'mousemove_total_behaviour': [], 'Mousemove_visited_urls': 0,
+    },
+}
+
+
+def load_golden(path: str = GOLDEN_PATH) -> list:
+    with open(path) as f:
+        return json.load(f)['sessions']
+
+
+def features_of(session) -> dict:
+    return {**create_feature_vector(session), **trajectory_features(session)}
+
+
+def render_phase1_file(payload: dict) -> str:
+    """A tracker payload in the phase1 mouse_movements.json text format."""
+    behaviour = ''.join(f'[{action}]' for action in payload['total_behaviour'])
+    times = ', '.join(str(t) for t in payload['mousemove_times'])
+    coords = ','.join(f"[{c['x']},{c['y']}]" for c in payload['mousemove_total_behaviour'])
+    return ('{"session_id": "%s", "total_behaviour": "%s", "mousemove_times": "{%s}", '
+            '"mousemove_total_behaviour": "{%s}"}' % (payload['session_id'], behaviour, times, coords))
+
+
+def chunked_features(payload: dict, n_chunks: int = N_CHUNKS) -> dict:
+    """Base features of the payload uploaded as n_chunks live chunks (split on action boundaries)."""
+    session = from_json_payload(payload)
+    moves_before = np.concatenate([[0], np.cumsum(~session.is_click)])
+    total = None
+    for actions in np.array_split(np.arange(len(session)), n_chunks):
+        start, stop = (int(actions[0]), int(actions[-1]) + 1) if len(actions) else (0, 0)
+        chunk = SessionAggregate.from_arrays(
+            session.coordinates[moves_before[start]:moves_before[stop]], session.times[start:stop],
+            stop - start, int(np.count_nonzero(session.actions[start:stop])), session.visited_urls)
+        if total is None:
+            total = chunk
+        else:
+            total.merge(chunk)
+    return total.features(session.session_id)
+
+
+def entry_points(payload: dict, base_path: str) -> dict:
+    """Entry point name -> features computed through it."""
+    session_id = payload['session_id']
+    json_session = from_json_payload(payload)
+    encoded = wire.encode(session_id, json_session.coordinates, json_session.times, json_session.actions,
+                          json_session.visited_urls)
+    return {
+        'json': features_of(json_session),
+        'wire': features_of(from_wire(wire.decode(encoded))),
+        'chunks': chunked_features(payload),
+        'stream': phase1.create_feature_vector(session_id, parse_mouse_data_from_file(session_id, SUBSET, base_path)),
+        'regex': phase1.create_feature_vector(session_id, phase1.parse_mouse_data_from_file(session_id, SUBSET, base_path)),
+    }
+
+
+def differences(expected: dict, actual: dict) -> list:
+    """Names of the features in actual that don't match expected."""
+    wrong = []
+    for name, value in actual.items():
+        if name == 'session_id':
+            continue
+        if name not in expected or not math.isclose(value, expected[name], rel_tol=RTOL, abs_tol=RTOL):
+            wrong.append(name)
+    return wrong
+
+
+def write_phase1_files(sessions: list, base_path: str):
+    for entry in sessions:
+        folder = os.path.join(base_path, 'data', 'mouse_movements', SUBSET, entry['payload']['session_id'])
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'mouse_movements.json'), 'w') as f:
+            f.write(render_phase1_file(entry['payload']))
+
+
+def check_golden(sessions: list) -> int:
+    """Prints one line per session and entry point; returns the number of mismatches."""
+    failures = 0
+    with tempfile.TemporaryDirectory() as base_path:
+        write_phase1_files(sessions, base_path)
+        for entry in sessions:
+            for name, actual in entry_points(entry['payload'], base_path).items():
+                wrong = differences(entry['expected'], actual)
+                failures += bool(wrong)
+                status = 'ok' if not wrong else 'MISMATCH ' + ', '.join(wrong)
+                print(f"{entry['payload']['session_id'][:24]:<24} {name:<7} {status}")
+    return failures
+
+
+def check_malformed(payloads: dict = MALFORMED) -> int:
+    """Prints one line per malformed payload; returns the number that raised or gave non-finite features."""
+    failures = 0
+    for name, payload in payloads.items():
+        try:
+            features = features_of(from_json_payload(payload))
+            bad = [key for key, value in features.items() if key != 'session_id' and not math.isfinite(value)]
+            status = 'ok' if not bad else 'NON-FINITE ' + ', '.join(bad)
+        except Exception as e:
+            status = f"RAISED {type(e).__name__}: {e}"
+        failures += status != 'ok'
+        print(f"{name:<34} {status}")
+    return failures
+
+
+def compare_parsers(base_path: str, subset: str, split: str, limit: int) -> int:
+    """Times both phase1 parsers on a dataset; returns the number of sessions whose features differ."""
+    session_ids = phase1.load_labels(base_path, split, subset)['session_id'].tolist()[:limit]
+
+    start = time.perf_counter()
+    regex_results = [phase1.parse_mouse_data_from_file(s, subset, base_path) for s in session_ids]
+    regex_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stream_results = [parse_mouse_data_from_file(s, subset, base_path) for s in session_ids]
+    stream_time = time.perf_counter() - start
+
+    mismatched = 0
+    for session_id, old, new in zip(session_ids, regex_results, stream_results):
+        expected = phase1.create_feature_vector(session_id, old)
+        mismatched += bool(differences(expected, phase1.create_feature_vector(session_id, new)))
+
+    print(f"Sessions:  {len(session_ids)}")
+    print(f"Regex:     {regex_time:.3f}s ({len(session_ids) / regex_time:.1f} sessions/s)")
+    print(f"Streaming: {stream_time:.3f}s ({len(session_ids) / stream_time:.1f} sessions/s)")
+    print(f"Speedup:   {regex_time / stream_time:.2f}x, {mismatched} sessions with different features")
+    return mismatched
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check every feature entry point against golden.json.")
+    parser.add_argument('--update', action='store_true', help="rewrite the expected features from the json entry point")
+    parser.add_argument('--base-path', help="phase1 dataset to also compare the two file parsers on")
+    parser.add_argument('--subset', default=phase1.DEFAULT_SUBSET)
+    parser.add_argument('--split', default='train')
+    parser.add_argument('--limit', type=int, default=1000, help="number of dataset sessions to compare")
+    args = parser.parse_args()
+
+    sessions = load_golden()
+    if args.update:
+        for entry in sessions:
+            expected = features_of(from_json_payload(entry['payload']))
+            del expected['session_id']
+            entry['expected'] = expected
+        with open(GOLDEN_PATH, 'w') as f:
+            json.dump({'sessions': sessions}, f, separators=(',', ':'))
+        print(f"Updated {len(sessions)} sessions in {GOLDEN_PATH}")
+
+    failures = check_golden(sessions) + check_malformed()
+    if args.base_path:
+        failures += compare_parsers(args.base_path, args.subset, args.split, args.limit)
+    if failures:
+        print(f"{failures} mismatches")
+        sys.exit(1)
+    print(f"All entry points match golden.json ({len(sessions)} sessions, {len(MODEL_FEATURES)} model features "
+          f"+ trajectory)")
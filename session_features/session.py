@@ -0,0 +1,54 @@
+import numpy as np
+
+# ---- Typed session representation ----
+# Every feature function takes a Session: the whole session as NumPy arrays,
+# whatever format it arrived in (tracker JSON, the CCS1 wire format, a phase1
+# mouse_movements.json file). The adapters in adapters.py build one from each.
+#
+#   coordinates  float64 (n_moves, 2)   mouse positions, in order
+#   times        int64 (n_times,)       timestamps in ms; one per move (phase1
+#                                       files) or one per action (the tracker)
+#   actions      uint8 (n_actions,)     ACTION_* code of every event, moves included
+
+ACTION_MOVE = 0
+ACTION_LEFT_CLICK = 1
+ACTION_RIGHT_CLICK = 2
+ACTION_MIDDLE_CLICK = 3
+ACTION_OTHER_CLICK = 4
+
+
+def as_times(values) -> np.ndarray:
+    """int64 timestamps (float64 if any of them is fractional)."""
+    times = np.asarray(values if values is not None else [])
+    if times.dtype.kind == 'f' and not np.all(times == np.floor(times)):
+        return times.astype(np.float64).ravel()
+    return times.astype(np.int64).ravel()
+
+
+class Session:
+    """One session as typed arrays."""
+
+    __slots__ = ('session_id', 'coordinates', 'times', 'actions', 'visited_urls')
+
+    def __init__(self, session_id: str = None, coordinates=None, times=None, actions=None, visited_urls: int = 0):
+        self.session_id = session_id
+        self.coordinates = (np.empty((0, 2)) if coordinates is None
+                            else np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+        self.times = as_times(times)
+        self.actions = np.empty(0, dtype=np.uint8) if actions is None else np.asarray(actions, dtype=np.uint8).ravel()
+        self.visited_urls = int(visited_urls or 0)
+
+    @property
+    def is_click(self) -> np.ndarray:
+        return self.actions != ACTION_MOVE
+
+    @property
+    def clicks(self) -> int:
+        return int(np.count_nonzero(self.actions))
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __repr__(self):
+        return (f"Session({self.session_id!r}, {len(self.coordinates)} moves, {len(self.times)} times, "
+                f"{len(self.actions)} actions)")
@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+from .session import ACTION_LEFT_CLICK, Session
+
+# ---- Trajectory features ----
+# Shape and timing statistics of a session's mouse path, beyond the five
+# MODEL_FEATURES: speed, acceleration and jerk percentiles, turn angle and
+# curvature statistics, pauses, straightness and the intervals between clicks.
+#
+# Everything is derived from one set of step arrays (dx, dy, dt, step length)
+# computed once per session, so the cost is a fixed number of vectorized passes
+# over the events, linear in the session length.
+# `python -m session_features.benchmark` checks that against BUDGET_MS on a
+# 50k-event session.
+#
+# Both timestamp layouts of a Session are handled: one per mouse move (the
+# phase1 files) or one per action, clicks included (the tracker). Clicks in
+# the phase1 layout take the time of the move before them. Speeds are in
+# px/s, accelerations in px/s^2, jerks
+# in px/s^3, angles in radians and durations in ms. A statistic that can't be
+# computed (e.g. click intervals with fewer than two clicks) is 0.
+
+PAUSE_MS = 100          # a gap between mouse moves longer than this is a pause
+MIN_STROKE_PX = 20      # strokes (paths between pauses) shorter than this are ignored for straightness
+
+FEATURE_NAMES = [
+    'velocity_mean', 'velocity_p50', 'velocity_p90', 'velocity_p99',
+    'acceleration_p50', 'acceleration_p90', 'acceleration_p99',
+    'jerk_p50', 'jerk_p90', 'jerk_p99',
+    'turn_angle_mean', 'turn_angle_std', 'turn_angle_p90', 'sharp_turn_ratio',
+    'curvature_p50', 'curvature_p90',
+    'pause_count', 'pause_ratio', 'pause_p50_ms', 'pause_p90_ms', 'pause_max_ms',
+    'straightness', 'stroke_straightness_mean',
+    'click_interval_mean_ms', 'click_interval_std_ms', 'click_interval_min_ms', 'click_interval_cv',
+]
+
+BUDGET_MS = 20.0        # per-session extraction budget at BENCHMARK_EVENTS
+BENCHMARK_EVENTS = 50_000
+CLICK_RATE = 0.01       # share of a synthetic session's events that are left clicks
+
+
+def _percentiles(values: np.ndarray, qs) -> list:
+    """np.percentile(values, qs) (linear interpolation), from one partial sort without its per-call overhead."""
+    n = len(values)
+    if n == 0:
+        return [0.0] * len(qs)
+    position = np.asarray(qs, dtype=np.float64) * ((n - 1) / 100.0)
+    lower = position.astype(np.intp)
+    upper = np.minimum(lower + 1, n - 1)
+    ordered = np.partition(values, np.concatenate((lower, upper)))
+    return (ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)).tolist()
+
+
+def _event_times(coordinates: np.ndarray, times: np.ndarray, is_click: np.ndarray):
+    """(move times aligned with coordinates, click times) for either timestamp layout."""
+    if len(times) == len(is_click) and len(times) != len(coordinates):
+        return times[~is_click], times[is_click]     # tracker: one timestamp per action
+    n = min(len(coordinates), len(times))
+    move_times = times[:n]
+    if len(times) == len(coordinates) and n:       # phase1: a click takes the time of the move before it
+        before = np.cumsum(~is_click)[is_click] - 1
+        return move_times, move_times[np.clip(before, 0, n - 1)]
+    return move_times, times[:0]
+
+
+def trajectory_features(session: Session) -> dict:
+    """FEATURE_NAMES -> value for one session."""
+    times = session.times.astype(np.float64)
+    move_times, click_times = _event_times(session.coordinates, times, session.is_click)
+    # A payload can carry more move timestamps than coordinates, or fewer: use the moves that have both
+    n = min(len(move_times), len(session.coordinates))
+    move_times, coordinates = move_times[:n], session.coordinates[:n]
+
+    features = dict.fromkeys(FEATURE_NAMES, 0.0)
+
+    # --- Steps: the arrays every statistic below is derived from ---
+    d = np.diff(coordinates, axis=0)
+    dt = np.diff(move_times)
+    step = np.hypot(d[:, 0], d[:, 1])
+    path = step.sum()
+
+    # --- Speed, acceleration, jerk (over steps that take time) ---
+    timed = dt > 0
+    velocity = step[timed] / dt[timed] * 1000.0
+    t_mid = (move_times[:-1][timed] + move_times[1:][timed]) / 2
+    acceleration = np.diff(velocity) / np.diff(t_mid) * 1000.0
+    t_mid2 = (t_mid[:-1] + t_mid[1:]) / 2
+    jerk = np.diff(acceleration) / np.diff(t_mid2) * 1000.0
+    if len(velocity):
+        features['velocity_mean'] = float(velocity.mean())
+    (features['velocity_p50'], features['velocity_p90'],
+     features['velocity_p99']) = _percentiles(velocity, (50, 90, 99))
+    (features['acceleration_p50'], features['acceleration_p90'],
+     features['acceleration_p99']) = _percentiles(np.abs(acceleration), (50, 90, 99))
+    (features['jerk_p50'], features['jerk_p90'],
+     features['jerk_p99']) = _percentiles(np.abs(jerk), (50, 90, 99))
+
+    # --- Turn angles and curvature (over steps that move) ---
+    moving = step > 0
+    heading = np.arctan2(d[moving, 1], d[moving, 0])
+    turn = np.abs((np.diff(heading) + np.pi) % (2 * np.pi) - np.pi)
+    if len(turn):
+        features['turn_angle_mean'] = float(turn.mean())
+        features['turn_angle_std'] = float(turn.std())
+        features['sharp_turn_ratio'] = float(np.count_nonzero(turn > np.pi / 2) / len(turn))
+        moved = step[moving]
+        curvature = turn / ((moved[:-1] + moved[1:]) / 2)
+        features['curvature_p50'], features['curvature_p90'] = _percentiles(curvature, (50, 90))
+        features['turn_angle_p90'] = _percentiles(turn, (90,))[0]
+
+    # --- Pauses ---
+    paused = dt > PAUSE_MS
+    pauses = dt[paused]
+    features['pause_count'] = float(len(pauses))
+    duration = move_times[-1] - move_times[0] if len(move_times) > 1 else 0.0
+    if len(pauses):
+        features['pause_ratio'] = float(pauses.sum() / duration) if duration > 0 else 0.0
+        features['pause_p50_ms'], features['pause_p90_ms'] = _percentiles(pauses, (50, 90))
+        features['pause_max_ms'] = float(pauses.max())
+
+    # --- Straightness: whole path, and each stroke between pauses ---
+    if path > 0:
+        features['straightness'] = float(np.hypot(*(coordinates[-1] - coordinates[0])) / path)
+        stroke = np.concatenate(([0], np.cumsum(paused)))   # stroke id of every point
+        starts = np.flatnonzero(np.diff(stroke, prepend=-1))
+        ends = np.append(starts[1:] - 1, len(stroke) - 1)
+        length = np.bincount(stroke[1:], weights=np.where(paused, 0.0, step), minlength=len(starts))
+        chord = np.hypot(*(coordinates[ends] - coordinates[starts]).T)
+        long_enough = length >= MIN_STROKE_PX
+        if long_enough.any():
+            features['stroke_straightness_mean'] = float((chord[long_enough] / length[long_enough]).mean())
+
+    # --- Intervals between clicks ---
+    intervals = np.diff(np.sort(click_times))
+    if len(intervals):
+        mean = intervals.mean()
+        features['click_interval_mean_ms'] = float(mean)
+        features['click_interval_std_ms'] = float(intervals.std())
+        features['click_interval_min_ms'] = float(intervals.min())
+        features['click_interval_cv'] = float(intervals.std() / mean) if mean > 0 else 0.0
+
+    return features
+
+
+# ---- Benchmark ----
+def synthetic_session(n_moves: int, seed: int = 0) -> Session:
+    """A random-walk session with exactly n_moves mouse moves and about CLICK_RATE left clicks.
+
+    Tracker layout: one timestamp per action, in ms since tracking started, mostly
+    0-16 ms apart with occasional pauses. benchmarks/generators.py builds its
+    payloads from these too.
+    """
+    rng = np.random.default_rng(seed)
+    n_clicks = rng.binomial(n_moves, CLICK_RATE)
+    actions = np.zeros(n_moves + n_clicks, dtype=np.uint8)
+    actions[rng.choice(len(actions), n_clicks, replace=False)] = ACTION_LEFT_CLICK
+    heading = np.cumsum(rng.normal(0, 0.3, n_moves))
+    speed = rng.gamma(2.0, 3.0, n_moves)
+    steps = np.column_stack([speed * np.cos(heading), speed * np.sin(heading)])
+    coordinates = np.abs(np.rint(500 + np.cumsum(steps, axis=0)))  # stays on screen, in whole pixels
+    gaps = np.where(rng.random(len(actions)) < 0.02, rng.exponential(400, len(actions)),
+                    rng.integers(0, 17, len(actions)))
+    return Session(f'synthetic-{n_moves}-{seed}', coordinates, np.cumsum(gaps).astype(np.int64), actions, 1)
+
+
+def benchmark(n_events: int = BENCHMARK_EVENTS, runs: int = 50) -> dict:
+    session = synthetic_session(round(n_events / (1 + CLICK_RATE)))
+    trajectory_features(session)  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        trajectory_features(session)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'events': n_events, 'p50_ms': float(np.percentile(timings, 50)),
+            'p99_ms': float(np.percentile(timings, 99))}
+